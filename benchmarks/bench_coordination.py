@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Crawl sharing across processes: several scrapers leasing work units from one SqliteWorkStore.
+
+A benchmarks.local_jarchive site is started in its own process. For each process count, that many scraper processes
+crawl the whole site into one scratch SQLite file through a shared work store, and the wall time until the last one
+exits is reported, with the games stored and the number of game units leased more than once.
+
+With --kill-after, the first process of each run is killed that many seconds in. Its leases expire after
+--lease-seconds and are taken over by the others, so every game is still stored.
+
+    $ python3 -m benchmarks.bench_coordination --seasons 2 --games 30 --latency 1.0 --processes 1 2 4 --threads 2
+    $ python3 -m benchmarks.bench_coordination --processes 3 --kill-after 6 --lease-seconds 3
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_e2e import start_site
+
+
+def run_one(args):
+    """Crawls as one of the processes sharing args.store."""
+
+    from scraper import Database, JArchiveScraper
+    from scraper.coordination import SqliteWorkStore
+
+    logging.disable(logging.CRITICAL)
+    database = Database.factory(args.db, games_per_flush=1)  # As run.py --coordinate does.
+    work_store = SqliteWorkStore(args.store, lease_seconds=args.lease_seconds)
+    crawler = JArchiveScraper(database, base_url=args.base_url, worker_threads=args.threads, work_store=work_store)
+    with contextlib.redirect_stdout(io.StringIO()):
+        crawler.start()
+    crawler.cleanup()
+
+
+def run_processes(args, base_url, processes, tmp_dir):
+    """Runs processes scrapers over one store and database. Returns (seconds, games stored, units leased more than once)."""
+
+    run_dir = tempfile.mkdtemp(dir=tmp_dir)
+    db_path, store_path = os.path.join(run_dir, "bench.db"), os.path.join(run_dir, "bench.work")
+    command = [sys.executable, "-m", "benchmarks.bench_coordination", "--run-one", "--base-url", base_url, "--db", db_path,
+            "--store", store_path, "--threads", str(args.threads), "--lease-seconds", str(args.lease_seconds)]
+    start = time.perf_counter()
+    children = [subprocess.Popen(command) for _ in range(processes)]
+    if args.kill_after:
+        time.sleep(args.kill_after)
+        children[0].send_signal(signal.SIGKILL)
+    for child in children:
+        child.wait()
+    elapsed = time.perf_counter() - start
+
+    conn = sqlite3.connect(db_path)
+    games = conn.execute("""SELECT COUNT(*) FROM games""").fetchone()[0]
+    conn.close()
+    conn = sqlite3.connect(store_path)
+    releases = conn.execute("""SELECT COUNT(*) FROM units WHERE kind = 'game' AND attempts > 1""").fetchone()[0]
+    conn.close()
+    return elapsed, games, releases
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seasons", type=int, default=4)
+    parser.add_argument("--games", type=int, default=50, help="Games per season.")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4, help="Worker threads per process.")
+    parser.add_argument("--lease-seconds", type=int, default=5)
+    parser.add_argument("--kill-after", type=float, help="Kill the first process of each run after this many seconds.")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--db", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--store", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args)
+        return
+
+    args.jitter, args.error_rate = 0.0, 0.0
+    site, base_url = start_site(args)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print("{} games; {} threads per process{}".format(args.seasons * args.games, args.threads,
+                    "; first process killed after {}s".format(args.kill_after) if args.kill_after else ""))
+            print("{:>9} {:>9} {:>9} {:>9} {:>9}".format("processes", "seconds", "games/s", "stored", "re-leased"))
+            for processes in args.processes:
+                elapsed, games, releases = run_processes(args, base_url, processes, tmp_dir)
+                print("{:>9} {:>9.1f} {:>9.1f} {:>9} {:>9}".format(processes, elapsed, games / elapsed, games, releases))
+    finally:
+        site.terminate()
+        site.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of JArchiveScraper against a synthetic local j-archive.
+
+A benchmarks.local_jarchive server is started in its own process, then every combination of engine, thread count and
+parser backend is run in a fresh process, so each gets its own peak RSS. Each run crawls the whole synthetic site
+into a scratch SQLite file and reports:
+
+    games/sec: games saved per second of wall time.
+    fetch p50/p99: game page fetch latency, in ms, estimated from the scraper's fetch_seconds histogram.
+    parse ms: mean parse time per game page. With a process pool this includes waiting for a free process.
+    inserts/sec: games saved per second spent inside the database, including commits.
+
+Every figure except peak RSS is read from the scraper's own metrics (scraper.metrics.PipelineMetrics).
+    peak RSS: maximum resident set size of the scraper process, in MB.
+
+Runs are fully offline:
+
+    $ python3 -m benchmarks.bench_e2e --seasons 4 --games 50 --latency 0.05 --jitter 0.02 --error-rate 0.01 \\
+        --engines threaded async --threads 7 16 --parsers bs4 lxml
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+RESULT_PREFIX = "RESULT "
+
+
+def run_one(config, base_url):
+    """Crawls base_url once with config, in this process. Returns a dict of measurements."""
+
+    import scraper.async_engine
+    import scraper.scraper
+    from scraper import Database
+
+    logging.disable(logging.CRITICAL)  # Injected errors would otherwise print a traceback per failed page.
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = Database.factory(os.path.join(tmp_dir, "bench.db"))
+        options = {"base_url": base_url, "parser_backend": config["parser"], "parse_processes": config["parse_processes"]}
+        if config["engine"] == "async":
+            crawler = scraper.async_engine.AsyncJArchiveScraper(database, concurrency=config["concurrency"], **options)
+        else:
+            crawler = scraper.scraper.JArchiveScraper(database, worker_threads=config["threads"], **options)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            crawler.start()
+        crawler.cleanup()
+        elapsed = time.perf_counter() - start
+
+    metrics = crawler.metrics
+    games_saved = metrics.games_saved.value
+    return {
+            "games": games_saved,
+            "seconds": elapsed,
+            "games_per_sec": games_saved / elapsed,
+            "fetch_failures": metrics.fetch_failures.value,
+            "fetch_p50_ms": _ms(metrics.fetch_seconds.quantile(0.5)),
+            "fetch_p99_ms": _ms(metrics.fetch_seconds.quantile(0.99)),
+            "parse_ms": _ms(metrics.parse_seconds.snapshot()["mean"]),
+            "inserts_per_sec": games_saved / metrics.save_seconds.sum if metrics.save_seconds.sum else None,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss is in KB on Linux.
+            }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def start_site(args):
+    """Starts the synthetic site in a child process. Returns (process, base url)."""
+
+    command = [sys.executable, "-m", "benchmarks.local_jarchive", "--seasons", str(args.seasons), "--games", str(args.games),
+            "--latency", str(args.latency), "--jitter", str(args.jitter), "--error-rate", str(args.error_rate)]
+    site = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True)
+    return site, site.stdout.readline().strip()
+
+
+def run_in_subprocess(config, base_url):
+    command = [sys.executable, "-m", "benchmarks.bench_e2e", "--run-one", json.dumps(config), "--base-url", base_url]
+    output = subprocess.run(command, stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    result_line = next(line for line in output.splitlines() if line.startswith(RESULT_PREFIX))
+    return json.loads(result_line[len(RESULT_PREFIX):])
+
+
+def _fmt(value, spec):
+    return "-" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--games", type=int, default=50, help="Games per season.")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--engines", nargs="+", choices=["threaded", "async"], default=["threaded", "async"])
+    parser.add_argument("--threads", type=int, nargs="+", default=[7], help="Worker thread counts for the threaded engine.")
+    parser.add_argument("--concurrency", type=int, default=100, help="In-flight request limit for the async engine.")
+    parser.add_argument("--parsers", nargs="+", default=["bs4"])
+    parser.add_argument("--parse-processes", type=int)
+    parser.add_argument("--run-one", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(RESULT_PREFIX + json.dumps(run_one(json.loads(args.run_one), args.base_url)))
+        return
+
+    configs = []
+    for engine, parser_backend in itertools.product(args.engines, args.parsers):
+        for threads in (args.threads if engine == "threaded" else [None]):
+            configs.append({"engine": engine, "threads": threads, "concurrency": args.concurrency,
+                "parser": parser_backend, "parse_processes": args.parse_processes})
+
+    site, base_url = start_site(args)
+    try:
+        print("{:<9} {:>7} {:<5} {:>6} {:>9} {:>10} {:>10} {:>9} {:>12} {:>9}".format(
+            "engine", "threads", "parse", "games", "games/s", "fetch p50", "fetch p99", "parse ms", "inserts/s", "RSS MB"))
+        for config in configs:
+            result = run_in_subprocess(config, base_url)
+            print("{:<9} {:>7} {:<5} {:>6} {:>9.1f} {:>10} {:>10} {:>9} {:>12} {:>9.1f}".format(
+                config["engine"], config["threads"] or "-", config["parser"], result["games"], result["games_per_sec"],
+                _fmt(result["fetch_p50_ms"], ".1f"), _fmt(result["fetch_p99_ms"], ".1f"), _fmt(result["parse_ms"], ".2f"),
+                _fmt(result["inserts_per_sec"], ".0f"), result["peak_rss_mb"]))
+    finally:
+        site.terminate()
+        site.wait()
+
+
+if __name__ == "__main__":
+    main()
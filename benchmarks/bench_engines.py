@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Compare games/sec of the threaded and async fetch engines against a local stand-in j-archive.
+
+    $ python3 -m benchmarks.bench_engines --seasons 2 --games 100 --latency 0.1 --concurrency 200 --parse-processes 4
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from scraper import JArchiveScraper, Database
+from scraper.async_engine import AsyncJArchiveScraper
+from benchmarks.local_jarchive import LocalJArchive
+
+
+def run_engine(engine, site, concurrency, parse_processes=None):
+    """Scrape every game on site into a scratch SQLite file. Returns elapsed seconds."""
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = Database.factory(os.path.join(tmp_dir, "bench.db"))
+        if engine == "async":
+            scraper = AsyncJArchiveScraper(database, base_url=site.base_url, concurrency=concurrency, parse_processes=parse_processes)
+        else:
+            scraper = JArchiveScraper(database, base_url=site.base_url, parse_processes=parse_processes)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.start()
+        elapsed = time.perf_counter() - start
+        scraper.cleanup()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--games", type=int, default=50, help="Games per season.")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds slept by the server before each response.")
+    parser.add_argument("--concurrency", type=int, default=100, help="In-flight request limit for the async engine.")
+    parser.add_argument("--parse-processes", type=int, help="Parse in a process pool of this size.")
+    parser.add_argument("--engines", nargs="+", choices=["threaded", "async"], default=["threaded", "async"])
+    args = parser.parse_args()
+
+    print("{:<10} {:>8} {:>10} {:>10}".format("engine", "games", "seconds", "games/sec"))
+    for engine in args.engines:
+        with LocalJArchive(args.seasons, args.games, args.latency) as site:
+            elapsed = run_engine(engine, site, args.concurrency, args.parse_processes)
+            games = site.request_counts["game"]
+        print("{:<10} {:>8} {:>10.2f} {:>10.1f}".format(engine, games, elapsed, games / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Startup time of short scraper invocations, each run in a fresh interpreter.
+
+Every command is run --repeat times, and the median wall time is reported next to that of an interpreter doing
+nothing. The heavy optional libraries each command ends up importing are listed, read from python -X importtime.
+Pass --repo to time another checkout, such as a git worktree of an older commit:
+
+    $ python3 -m benchmarks.bench_import_time --repeat 10
+    $ git worktree add /tmp/jtrivia-before HEAD~1 && python3 -m benchmarks.bench_import_time --repo /tmp/jtrivia-before
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ("requests", "bs4", "lxml", "pymongo", "pyarrow", "aiohttp")
+COMMANDS = [
+        ("python (nothing)", ["-c", "pass"]),
+        ("run.py --help", ["run.py", "--help"]),
+        ("import scraper", ["-c", "import scraper"]),
+        ("sqlite Database.factory", ["-c", "from scraper import Database; Database.factory('sqlite:///unused.db')"]),
+        ("scraper.search --help", ["-m", "scraper.search", "--help"]),
+        ("scraper.migrate --help", ["-m", "scraper.migrate", "--help"]),
+        ("import scraper.scraper", ["-c", "import scraper.scraper"]),
+        ]
+
+
+def median_seconds(args, repo, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=repo, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def heavy_imports(args, repo):
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, cwd=repo, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    imported = {line.rsplit("|", 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")}
+    return [name for name in HEAVY_MODULES if name in imported]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--repo", type=str, default=os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+            help="Checkout to run the commands in. Defaults to this one.")
+    args = parser.parse_args()
+
+    print("{:<26} {:>8} {:>10}  {}".format("command", "ms", "+ms", "heavy imports"))
+    baseline = None
+    for name, command in COMMANDS:
+        seconds = median_seconds(command, args.repo, args.repeat)
+        baseline = seconds if baseline is None else baseline
+        print("{:<26} {:>8.0f} {:>10.0f}  {}".format(name, seconds * 1000, (seconds - baseline) * 1000,
+                ", ".join(heavy_imports(command, args.repo)) or "-"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Memory held by a deep game_data_queue, for the dict representation of parsed games and for models.Game.
+
+Parses --queue-depth distinct synthetic game pages and keeps every result, as a full game_data_queue would. Reports
+traced Python memory (tracemalloc) for each representation:
+
+    retained MB: memory still held by the queued games after parsing.
+    peak MB: highest memory seen while parsing and queueing them.
+    KB/game: retained memory per queued game.
+
+The "dict, kept trees" row is the representation before models.Game: dicts of clue dicts, with parse trees left for
+the garbage collector to find.
+
+    $ python3 -m benchmarks.bench_memory --queue-depth 256 --parser bs4
+"""
+import argparse
+import gc
+import tracemalloc
+
+from scraper.parser import make_page_soup, parse_jarchive_page
+from scraper.parser_backends import DEFAULT_PARSER_BACKEND, PARSER_BACKENDS, parse_game_markup
+from benchmarks.local_jarchive import TEST_PAGE_PATH, render_game_page
+
+
+def parse_dict_keeping_trees(markup, url):
+    return parse_jarchive_page(make_page_soup(markup))
+
+
+def parse_dict(markup, url, backend):
+    return parse_game_markup(markup, backend, url).to_dict()
+
+
+def parse_model(markup, url, backend):
+    return parse_game_markup(markup, backend, url)
+
+
+def measure(parse, pages):
+    """Returns (retained bytes, peak bytes) of parsing every page and keeping the results."""
+
+    gc.collect()
+    tracemalloc.start()
+    queued = [parse(markup, url) for url, markup in pages]
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queued
+    return retained, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queue-depth", type=int, default=128, help="Number of parsed games held at once.")
+    parser.add_argument("--parser", choices=sorted(PARSER_BACKENDS), default=DEFAULT_PARSER_BACKEND)
+    args = parser.parse_args()
+
+    with open(TEST_PAGE_PATH, "r", encoding="utf-8") as f:
+        template = f.read()
+    pages = [("http://j-archive.com/showgame.php?game_id={}".format(i), render_game_page(template, i))
+            for i in range(args.queue_depth)]
+
+    representations = [
+            ("dict, kept trees", parse_dict_keeping_trees),
+            ("dict", lambda markup, url: parse_dict(markup, url, args.parser)),
+            ("models.Game", lambda markup, url: parse_model(markup, url, args.parser))
+            ]
+    print("{:<18} {:>12} {:>10} {:>10}".format("representation", "retained MB", "peak MB", "KB/game"))
+    for name, parse in representations:
+        retained, peak = measure(parse, pages)
+        print("{:<18} {:>12.2f} {:>10.2f} {:>10.1f}".format(name, retained / 2 ** 20, peak / 2 ** 20, retained / 1024 / len(pages)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Per-page parse time of every installed parser backend, next to the original unstrained bs4 parse.
+
+    $ python3 -m benchmarks.bench_parser_backends --repeat 50
+    $ python3 -m benchmarks.bench_parser_backends --archive ./pages
+"""
+import argparse
+import time
+
+from scraper.archive import PageArchive
+from scraper.parser import make_page_soup, parse_jarchive_page
+from scraper.parser_backends import PARSER_BACKENDS, get_parser_backend
+from benchmarks.local_jarchive import TEST_PAGE_PATH
+
+
+def load_pages(archive_dir):
+    if not archive_dir:
+        with open(TEST_PAGE_PATH, "r") as f:
+            return [f.read()]
+    archive = PageArchive(archive_dir)
+    pages = [archive.get(url) for url in archive.game_urls()]
+    archive.close()
+    return pages
+
+
+def time_per_page(parse, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for markup in pages:
+            parse(markup)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20, help="Times to parse every page.")
+    parser.add_argument("--archive", type=str, help="PageArchive directory of recorded game pages. Defaults to tests/test_page.html.")
+    args = parser.parse_args()
+
+    pages = load_pages(args.archive)
+    parsers = [("bs4 (unstrained)", lambda markup: parse_jarchive_page(make_page_soup(markup)))]
+    for name in sorted(PARSER_BACKENDS):
+        try:
+            parsers.append((name, get_parser_backend(name).parse_game_markup))
+        except ValueError as e:
+            print("Skipping {}: {}".format(name, e))
+
+    baseline = None
+    print("{:<18} {:>12} {:>9}".format("backend", "ms/page", "speedup"))
+    for name, parse in parsers:
+        seconds = time_per_page(parse, pages, args.repeat)
+        baseline = baseline or seconds
+        print("{:<18} {:>12.2f} {:>8.1f}x".format(name, seconds * 1000, baseline / seconds))
+
+
+if __name__ == "__main__":
+    main()
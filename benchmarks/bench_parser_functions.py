@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks of each function in scraper.parser, compared against stored baselines.
+
+Every function is timed over the inputs one game page gives it: _get_jeopardy_rounds over the page, the round
+functions over each round, the clue functions over each clue node, _remove_html_tags over every question and answer
+string, and CLUE_ANSWER_REGEX over every onmouseover attribute. parse_jarchive_page times the whole parse of an
+already made soup, and make_page_soup the tree building before it. Each is run on these pages:
+
+    test_page: tests/test_page.html.
+    large: the same page with ten times the clue text, and fifty wrong responses in every answer's onmouseover.
+    pathological: clue text full of unclosed "<" characters, which _remove_html_tags' lazy match scans to the end of
+        the string for, and answers with a long onmouseover tail for CLUE_ANSWER_REGEX's greedy match to backtrack over.
+
+The time reported is the best of --repeat short runs, per pass over one page's inputs. A shared or throttled machine
+can run twice as fast one minute as the next, so each run is preceded by a run of a fixed reference workload, and the
+benchmark's best time divided by the reference's best time is what is compared against the baselines in --baseline.
+The run fails if any function got relatively slower by more than --threshold percent; a benchmark over the threshold
+is run again, up to --confirm times, before it counts. Relative times still depend on the Python version and libraries
+they were measured with, which are stored alongside them; save new baselines with --save before changing the parser in
+another environment.
+
+    $ python3 -m benchmarks.bench_parser_functions --save
+    $ python3 -m benchmarks.bench_parser_functions --threshold 20
+    $ python3 -m benchmarks.bench_parser_functions --only _remove_html_tags --pages pathological
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import timeit
+
+from scraper.exceptions import IncompleteClueError, MalformedRoundHTMLError
+from scraper.parser import (CLUE_ANSWER_REGEX,
+        make_page_soup,
+        parse_jarchive_page,
+        _get_jeopardy_rounds,
+        _get_round_categories,
+        _get_round_clue_nodes,
+        _parse_clue_answer,
+        _parse_clue_question,
+        _parse_clue_value,
+        _remove_html_tags,
+        _serialize_clue_node,
+        _serialize_jeopardy_round
+        )
+from benchmarks.local_jarchive import CLUE_TEXT_REGEX, TEST_PAGE_PATH
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "baselines", "parser_functions.json")
+DEFAULT_THRESHOLD = 25  # Percent slower than the baseline that counts as a regression.
+DEFAULT_REPEAT = 15
+DEFAULT_CONFIRM = 3
+RUN_SECONDS = 0.02  # Each timed run calls the benchmark about this long. Many short runs give the best time more chances.
+CALIBRATION_SIZE = 200
+CALIBRATION_REGEX = re.compile(r'''(<.*?>|\\)''')
+
+CORRECT_RESPONSE_END = "&lt;/em&gt;"
+WRONG_RESPONSE = "&lt;tr&gt;&lt;td class=&quot;wrong&quot;&gt;Contestant {}&lt;/td&gt;&lt;/tr&gt;"
+
+
+def large_page(template):
+    markup = CLUE_TEXT_REGEX.sub(lambda m: "{}{}{}".format(m.group(1), " ".join([m.group(2)] * 10), m.group(3)), template)
+    return markup.replace(CORRECT_RESPONSE_END, CORRECT_RESPONSE_END + "".join(WRONG_RESPONSE.format(i) for i in range(50)))
+
+
+def pathological_page(template):
+    markup = CLUE_TEXT_REGEX.sub(lambda m: "{}{}{}".format(m.group(1), m.group(2) + " 1 &lt; 2 \\" * 200, m.group(3)), template)
+    return markup.replace(CORRECT_RESPONSE_END, CORRECT_RESPONSE_END + "(" * 5000)
+
+
+def load_pages():
+    with open(TEST_PAGE_PATH, "r", encoding="utf-8") as f:
+        template = f.read()
+    return {"test_page": template, "large": large_page(template), "pathological": pathological_page(template)}
+
+
+def _serialize_clue_node_or_none(clue_node):
+    try:
+        return _serialize_clue_node(clue_node)
+    except IncompleteClueError:
+        return None
+
+
+def _serialize_jeopardy_round_or_none(round_soup):
+    try:
+        return _serialize_jeopardy_round(round_soup)
+    except MalformedRoundHTMLError:
+        return None
+
+
+def page_benchmarks(markup):
+    """Returns {function name: (function, [inputs])} for one page."""
+
+    soup = make_page_soup(markup)
+    rounds = _get_jeopardy_rounds(soup)
+    clue_nodes = [clue_node for round_soup in rounds for clue_node in _get_round_clue_nodes(round_soup)]
+    # Clues never revealed on the show have empty nodes, which _serialize_clue_node stops at before the answer.
+    answered_nodes = [clue_node for clue_node in clue_nodes
+            if clue_node.find("div") is not None and clue_node.find("div").has_attr("onmouseover")]
+    onmouseovers = [clue_node.find("div")["onmouseover"] for clue_node in answered_nodes]
+    answer_matches = (CLUE_ANSWER_REGEX.search(onmouseover) for onmouseover in onmouseovers)
+    question_nodes = (clue_node.find("td", class_="clue_text") for clue_node in answered_nodes)
+    strings = [node.text for node in question_nodes if node is not None] + [match.group(1) for match in answer_matches if match]
+    return {
+            "make_page_soup": (make_page_soup, [markup]),
+            "parse_jarchive_page": (parse_jarchive_page, [soup]),
+            "_get_jeopardy_rounds": (_get_jeopardy_rounds, [soup]),
+            "_get_round_categories": (_get_round_categories, rounds),
+            "_get_round_clue_nodes": (_get_round_clue_nodes, rounds),
+            "_serialize_jeopardy_round": (_serialize_jeopardy_round_or_none, rounds),
+            "_serialize_clue_node": (_serialize_clue_node_or_none, clue_nodes),
+            "_parse_clue_question": (_parse_clue_question, answered_nodes),
+            "_parse_clue_answer": (_parse_clue_answer, answered_nodes),
+            "_parse_clue_value": (_parse_clue_value, answered_nodes),
+            "_remove_html_tags": (_remove_html_tags, strings),
+            "CLUE_ANSWER_REGEX.search": (CLUE_ANSWER_REGEX.search, onmouseovers)
+            }
+
+
+def make_timer(function, inputs):
+    """Returns a timeit.Timer of one pass of function over inputs, and the number of passes per timed run."""
+
+    def run_once():
+        for value in inputs:
+            function(value)
+
+    timer = timeit.Timer(run_once)
+    number, seconds = timer.autorange()
+    return timer, max(1, int(number * RUN_SECONDS / seconds))
+
+
+def reference_workload(size):
+    """Fixed mix of string, regex and dictionary work, of the kinds parsing does, independent of the parser."""
+
+    counts = {}
+    for i in range(size):
+        word = CALIBRATION_REGEX.sub("", "<b>{}</b> clue \\ text".format(i))
+        counts[word[-1]] = counts.get(word[-1], 0) + len(word.split())
+    return counts
+
+
+def time_benchmark(function, inputs, repeat=DEFAULT_REPEAT):
+    """
+    Times repeat runs of function over inputs, each right after a run of the reference workload.
+
+    Returns:
+        (best seconds per pass over inputs, that divided by the best seconds of the reference workload).
+    """
+
+    timer, number = make_timer(function, inputs)
+    reference_timer, reference_number = make_timer(reference_workload, [CALIBRATION_SIZE])
+    seconds = reference_seconds = float("inf")
+    for _ in range(repeat):
+        reference_seconds = min(reference_seconds, reference_timer.timeit(reference_number) / reference_number)
+        seconds = min(seconds, timer.timeit(number) / number)
+    return seconds, seconds / reference_seconds
+
+
+def run_benchmarks(page_names, only=None, repeat=DEFAULT_REPEAT):
+    """Returns {page name: {function name: {"seconds": seconds per pass, "relative": seconds / reference seconds}}}."""
+
+    pages = load_pages()
+    results = {}
+    for page_name in page_names:
+        results[page_name] = {}
+        for name, (function, inputs) in page_benchmarks(pages[page_name]).items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            seconds, relative = time_benchmark(function, inputs, repeat)
+            results[page_name][name] = {"seconds": seconds, "relative": relative}
+    return results
+
+
+def environment():
+    import bs4
+    return {"python": platform.python_version(), "bs4": bs4.__version__, "machine": platform.machine(),
+            "processor": platform.processor(), "system": platform.system()}
+
+
+def load_baselines(path):
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(path, results):
+    """Writes results to path, keeping stored baselines of pages and functions that were not run."""
+
+    stored = (load_baselines(path) or {}).get("results", {})
+    for page_name, page_results in results.items():
+        stored.setdefault(page_name, {}).update(page_results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": stored}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def relative_change(result, baseline):
+    return (result["relative"] / baseline["relative"] - 1) * 100
+
+
+def confirm_regressions(results, baselines, threshold, confirm, repeat=DEFAULT_REPEAT):
+    """Times each benchmark over threshold up to confirm more times, keeping its best relative time. A burst of load
+    rarely slows the same benchmark several times in a row; a real regression does."""
+
+    pages = load_pages()
+    for page_name, page_results in results.items():
+        benchmarks = None
+        for name, result in page_results.items():
+            baseline = baselines.get(page_name, {}).get(name)
+            attempts = 0
+            while baseline and attempts < confirm and relative_change(result, baseline) > threshold:
+                benchmarks = benchmarks or page_benchmarks(pages[page_name])
+                seconds, relative = time_benchmark(*benchmarks[name], repeat)
+                if relative < result["relative"]:
+                    result = page_results[name] = {"seconds": seconds, "relative": relative}
+                attempts += 1
+
+
+def compare(results, baselines, threshold):
+    """Prints results next to baselines, and returns [(page, function, percent change)] of the regressions. Changes
+    are of relative times; the microseconds are shown as measured."""
+
+    regressions = []
+    print("{:<13} {:<26} {:>12} {:>12} {:>8}".format("page", "function", "baseline us", "current us", "change"))
+    for page_name, page_results in results.items():
+        for name, result in page_results.items():
+            baseline = baselines.get(page_name, {}).get(name)
+            if baseline is None:
+                print("{:<13} {:<26} {:>12} {:>12.1f} {:>8}".format(page_name, name, "-", result["seconds"] * 1e6, "new"))
+                continue
+            change = relative_change(result, baseline)
+            regressed = change > threshold
+            if regressed:
+                regressions.append((page_name, name, change))
+            print("{:<13} {:<26} {:>12.1f} {:>12.1f} {:>+7.0f}%{}".format(page_name, name, baseline["seconds"] * 1e6,
+                    result["seconds"] * 1e6, change, " REGRESSED" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file.")
+    parser.add_argument("--save", action="store_true", help="Store this run as the baseline instead of comparing.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Percent slower than the baseline "
+            "that fails the run.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per benchmark; the best is kept.")
+    parser.add_argument("--confirm", type=int, default=DEFAULT_CONFIRM, help="Times a benchmark over the threshold is "
+            "run again before it counts as a regression.")
+    parser.add_argument("--pages", nargs="+", choices=sorted(load_pages()), default=["test_page", "large", "pathological"])
+    parser.add_argument("--only", nargs="+", help="Only run functions whose name contains one of these.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.pages, args.only, args.repeat)
+    if args.save:
+        save_baselines(args.baseline, results)
+        print("Saved baselines of {} benchmarks to {}".format(sum(map(len, results.values())), args.baseline))
+        return
+
+    stored = load_baselines(args.baseline)
+    if stored is None:
+        print("No baselines at {}. Run with --save first.".format(args.baseline))
+        sys.exit(2)
+    if stored.get("environment") != environment():
+        print("Baselines were measured on {}; this is {}. Times may not be comparable.".format(stored.get("environment"),
+                environment()))
+    confirm_regressions(results, stored["results"], args.threshold, args.confirm, args.repeat)
+    regressions = compare(results, stored["results"], args.threshold)
+    if regressions:
+        print("{} benchmarks regressed by more than {:.0f}%:".format(len(regressions), args.threshold))
+        for page_name, name, change in regressions:
+            print("    {} on {}: {:+.0f}%".format(name, page_name, change))
+        sys.exit(1)
+    print("No benchmark regressed by more than {:.0f}%.".format(args.threshold))
+
+
+if __name__ == "__main__":
+    main()
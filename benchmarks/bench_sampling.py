@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Filtered random clue sampling: ORDER BY RANDOM() against ClueSampler's sample index.
+
+Builds a scratch SQLite database of --games synthetic games spread over --seasons seasons (the clues of
+tests/test_page.html, with clue text made unique to the game), then times draws of --n clues under a few filters:
+
+    build ms: one-off cost of building the filter's sample index, on its first draw.
+    p50/p99 ms: latency of each draw after that.
+
+    $ python3 -m benchmarks.bench_sampling --games 9000 --draws 200
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from scraper import ClueSampler, Database
+from scraper.parser_backends import parse_game_markup
+from scraper.query import naive_sample
+from benchmarks.bench_sqlite_writer import unique_games
+from benchmarks.local_jarchive import TEST_PAGE_PATH
+
+FILTERS = (
+        ("none", {}),
+        ("season", {"season": 20}),
+        ("round + value", {"round_number": 2, "value": 800}),
+        ("daily double", {"daily_double": True}),
+        ("season + round", {"season": 20, "round_number": 1})
+        )
+
+
+def build_database(db_path, games, seasons):
+    with open(TEST_PAGE_PATH, "r", encoding="utf-8") as f:
+        template = parse_game_markup(f.read())
+    database = Database.factory(db_path, games_per_flush=500)
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_connection()
+    for game in unique_games(template, games):
+        game.season = 1 + game.game_id * seasons // (games + 1)
+        database.save(game)
+    database.cleanup()
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2] * 1000, ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000
+
+
+def time_draws(draw, draws):
+    samples = []
+    for _ in range(draws):
+        start = time.perf_counter()
+        draw()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=9000)
+    parser.add_argument("--seasons", type=int, default=40)
+    parser.add_argument("--draws", type=int, default=100)
+    parser.add_argument("--n", type=int, default=10, help="Clues per draw.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "sampling.db")
+        build_database(db_path, args.games, args.seasons)
+        conn = sqlite3.connect(db_path)
+        print("{:,} clues, {} draws of {} clues per filter".format(
+                conn.execute("""SELECT COUNT(*) FROM clues""").fetchone()[0], args.draws, args.n))
+        sampler = ClueSampler(db_path, rng=random.Random(0))
+        print("{:<16} {:>9} {:>12} {:>12} {:>12} {:>12}".format("filter", "build ms", "random p50", "random p99",
+                "index p50", "index p99"))
+        for name, filters in FILTERS:
+            start = time.perf_counter()
+            sampler.prepare(**filters)
+            build_ms = (time.perf_counter() - start) * 1000
+            naive = time_draws(lambda: naive_sample(conn, args.n, **filters), args.draws)
+            indexed = time_draws(lambda: sampler.sample(args.n, **filters), args.draws)
+            print("{:<16} {:>9.1f} {:>12.2f} {:>12.2f} {:>12.3f} {:>12.3f}".format(name, build_ms, *naive, *indexed))
+        sampler.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Clue search latency: LIKE '%word%' table scans against the FTS5 index, plus the cost of keeping the index.
+
+Builds a scratch SQLite database of --games synthetic games (the clues of tests/test_page.html, with game-unique
+category titles and a word unique to each clue), then reports:
+
+    save s: wall time to save every game with no index, with the index synced on save, and rebuilt after the crawl.
+    p50/p99 ms: latency of single-word searches. "common" words appear in every game; "rare" words appear in one clue,
+        which is the worst case for a LIKE scan.
+
+    $ python3 -m benchmarks.bench_search --games 4000 --queries 200
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+
+from scraper import ClueSearch, Database
+from scraper.parser_backends import parse_game_markup
+from benchmarks.local_jarchive import TEST_PAGE_PATH
+
+LIKE_SQL = """SELECT clues.id, categories.title, clues.question, clues.answer
+            FROM clues JOIN categories ON categories.id = clues.category_id
+            WHERE clues.question LIKE ? OR clues.answer LIKE ? OR categories.title LIKE ?
+            LIMIT ?"""
+
+
+def rare_word(game_id, clue_index):
+    return "zq{:x}x{}".format(game_id, clue_index)
+
+
+def synthetic_games(games):
+    """Yields game dicts shaped like parsed test_page.html games. Each clue's question ends with a word of its own."""
+
+    with open(TEST_PAGE_PATH, "r", encoding="utf-8") as f:
+        template = parse_game_markup(f.read()).to_dict()
+    for game_id in range(games):
+        clue_index = iter(range(1000))
+        yield {"{} #{}".format(title, game_id): [{"question": "{} {}".format(clue["question"], rare_word(game_id, next(clue_index))),
+                        "answer": clue["answer"]}
+                    for clue in clues]
+                for title, clues in template.items()}
+
+
+def build_database(db_path, games, fts):
+    database = Database.factory(db_path, fts=fts)
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_connection()
+    start = time.perf_counter()
+    for game in synthetic_games(games):
+        database.save(game)
+    database.cleanup()
+    return time.perf_counter() - start
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2] * 1000, ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000
+
+
+def time_queries(search, words):
+    samples = []
+    for word in words:
+        start = time.perf_counter()
+        search(word)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("{:<16} {:>9}".format("index", "save s"))
+        for fts in (None, "rebuild", "sync"):
+            db_path = os.path.join(tmp_dir, "{}.db".format(fts or "none"))
+            print("{:<16} {:>9.2f}".format(fts or "none", build_database(db_path, args.games, fts)))
+
+        conn = sqlite3.connect(db_path)
+        clue_count = conn.execute("""SELECT COUNT(*) FROM clues""").fetchone()[0]
+        text = " ".join(row[0] for row in conn.execute("""SELECT question FROM clues LIMIT 2000"""))
+        vocabulary = sorted({word.lower() for word in re.findall(r"[A-Za-z]{5,}", text) if not word.startswith("zq")})
+        rng = random.Random(0)
+        common_words = rng.choices(vocabulary, k=args.queries)
+        rare_words = [rare_word(rng.randrange(args.games), rng.randrange(5)) for _ in range(args.queries)]
+
+        def like_search(word):
+            pattern = "%{}%".format(word)
+            return conn.execute(LIKE_SQL, (pattern, pattern, pattern, args.limit)).fetchall()
+
+        clue_search = ClueSearch(db_path)
+        fts_search = lambda word: clue_search.search(word, args.limit)
+        print("\n{:,} clues, {} queries of each kind".format(clue_count, args.queries))
+        print("{:<22} {:>9} {:>9}".format("search", "p50 ms", "p99 ms"))
+        for kind, words in (("common", common_words), ("rare", rare_words)):
+            print("{:<22} {:>9.2f} {:>9.2f}".format("LIKE scan, " + kind, *time_queries(like_search, words)))
+            print("{:<22} {:>9.2f} {:>9.2f}".format("FTS5 ranked, " + kind, *time_queries(fts_search, words)))
+        clue_search.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
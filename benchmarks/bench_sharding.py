@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Rebuilds an SQLite database from a page archive with one writer, and with a sharded ingest in several processes.
+
+A page archive of --seasons * --games game pages, rendered from tests/test_page.html with clue text made unique to each
+game, and of their season pages, is written to a temporary directory. It is then replayed:
+
+    replay: ArchiveReplayScraper, parsing in --threads threads and saving through one SqliteDatabase.
+    shards xN: scraper.sharding.sharded_ingest in N processes, for each N in --processes, merged into one file.
+
+For each, the wall time, the part of it spent merging, games and clues stored, and the database size are reported.
+Sharding only helps with more than one core; the merge is the part that does not scale.
+
+    $ python3 -m benchmarks.bench_sharding --seasons 8 --games 100 --processes 1 2 4 8 --shard-by season
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from scraper import ArchiveReplayScraper, PageArchive
+from scraper.database import SqliteDatabase
+from scraper.sharding import sharded_ingest
+from benchmarks.local_jarchive import SEASON_PAGE_TEMPLATE, SEASON_ROW_TEMPLATE, TEST_PAGE_PATH, render_game_page
+
+BASE_URL = "http://www.j-archive.com"
+
+
+def write_archive(archive_dir, seasons, games_per_season):
+    with open(TEST_PAGE_PATH, "r", encoding="utf-8") as f:
+        template = f.read()
+    archive = PageArchive(archive_dir)
+    for season in range(1, seasons + 1):
+        game_ids = range((season - 1) * games_per_season, season * games_per_season)
+        rows = "\n".join(SEASON_ROW_TEMPLATE.format(base_url=BASE_URL, game_id=game_id) for game_id in game_ids)
+        archive.put("{}/showseason.php?season={}".format(BASE_URL, season), SEASON_PAGE_TEMPLATE.format(rows=rows))
+        for game_id in game_ids:
+            archive.put("{}/showgame.php?game_id={}".format(BASE_URL, game_id), render_game_page(template, game_id))
+    archive.close()
+
+
+def table_counts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return tuple(conn.execute("""SELECT COUNT(*) FROM {}""".format(table)).fetchone()[0] for table in ("games", "clues"))
+    finally:
+        conn.close()
+
+
+def replay(archive_dir, db_path, args):
+    scraper = ArchiveReplayScraper(SqliteDatabase(db_path), archive=PageArchive(archive_dir), worker_threads=args.threads,
+            parser_backend=args.parser)
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraper.start()
+        scraper.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seasons", type=int, default=8)
+    parser.add_argument("--games", type=int, default=100, help="Games per season.")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--shard-by", choices=["hash", "season"], default="hash")
+    parser.add_argument("--threads", type=int, default=4, help="Parsing threads of the single writer replay.")
+    parser.add_argument("--parser", default="lxml")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive_dir = os.path.join(tmp_dir, "archive")
+        write_archive(archive_dir, args.seasons, args.games)
+        print("{} archived games; {} cores; sharded by {}".format(args.seasons * args.games, os.cpu_count(), args.shard_by))
+        print("{:<10} {:>8} {:>14} {:>7} {:>8} {:>9}".format("ingest", "seconds", "merge seconds", "games", "clues", "MB"))
+        runs = [("replay", None)] + [("shards x{}".format(n), n) for n in args.processes]
+        for name, processes in runs:
+            db_path = os.path.join(tmp_dir, "{}.db".format(name.replace(" ", "")))
+            start = time.monotonic()
+            if processes is None:
+                replay(archive_dir, db_path, args)
+                merge_seconds = 0.0
+            else:
+                merge_seconds = sharded_ingest(archive_dir, db_path, processes, shard_by=args.shard_by,
+                        parser_backend=args.parser)["merge_seconds"]
+            elapsed = time.monotonic() - start
+            games, clues = table_counts(db_path)
+            print("{:<10} {:>8.2f} {:>14.2f} {:>7} {:>8} {:>9.1f}".format(name, elapsed, merge_seconds, games, clues,
+                    os.path.getsize(db_path) / 1e6))
+
+
+if __name__ == "__main__":
+    main()
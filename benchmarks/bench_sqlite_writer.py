@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""SQLite insert throughput for different numbers of games per transaction.
+
+Every game saved is the parsed content of tests/test_page.html, with clue text made unique to the game so no clue is
+skipped as a duplicate.
+
+    $ python3 -m benchmarks.bench_sqlite_writer --games 2000 --games-per-flush 1 10 100
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from scraper.database import SqliteDatabase
+from scraper.models import Category, Game
+from scraper.parser_backends import parse_game_markup
+from benchmarks.local_jarchive import TEST_PAGE_PATH
+
+
+def unique_games(template, games):
+    return [Game([Category(category.title, category.round_number, ["{} #{}".format(q, game_id) for q in category.questions],
+                    category.answers, category.values, category.daily_doubles) for category in template],
+                url="http://www.j-archive.com/showgame.php?game_id={}".format(game_id))
+            for game_id in range(1, games + 1)]
+
+
+def games_per_second(games, games_per_flush):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = SqliteDatabase(os.path.join(tmp_dir, "bench.db"), games_per_flush=games_per_flush)
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.init_connection()
+        start = time.perf_counter()
+        for game in games:
+            database.save(game)
+        database.cleanup()
+        return len(games) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--games-per-flush", type=int, nargs="+", default=[1, 10, 50, 200])
+    args = parser.parse_args()
+
+    with open(TEST_PAGE_PATH, "r") as f:
+        games = unique_games(parse_game_markup(f.read()), args.games)
+
+    print("{:>16} {:>12}".format("games/flush", "games/sec"))
+    for games_per_flush in args.games_per_flush:
+        print("{:>16} {:>12.0f}".format(games_per_flush, games_per_second(games, games_per_flush)))
+
+
+if __name__ == "__main__":
+    main()
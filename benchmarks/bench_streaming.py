@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Per-page latency and parse memory of the streaming parser against parsing the whole downloaded page.
+
+A benchmarks.local_jarchive site is started in its own process. It sends every game page in --trickle pieces spread over
+--latency seconds, the way a large page arrives from a distant server. Each game page is then requested and parsed by:
+
+    bs4, lxml: the whole body is downloaded with HttpTransport.get_text, then parsed.
+    stream: HttpTransport.iter_text chunks are fed to a StreamingGameParser as they arrive.
+
+For each, the mean and p90 time from request to models.Game is reported, along with the peak Python memory traced
+while parsing one page that is already in memory. lxml builds its tree in libxml2, outside tracemalloc's view, so no
+peak is shown for it.
+
+    $ python3 -m benchmarks.bench_streaming --pages 40 --latency 0.2 --trickle 8
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.local_jarchive import TEST_PAGE_PATH
+from scraper.parser_backends import StreamingGameParser, get_parser_backend
+from scraper.transport import HttpTransport
+
+
+def parse_downloaded(transport, backend, url):
+    return get_parser_backend(backend).parse_game(transport.get_text(url), url)
+
+
+def parse_streamed(transport, backend, url):
+    parser = StreamingGameParser()
+    for chunk in transport.iter_text(url):
+        parser.feed(chunk)
+    parser.close()
+    return parser.game(url)
+
+
+def peak_parse_bytes(backend, markup):
+    tracemalloc.start()
+    get_parser_backend(backend).parse_game(markup)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds over which each game page is sent.")
+    parser.add_argument("--trickle", type=int, default=8, help="Pieces each game page is sent in.")
+    args = parser.parse_args()
+
+    command = [sys.executable, "-m", "benchmarks.local_jarchive", "--seasons", "1", "--games", str(args.pages),
+            "--latency", str(args.latency), "--trickle", str(args.trickle)]
+    site = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True)
+    base_url = site.stdout.readline().strip()
+    urls = ["{}/showgame.php?game_id={}".format(base_url, game_id) for game_id in range(args.pages)]
+    with open(TEST_PAGE_PATH, "r") as f:
+        markup = f.read()
+
+    runs = [("bs4", parse_downloaded), ("lxml", parse_downloaded), ("stream", parse_streamed)]
+    transport = HttpTransport()
+    try:
+        print("{} pages, each sent in {} pieces over {}s".format(args.pages, args.trickle, args.latency))
+        print("{:<8} {:>10} {:>10} {:>14}".format("parser", "mean ms", "p90 ms", "parse peak KB"))
+        for backend, parse in runs:
+            try:
+                get_parser_backend(backend)
+            except ValueError as e:
+                print("Skipping {}: {}".format(backend, e))
+                continue
+            parse(transport, backend, urls[0])  # Opens the connection.
+            latencies = []
+            for url in urls:
+                start = time.perf_counter()
+                parse(transport, backend, url)
+                latencies.append(time.perf_counter() - start)
+            p90 = statistics.quantiles(latencies, n=10)[-1]
+            peak = "-" if backend == "lxml" else "{:.0f}".format(peak_parse_bytes(backend, markup) / 1024)
+            print("{:<8} {:>10.1f} {:>10.1f} {:>14}".format(backend, statistics.mean(latencies) * 1000, p90 * 1000, peak))
+    finally:
+        transport.close()
+        site.terminate()
+        site.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Crawls a local j-archive through a connection per request, and through scraper.transport.HttpTransport.
+
+A benchmarks.local_jarchive site is started in its own process, gzipping pages and delaying every new connection by
+--connect-latency to stand in for the handshakes of a remote server. A fraction --error-rate of season and game
+requests is answered with a 503 carrying Retry-After: --retry-after. The whole site is then crawled three times:
+
+    per-request: requests.get for every page and no retries, as the scraper did before HttpTransport.
+    pooled: HttpTransport with retries turned off, so only keep-alive connections and compression differ.
+    pooled+retry: HttpTransport with its default retries and backoff.
+
+For each, the wall time, games stored, games lost to errors, connections opened and reused, and retries are reported.
+
+    $ python3 -m benchmarks.bench_transport --seasons 2 --games 50 --latency 0.05 --connect-latency 0.1 --error-rate 0.05
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+
+class PerRequestTransport:
+    """Opens a new connection for every page, and never retries."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def get_text(self, url):
+        self.metrics.http_requests.inc()
+        self.metrics.http_connections_opened.inc()
+        response = requests.get(url)
+        response.raise_for_status()
+        return response.text
+
+    def close(self):
+        return
+
+
+def run_one(name, base_url, threads, parser_backend, tmp_dir):
+    from scraper import Database, JArchiveScraper
+    from scraper.transport import HttpTransport
+
+    database = Database.factory(os.path.join(tmp_dir, name + ".db"))
+    crawler = JArchiveScraper(database, base_url=base_url, worker_threads=threads, parser_backend=parser_backend)
+    if name == "per-request":
+        crawler.transport = PerRequestTransport(crawler.metrics)
+    elif name == "pooled":
+        crawler.transport = HttpTransport(max_retries=0, metrics=crawler.metrics)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        crawler.start()
+    crawler.cleanup()
+    return time.perf_counter() - start, crawler.metrics
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--games", type=int, default=50, help="Games per season.")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--connect-latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--parser", default="lxml", help="Parser backend; lxml keeps parsing from dominating the crawl.")
+    args = parser.parse_args()
+
+    command = [sys.executable, "-m", "benchmarks.local_jarchive", "--seasons", str(args.seasons), "--games", str(args.games),
+            "--latency", str(args.latency), "--connect-latency", str(args.connect_latency), "--error-rate",
+            str(args.error_rate), "--retry-after", str(args.retry_after), "--compress"]
+    site = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True)
+    base_url = site.stdout.readline().strip()
+    logging.disable(logging.CRITICAL)
+    total_games = args.seasons * args.games
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print("{} games; {} threads; {}s per connection, {}s per request, {:.0%} 503s".format(total_games, args.threads,
+                    args.connect_latency, args.latency, args.error_rate))
+            print("{:<13} {:>8} {:>7} {:>5} {:>7} {:>7} {:>8}".format("transport", "seconds", "stored", "lost", "opened",
+                    "reused", "retries"))
+            for name in ("per-request", "pooled", "pooled+retry"):
+                elapsed, metrics = run_one(name, base_url, args.threads, args.parser, tmp_dir)
+                stored = metrics.games_saved.value
+                print("{:<13} {:>8.1f} {:>7} {:>5} {:>7} {:>7} {:>8}".format(name, elapsed, stored, total_games - stored,
+                        metrics.http_connections_opened.value, metrics.http_connections_reused.value,
+                        metrics.http_retries.value))
+    finally:
+        site.terminate()
+        site.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Keeps a database up to date with a local j-archive whose current season gains a game every --air-interval seconds.
+
+A benchmarks.local_jarchive site is started in its own process, and its current season is crawled once into an SQLite
+file. That file is then kept up to date for --rounds * --period seconds in two ways:
+
+    recrawl: run.py --singleSeason is run again every --period seconds, fetching and saving the whole season each time.
+    watch: one JArchiveScraper runs with watch=True, polling the season page with conditional requests, starting every
+        --poll seconds and backing off to --period while nothing airs.
+
+For each, the requests made, season pages answered with 304 Not Modified, game pages fetched, games saved, games in
+the database at the end, and the busy time (wall time the crawls took; the watcher is counted for its whole run) are
+reported.
+
+    $ python3 -m benchmarks.bench_watch --games 100 --air-interval 3 --period 3 --rounds 4 --poll 1
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from scraper import CrawlLedger, JArchiveScraper
+from scraper.database import SqliteDatabase
+
+
+def count_games(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("""SELECT COUNT(*) FROM games""").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def make_crawler(db_path, base_url, args, **options):
+    return JArchiveScraper(SqliteDatabase(db_path), get_single_season=True, base_url=base_url,
+            worker_threads=args.threads, parser_backend=args.parser, **options)
+
+
+def crawl(crawler):
+    """Runs crawler to the end, and returns its metrics."""
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        crawler.start()
+        crawler.cleanup()
+    return crawler.metrics
+
+
+def run_recrawl(db_path, base_url, args):
+    totals = {"requests": 0, "not modified": 0, "pages": 0, "saved": 0, "busy": 0.0}
+    for _ in range(args.rounds):
+        time.sleep(args.period)
+        start = time.monotonic()
+        metrics = crawl(make_crawler(db_path, base_url, args))
+        totals["busy"] += time.monotonic() - start
+        totals["requests"] += metrics.http_requests.value
+        totals["pages"] += metrics.pages_fetched.value
+        totals["saved"] += metrics.games_saved.value
+    return totals
+
+
+def run_watch(db_path, ledger_path, base_url, args):
+    crawler = make_crawler(db_path, base_url, args, ledger=CrawlLedger(ledger_path), watch=True, watch_interval=args.poll,
+            watch_max_interval=args.period)
+    threading.Timer(args.rounds * args.period, crawler.stop_watching).start()
+    start = time.monotonic()
+    metrics = crawl(crawler)
+    return {"requests": metrics.http_requests.value, "not modified": metrics.http_not_modified.value,
+            "pages": metrics.pages_fetched.value, "saved": metrics.games_saved.value, "busy": time.monotonic() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=100, help="Games in the current season when the site starts.")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--air-interval", type=float, default=3, help="Seconds between new games on the site.")
+    parser.add_argument("--period", type=float, default=3, help="Seconds between recrawls, and longest poll interval.")
+    parser.add_argument("--rounds", type=int, default=4, help="Recrawls made.")
+    parser.add_argument("--poll", type=float, default=1, help="Shortest poll interval of the watcher.")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--parser", default="lxml")
+    args = parser.parse_args()
+
+    command = [sys.executable, "-m", "benchmarks.local_jarchive", "--seasons", "1", "--games", str(args.games),
+            "--latency", str(args.latency), "--air-interval", str(args.air_interval)]
+    site = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True)
+    base_url = site.stdout.readline().strip()
+    logging.disable(logging.CRITICAL)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            initial_path = os.path.join(tmp_dir, "initial.db")
+            crawl(make_crawler(initial_path, base_url, args))
+            print("{} games crawled; one more every {}s; kept up to date for {}s".format(count_games(initial_path),
+                    args.air_interval, args.rounds * args.period))
+            print("{:<8} {:>9} {:>13} {:>11} {:>7} {:>8} {:>13}".format("mode", "requests", "not modified",
+                    "game pages", "saved", "stored", "busy seconds"))
+            for name in ("recrawl", "watch"):
+                db_path = os.path.join(tmp_dir, name + ".db")
+                shutil.copyfile(initial_path, db_path)
+                if name == "recrawl":
+                    totals = run_recrawl(db_path, base_url, args)
+                else:
+                    totals = run_watch(db_path, os.path.join(tmp_dir, "watch.ledger"), base_url, args)
+                print("{:<8} {:>9} {:>13} {:>11} {:>7} {:>8} {:>13.1f}".format(name, totals["requests"],
+                        totals["not modified"], totals["pages"], totals["saved"], count_games(db_path), totals["busy"]))
+    finally:
+        site.terminate()
+        site.wait()
+
+
+if __name__ == "__main__":
+    main()
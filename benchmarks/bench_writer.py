@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Crawls a local j-archive while saving on the main loop, and through scraper.writer.GameWriter.
+
+A benchmarks.local_jarchive site is started in its own process. Every SQLite commit is delayed by --commit-latency,
+standing in for a slow disk or a remote database. The site is crawled three times:
+
+    main loop: JArchiveScraper saves each game itself, as it did before the writer stage, committing every
+        --games-per-flush games.
+    writer: the same database, behind a GameWriter, which commits whatever is queued, up to --max-batch games.
+    writer x2: a second database is added, which fails every commit for its first --outage seconds.
+
+For each, the wall time, games stored in each database, p90 wait of a parsed game in game_data_queue, mean games per
+commit, and games spilled are reported.
+
+    $ python3 -m benchmarks.bench_writer --seasons 2 --games 50 --commit-latency 0.2 --games-per-flush 5 --outage 3
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from scraper import JArchiveScraper
+from scraper.database import SqliteDatabase
+from scraper.exceptions import DatabaseOperationalError
+from scraper.writer import GameWriter
+
+
+class SlowCommitDatabase(SqliteDatabase):
+    """SqliteDatabase whose commits take commit_latency longer, and fail until outage_until (a time.monotonic())."""
+
+    def __init__(self, db_path, commit_latency, outage_until=0, **options):
+        super().__init__(db_path, **options)
+        self.commit_latency = commit_latency
+        self.outage_until = outage_until
+
+    def flush(self):
+        time.sleep(self.commit_latency)
+        if time.monotonic() < self.outage_until:
+            raise DatabaseOperationalError("Database unavailable")
+        super().flush()
+
+
+def count_games(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("""SELECT COUNT(*) FROM games""").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def run_one(name, args, base_url, tmp_dir):
+    start = time.monotonic()
+    paths = [os.path.join(tmp_dir, "{}-{}.db".format(name.replace(" ", ""), i)) for i in range(2 if name == "writer x2" else 1)]
+    games_per_flush = args.games_per_flush if name == "main loop" else args.max_batch  # The writer decides when to commit.
+    databases = {os.path.basename(path): SlowCommitDatabase(path, args.commit_latency, games_per_flush=games_per_flush)
+            for path in paths}
+    if name == "writer x2":
+        databases[os.path.basename(paths[1])].outage_until = start + args.outage
+    if name == "main loop":
+        database = databases[os.path.basename(paths[0])]
+    else:
+        database = GameWriter(databases, spill_dir=os.path.join(tmp_dir, name.replace(" ", "") + ".spill"),
+                max_batch=args.max_batch)
+    crawler = JArchiveScraper(database, base_url=base_url, worker_threads=args.threads, parser_backend=args.parser)
+    with contextlib.redirect_stdout(io.StringIO()):
+        crawler.start()
+        crawler.cleanup()
+    elapsed = time.monotonic() - start
+    metrics = crawler.metrics
+    if name == "main loop":
+        commits = "{:.1f}".format(args.games_per_flush)
+    else:
+        commits = "{:.1f}".format(metrics.writer_batch_games.sum / metrics.writer_batch_games.count)
+    return (elapsed, "/".join(str(count_games(path)) for path in paths), metrics.queue_wait_seconds.quantile(0.9), commits,
+            metrics.games_spilled.value)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--games", type=int, default=50, help="Games per season.")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--commit-latency", type=float, default=0.2, help="Seconds added to every commit.")
+    parser.add_argument("--games-per-flush", type=int, default=5, help="Games per commit of each database.")
+    parser.add_argument("--max-batch", type=int, default=50, help="Most games the writer commits at once.")
+    parser.add_argument("--outage", type=float, default=3, help="Seconds the second database fails every commit for.")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--parser", default="lxml")
+    args = parser.parse_args()
+
+    command = [sys.executable, "-m", "benchmarks.local_jarchive", "--seasons", str(args.seasons), "--games", str(args.games),
+            "--latency", str(args.latency)]
+    site = subprocess.Popen(command, stdout=subprocess.PIPE, universal_newlines=True)
+    base_url = site.stdout.readline().strip()
+    logging.disable(logging.CRITICAL)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            print("{} games; {}s per commit of {} games; second database down for {}s".format(args.seasons * args.games,
+                    args.commit_latency, args.games_per_flush, args.outage))
+            print("{:<10} {:>8} {:>9} {:>14} {:>13} {:>8}".format("saving", "seconds", "stored", "p90 wait ms",
+                    "games/commit", "spilled"))
+            for name in ("main loop", "writer", "writer x2"):
+                elapsed, stored, p90_wait, commits, spilled = run_one(name, args, base_url, tmp_dir)
+                print("{:<10} {:>8.1f} {:>9} {:>14.0f} {:>13} {:>8}".format(name, elapsed, stored, p90_wait * 1000, commits,
+                        spilled))
+    finally:
+        site.terminate()
+        site.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""Local stand-in for j-archive.com used by the benchmarks.
+
+Serves a home page, season pages and game pages shaped like the real site, so JArchiveScraper can be pointed at it
+with base_url. Game pages are generated from tests/test_page.html: every game keeps the page's structure, but its
+category titles and clue text are made unique to the game. Each response is delayed by a latency drawn uniformly from
+[latency - jitter, latency + jitter], and a fraction error_rate of season and game page requests fail with a 503,
+sent with a Retry-After header if retry_after is set. Each new connection is delayed by connect_latency, standing in
+for the TCP and TLS handshakes of a remote server. With trickle_chunks, a response body is instead sent in that many
+pieces spread over the latency, the way a large page arrives from a distant server. With compress, pages are gzipped for clients that accept it.
+
+With air_interval, a new game is added to the last season every air_interval seconds, the way new episodes appear on
+the current season page. Season pages carry an ETag and Last-Modified header, and are answered with a 304 Not Modified
+when a request's If-None-Match or If-Modified-Since shows the client already has them.
+
+Run as a module to serve a site from its own process, so the server does not compete with the scraper for the GIL:
+
+    $ python3 -m benchmarks.local_jarchive --seasons 5 --games 100 --latency 0.05 --jitter 0.02 --error-rate 0.01
+
+The first line printed is the base url.
+"""
+import argparse
+import email.utils
+import gzip
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEST_PAGE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "tests", "test_page.html")
+
+HOME_PAGE_TEMPLATE = """<html><body>
+<table class="fullpageheight"><tr><td><a href="showseason.php?season={season}">[current season]</a></td></tr></table>
+</body></html>"""
+
+SEASON_PAGE_TEMPLATE = """<html><body><table>
+{rows}
+</table></body></html>"""
+
+SEASON_ROW_TEMPLATE = """<tr><td align="left" valign="top" style="width:140px"><a href="{base_url}/showgame.php?game_id={game_id}">#{game_id}</a></td></tr>"""
+
+CATEGORY_NAME_REGEX = re.compile(r'(<td class="category_name">)([^<]*)(</td>)')
+CLUE_TEXT_REGEX = re.compile(r'(class="clue_text">)([^<]*)(</td>)')
+
+
+def render_game_page(template, game_id):
+    """Returns template markup with category titles and clue text made unique to game_id."""
+
+    markup = CATEGORY_NAME_REGEX.sub(lambda m: "{}{} #{}{}".format(m.group(1), m.group(2), game_id, m.group(3)), template)
+    return CLUE_TEXT_REGEX.sub(lambda m: "{}{} ({}){}".format(m.group(1), m.group(2), game_id, m.group(3)), markup)
+
+
+class _LocalJArchiveServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # The async engine opens hundreds of connections at once.
+
+
+class LocalJArchive:
+    """
+    Threaded HTTP server serving <seasons> seasons of <games_per_season> games each.
+
+    Attributes:
+        base_url (str): Root url of the running server, to pass to JArchiveScraper.
+        request_counts (dict): Number of requests served per page type ("home", "season", "game", "error"), and of
+            season pages answered with a 304 ("not modified").
+    """
+
+    def __init__(self, seasons=2, games_per_season=50, latency=0.05, jitter=0.0, error_rate=0.0, seed=0,
+            game_page_path=TEST_PAGE_PATH, port=0, retry_after=None, compress=False,
+            connect_latency=0.0, trickle_chunks=None, air_interval=None):
+        self.seasons = seasons
+        self.games_per_season = games_per_season
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.port = port
+        self.retry_after = retry_after
+        self.compress = compress
+        self.connect_latency = connect_latency
+        self.trickle_chunks = trickle_chunks
+        self.air_interval = air_interval
+        self.started_at = time.time()
+        with open(game_page_path, "r", encoding="utf-8") as f:
+            self.game_page_template = f.read()
+
+        self.request_counts = {"home": 0, "season": 0, "game": 0, "error": 0, "not modified": 0}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+        self.base_url = None
+
+    @property
+    def total_games(self):
+        return self.seasons * self.games_per_season
+
+    def aired_games(self, now=None):
+        """Returns (games added to the last season so far, time the latest one was added)."""
+
+        if not self.air_interval:
+            return 0, self.started_at
+        aired = int(((now or time.time()) - self.started_at) // self.air_interval)
+        return aired, self.started_at + aired * self.air_interval
+
+    def season_validators(self, season):
+        """Returns (ETag, Last-Modified) of a season page."""
+
+        aired, aired_at = self.aired_games() if season == self.seasons else (0, self.started_at)
+        return '"season-{}-{}"'.format(season, aired), email.utils.formatdate(int(aired_at), usegmt=True)
+
+    def start(self):
+        handler = _make_handler(self)
+        self._server = _LocalJArchiveServer(("127.0.0.1", self.port), handler)
+        self.base_url = "http://127.0.0.1:{}".format(self._server.server_address[1])
+        self._thread = threading.Thread(target=self._server.serve_forever, name="Local JArchive Server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count_request(self, page_type):
+        with self._lock:
+            self.request_counts[page_type] += 1
+
+    def draw_delay_and_error(self, page_type):
+        """Returns (seconds to delay the response, whether to fail it). The home page never fails."""
+
+        with self._lock:
+            delay = self._random.uniform(self.latency - self.jitter, self.latency + self.jitter)
+            fail = page_type != "home" and self._random.random() < self.error_rate
+        return max(delay, 0.0), fail
+
+    def render(self, path):
+        """Returns (page type, body bytes) for a request path, or (None, None) if no page exists at path."""
+
+        if path in ("", "/"):
+            return "home", HOME_PAGE_TEMPLATE.format(season=self.seasons).encode()
+
+        season_match = re.match(r"/showseason\.php\?season=(\d+)$", path)
+        if season_match:
+            season = int(season_match.group(1))
+            if not 1 <= season <= self.seasons:
+                return None, None
+            first_game_id = (season - 1) * self.games_per_season
+            game_count = self.games_per_season + (self.aired_games()[0] if season == self.seasons else 0)
+            rows = "\n".join(SEASON_ROW_TEMPLATE.format(base_url=self.base_url, game_id=game_id)
+                    for game_id in range(first_game_id, first_game_id + game_count))
+            return "season", SEASON_PAGE_TEMPLATE.format(rows=rows).encode()
+
+        game_match = re.match(r"/showgame\.php\?game_id=(\d+)$", path)
+        if game_match:
+            return "game", render_game_page(self.game_page_template, int(game_match.group(1))).encode()
+
+        return None, None
+
+
+def _make_handler(site):
+    class LocalJArchiveHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            if site.connect_latency:
+                time.sleep(site.connect_latency)
+
+        def do_GET(self):
+            page_type, body = site.render(self.path)
+            if page_type is None:
+                self.send_error(404)
+                return
+            delay, fail = site.draw_delay_and_error(page_type)
+            trickle = site.trickle_chunks if page_type == "game" and not fail else None
+            if not trickle:
+                time.sleep(delay)
+            if fail:
+                site.count_request("error")
+                self.send_response(503)
+                if site.retry_after is not None:
+                    self.send_header("Retry-After", str(site.retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            validators = site.season_validators(int(self.path.rsplit("=", 1)[1])) if page_type == "season" else None
+            if validators and self._not_modified(*validators):
+                site.count_request("not modified")
+                self.send_response(304)
+                self.send_header("ETag", validators[0])
+                self.end_headers()
+                return
+            site.count_request(page_type)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            if validators:
+                self.send_header("ETag", validators[0])
+                self.send_header("Last-Modified", validators[1])
+            if site.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                body = gzip.compress(body, compresslevel=6)
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if not trickle:
+                self.wfile.write(body)
+                return
+            piece_size = -(-len(body) // trickle)
+            for start in range(0, len(body), piece_size):
+                time.sleep(delay / trickle)
+                self.wfile.write(body[start:start + piece_size])
+                self.wfile.flush()
+
+        def _not_modified(self, etag, last_modified):
+            if "If-None-Match" in self.headers:
+                return self.headers["If-None-Match"] == etag  # Takes precedence over If-Modified-Since.
+            since = self.headers.get("If-Modified-Since")
+            return since is not None and email.utils.parsedate_to_datetime(since) >= email.utils.parsedate_to_datetime(last_modified)
+
+        def log_message(self, format, *args):
+            return  # Keep benchmark output readable.
+
+    return LocalJArchiveHandler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--games", type=int, default=50, help="Games per season.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean seconds slept before each response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum seconds added to or removed from the latency.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of season and game requests answered with a 503.")
+    parser.add_argument("--retry-after", type=int, help="Retry-After seconds sent with injected 503s.")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="Seconds slept when a connection is opened.")
+    parser.add_argument("--trickle", type=int, help="Send game pages in this many pieces spread over the latency.")
+    parser.add_argument("--compress", action="store_true", help="Gzip pages for clients that accept it.")
+    parser.add_argument("--air-interval", type=float, help="Seconds between new games added to the last season.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    site = LocalJArchive(args.seasons, args.games, args.latency, args.jitter, args.error_rate, args.seed, port=args.port,
+            retry_after=args.retry_after, compress=args.compress, connect_latency=args.connect_latency,
+            trickle_chunks=args.trickle, air_interval=args.air_interval)
+    site.start()
+    print(site.base_url)
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
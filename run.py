@@ -10,9 +10,80 @@ This module contains the CLI to begin scraping j-archive.com. Two options may be
 
         If the connection parameter is a URI beginning with mongodb://, the scraper will attempt to connect to this database.
 
+        Games can also be streamed to files: jsonl://<path>, jsonl+gzip://<path> and jsonl+zstd://<path> write one JSON
+        document per category, and parquet://<directory> writes Parquet files with one row per clue. zstd requires the
+        zstandard package, and Parquet requires pyarrow.
+
+        Repeat --db to save every game to several databases at once. Games are saved on a writer thread per database,
+        not on the crawl's main loop; each writer commits every game waiting for it at once, and a database that falls
+        behind or fails does not hold up the crawl or the other databases (see scraper/writer.py).
+
+    --spill-dir <directory>: Where games waiting for a database that is behind or failing are kept, one file per
+        database, until it catches up. Defaults to <sqlite file>.spill. A later crawl writes out whatever a killed one
+        left there.
+
     --season <season integer>: Scrape a single season of games from j-archive. If not specified, scraper will begin scraping games from
         the most current season, and will continue until all games have been scraped.
 
+    --fts <sync|rebuild>: Maintain an SQLite full-text index of clue questions, answers and category titles, either
+        as each game is saved, or rebuilt in bulk when the crawl ends. Search it with "python3 -m scraper.search".
+
+    --engine <threaded|async>: Fetch game pages with a pool of worker threads (default), or with an asyncio event loop
+        that keeps up to --concurrency requests in flight. The async engine requires aiohttp.
+
+    --parse-processes <integer>: Parse game pages in a pool of worker processes instead of in the fetching threads.
+        Parsing is CPU bound, so this lets it use every core once fetching is fast. Fetching threads hand pages to the
+        pool without waiting for them, so the pool can have more processes than --threads.
+
+    --parser <bs4|lxml|stream>: Parser used for game pages. bs4 (default) is pure Python; lxml is several times
+        faster and requires the lxml package. stream builds no tree, and parses each page while it downloads.
+
+    --queue-size <integer>: Maximum number of queued game urls, and of parsed games waiting to be saved. Workers stop
+        fetching while the database is behind, which keeps memory flat on long crawls.
+
+    --ledger [path]: Record the status of every game in a crawl ledger. Games the ledger marks complete are skipped, so
+        an interrupted crawl can be resumed by running the same command again. Defaults to <sqlite file>.ledger.
+
+    --coordinate [path]: Share the crawl with every other run.py process started with the same store file. Seasons and
+        games become work units that each process leases a few at a time, renewing its leases while it works; the
+        leases of a process that dies expire after --lease-seconds (default 60) and are taken over by the others. The
+        store also records game status like --ledger, so running the command again retries failed games. Defaults to
+        <sqlite file>.work. Threaded engine only. SQLite files shared this way are committed after every game unless
+        --games-per-flush is given.
+
+    --timeout <seconds>: Read timeout of every page request (default 30). Connecting times out after 5 seconds.
+
+    --retries <integer>: Times a page request that failed to connect, timed out, or was answered with a 429 or 5xx
+        status is retried, with exponential backoff, before the page is given up on (default 3). A Retry-After header
+        is honored. Threaded engine only.
+
+    --season-index [path]: Cache the game urls of closed seasons. Later crawls only request the current season's page.
+        Defaults to <sqlite file>.seasons.json.
+
+    --watch: Keep running, and save each new game as soon as it is listed on the current season page (or on --season's
+        page). The page is polled with conditional requests, so an unchanged page costs an empty 304 response, and only
+        games not already stored are fetched. Polls start --watch-interval seconds apart (default 300), and back off
+        to --watch-max-interval (default 10800) while no games are found. Keeps a ledger, at the --ledger path or its
+        default. Stop with Ctrl-C. Threaded engine only.
+
+    --archive <directory>: Store the compressed raw markup of every fetched page in a page archive.
+
+    --from-archive <directory>: Rebuild the database by re-parsing every game page in a page archive. No requests are made.
+
+    --shard-processes <integer>: With --from-archive and one SQLite --db, parse and save the archive in this many
+        processes, each writing shards to SQLite files of its own, and merge the shards into the database at the end.
+        --shard-by hash (default) splits games by a hash of their url, and --shard-by season makes a shard of each
+        season. See scraper/sharding.py.
+
+    --metrics-port <port>: Serve live pipeline metrics in the Prometheus text format at http://127.0.0.1:<port>/metrics.
+        Covers fetch, parse, queue wait and save latencies, queue depths, worker utilization and failure counts.
+
+    --metrics-file <path>: Write a JSON snapshot of the same metrics to <path> every --metrics-interval seconds
+        (default 10), and once more when the crawl ends.
+
+    --profile [directory]: Profile every pipeline thread, and write merged pstats files plus collapsed stack files for
+        flame graphs, broken down by pipeline stage, to <directory> (default "profile"). See scraper/profiling.py.
+
     Examples:
         
         $python3 run.py 
@@ -26,7 +97,12 @@ This module contains the CLI to begin scraping j-archive.com. Two options may be
 """
 import sys
 import argparse
-from scraper import JArchiveScraper, Database 
+# Only what the argument parser needs is imported up front. The crawler, its HTTP stack, parsers and database drivers
+# are imported in main() once the arguments are known, so --help and argument errors return immediately.
+from scraper.coordination import DEFAULT_LEASE_SECONDS
+from scraper.search import FTS_MODES
+from scraper.profiling import DEFAULT_SAMPLE_INTERVAL, PipelineProfiler
+from scraper.parser_backends import DEFAULT_PARSER_BACKEND, PARSER_BACKENDS, get_parser_backend
 import logging
 
 def init_logging():
@@ -47,12 +123,59 @@ def arg_positive_int(value):
     return val
 
 
+def default_sidecar_path(database, extension):
+    """Crawl state files are kept next to SQLite files. Other databases use files in the working directory."""
+
+    from scraper.database import SqliteDatabase
+    if isinstance(database, SqliteDatabase):
+        return database.db_path + extension
+    return "jtrivia" + extension
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--season", type=arg_positive_int, nargs="?", help="Scrape a single season of games on j-archive.")
-    parser.add_argument("--db", type=str, nargs="?", help="Enter database connection param.", default="sqlite:///jtrivia.db" )
+    parser.add_argument("--db", type=str, action="append", help="Enter database connection param. Repeat to save to several "
+            "databases (default sqlite:///jtrivia.db).")
+    parser.add_argument("--spill-dir", type=str, help="Directory for games waiting on a database that is behind or failing. "
+            "Defaults to a directory next to the database.")
     parser.add_argument("--singleSeason", help="Scrape only a single season.", action="store_true")
     parser.add_argument("--debug", help="Activate debug logging", action="store_true")
+    parser.add_argument("--engine", choices=["threaded", "async"], default="threaded", help="Fetch pages with a thread pool, or with an asyncio event loop.")
+    parser.add_argument("--threads", type=arg_positive_int, default=7, help="Number of fetch worker threads. Not used by the async engine.")
+    parser.add_argument("--concurrency", type=arg_positive_int, default=100, help="Maximum in-flight page requests for the async engine.")
+    parser.add_argument("--parse-processes", type=arg_positive_int, help="Parse game pages in a pool of this many processes.")
+    parser.add_argument("--games-per-flush", type=arg_positive_int, help="Most games grouped into one SQLite transaction or MongoDB bulk write.")
+    parser.add_argument("--fts", choices=FTS_MODES, help="Maintain an SQLite full-text index of clues, synced on save or rebuilt at the end.")
+    parser.add_argument("--parser", choices=sorted(PARSER_BACKENDS), default=DEFAULT_PARSER_BACKEND, help="HTML parser backend for game pages.")
+    parser.add_argument("--queue-size", type=arg_positive_int, default=64, help="Maximum number of queued game urls, and of parsed games waiting to be saved.")
+    parser.add_argument("--ledger", type=str, nargs="?", const="", help="Record crawled games in a ledger, and skip games it marks complete. "
+            "Defaults to a file next to the database.")
+    parser.add_argument("--coordinate", type=str, nargs="?", const="", help="Share the crawl with other processes through a work "
+            "store file. Defaults to a file next to the database.")
+    parser.add_argument("--lease-seconds", type=arg_positive_int, default=DEFAULT_LEASE_SECONDS, help="Seconds before the work "
+            "units of a process that stopped renewing them are taken over.")
+    parser.add_argument("--timeout", type=float, help="Read timeout of page requests, in seconds (default 30).")
+    parser.add_argument("--retries", type=int, help="Retries of a page request that failed to connect, timed out, or "
+            "got a 429 or 5xx response (default 3).")
+    parser.add_argument("--season-index", type=str, nargs="?", const="", help="Cache the game lists of closed seasons, so later crawls "
+            "only request the current season page. Defaults to a file next to the database.")
+    parser.add_argument("--watch", action="store_true", help="Keep polling the current season page, and save new games as they are listed.")
+    parser.add_argument("--watch-interval", type=arg_positive_int, default=5 * 60, help="Seconds between polls while new games are found.")
+    parser.add_argument("--watch-max-interval", type=arg_positive_int, default=3 * 60 * 60, help="Most seconds between polls.")
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument("--archive", type=str, help="Directory to store the raw markup of every fetched page in.")
+    archive_group.add_argument("--from-archive", type=str, help="Re-parse and save games from a page archive directory, without network access.")
+    parser.add_argument("--shard-processes", type=arg_positive_int, help="Replay --from-archive in this many processes, "
+            "each saving to shard files, merged into the SQLite database at the end.")
+    parser.add_argument("--shard-by", choices=["hash", "season"], default="hash", help="Split archived games into "
+            "shards by a hash of their url, or by season.")
+    parser.add_argument("--metrics-port", type=arg_positive_int, help="Serve Prometheus metrics on this local port.")
+    parser.add_argument("--metrics-file", type=str, help="Periodically write a JSON metrics snapshot to this file.")
+    parser.add_argument("--metrics-interval", type=arg_positive_int, default=10, help="Seconds between metrics file snapshots.")
+    parser.add_argument("--profile", type=str, nargs="?", const="profile", help="Profile every pipeline thread, and write "
+            "pstats and collapsed stack files to this directory.")
+    parser.add_argument("--profile-interval", type=float, default=DEFAULT_SAMPLE_INTERVAL, help="Seconds between stack samples.")
     args = parser.parse_args()
 
     if args.debug:
@@ -60,9 +183,118 @@ def main():
     else:
         logging.disable(logging.CRITICAL)
 
-    database = Database.factory(args.db)
-    scraper = JArchiveScraper(database, args.season, get_single_season=args.singleSeason)
-    scraper.start()
+    from scraper import JArchiveScraper, ArchiveReplayScraper, Database, PageArchive, CrawlLedger, SeasonIndex, SqliteWorkStore
+    from scraper.metrics import MetricsSnapshotWriter, serve_metrics
+    from scraper.writer import GameWriter, sink_name
+
+    try:
+        get_parser_backend(args.parser)
+    except ValueError as e:
+        parser.error(str(e))
+    connection_params = args.db or ["sqlite:///jtrivia.db"]
+    if len(set(map(sink_name, connection_params))) < len(connection_params):
+        parser.error("--db was given the same database twice")
+    if args.coordinate is not None and (args.ledger is not None or args.engine == "async" or args.from_archive):
+        parser.error("--coordinate cannot be combined with --ledger, --engine async or --from-archive")
+    if args.coordinate is not None and any(Database.engine_name(param) not in ("sqlite", "mongodb") for param in connection_params):
+        parser.error("--coordinate requires SQLite or MongoDB databases; file sinks cannot be shared between processes")
+    if args.watch and (args.coordinate is not None or args.engine == "async" or args.from_archive):
+        parser.error("--watch cannot be combined with --coordinate, --engine async or --from-archive")
+    if args.watch and args.ledger is None:
+        args.ledger = ""  # Watching diffs each season page against the games the ledger records as stored.
+
+    if args.shard_processes:
+        if not args.from_archive or len(connection_params) > 1 or Database.engine_name(connection_params[0]) != "sqlite":
+            parser.error("--shard-processes requires --from-archive and a single SQLite --db")
+        run_sharded_ingest(args, connection_params[0])
+        return
+
+    databases = {}
+    for param in connection_params:
+        database_options = {"games_per_flush": args.games_per_flush} if args.games_per_flush else {}
+        if args.coordinate is not None and not args.games_per_flush and Database.engine_name(param) == "sqlite":
+            # Other processes write to the same file, and wait while a transaction is open; keep each one to a single game.
+            database_options["games_per_flush"] = 1
+        if args.fts and Database.engine_name(param) == "sqlite":
+            database_options["fts"] = args.fts
+        try:
+            databases[sink_name(param)] = Database.factory(param, **database_options)
+        except ValueError as e:
+            parser.error(str(e))
+    database = next(iter(databases.values()))  # Crawl state files are kept next to the first database.
+    writer_options = {"max_batch": args.games_per_flush} if args.games_per_flush else {}
+    writer = GameWriter(databases, spill_dir=args.spill_dir or default_sidecar_path(database, ".spill"), **writer_options)
+    archive = PageArchive(args.archive or args.from_archive) if (args.archive or args.from_archive) else None
+    ledger = CrawlLedger(args.ledger or default_sidecar_path(database, ".ledger")) if args.ledger is not None else None
+    season_index = SeasonIndex(args.season_index or default_sidecar_path(database, ".seasons.json")) if args.season_index is not None else None
+    work_store = SqliteWorkStore(args.coordinate or default_sidecar_path(database, ".work"),
+            lease_seconds=args.lease_seconds) if args.coordinate is not None else None
+    scraper_options = {
+            "archive": archive,
+            "ledger": ledger,
+            "season_index": season_index,
+            "parse_processes": args.parse_processes,
+            "parser_backend": args.parser,
+            "queue_size": args.queue_size,
+            "worker_threads": args.threads
+            }
+    if args.timeout is not None:
+        from scraper.transport import DEFAULT_TIMEOUT
+        scraper_options["http_timeout"] = (DEFAULT_TIMEOUT[0], args.timeout)
+    if args.retries is not None:
+        scraper_options["http_retries"] = args.retries
+    if args.from_archive:
+        scraper = ArchiveReplayScraper(writer, **scraper_options)
+    elif args.engine == "async":
+        from scraper.async_engine import AsyncJArchiveScraper  # aiohttp is only needed for this engine.
+        scraper = AsyncJArchiveScraper(writer, args.season, get_single_season=args.singleSeason, concurrency=args.concurrency,
+                **scraper_options)
+    else:
+        scraper = JArchiveScraper(writer, args.season, get_single_season=args.singleSeason, work_store=work_store,
+                watch=args.watch, watch_interval=args.watch_interval, watch_max_interval=args.watch_max_interval,
+                **scraper_options)
+
+    snapshot_writer = None
+    if args.metrics_port:
+        serve_metrics(scraper.metrics, args.metrics_port)
+    if args.metrics_file:
+        snapshot_writer = MetricsSnapshotWriter(scraper.metrics, args.metrics_file, args.metrics_interval)
+        snapshot_writer.start()
+    profiler = PipelineProfiler(args.profile, args.profile_interval) if args.profile else None
+    if profiler:
+        profiler.start()
+    try:
+        try:
+            scraper.start()
+        except KeyboardInterrupt:
+            if not args.watch:
+                raise
+            print("Stopped watching. Saving the games already fetched")  # Games still being fetched are left to the next run.
+            scraper.finish_watching()
+        scraper.cleanup()
+    finally:
+        if snapshot_writer:
+            snapshot_writer.stop()
+        if profiler:
+            profiler.stop()
+            profiler.write()
+            profiler.print_summary()
+
+def run_sharded_ingest(args, connection_param):
+    from scraper.exceptions import DatabaseOperationalError
+    from scraper.sharding import sharded_ingest
+
+    try:
+        result = sharded_ingest(args.from_archive, connection_param, args.shard_processes, shard_by=args.shard_by,
+                parser_backend=args.parser, fts=args.fts)
+    except DatabaseOperationalError as e:
+        print("Sharded ingest failed: {}".format(e))
+        sys.exit(1)
+    saved = sum(games for games, _, _ in result["shards"].values())
+    print("{:,} games saved to {} shards, merged in {:.1f}s".format(saved, len(result["shards"]), result["merge_seconds"]))
+    for table, (shard_rows, added) in result["merged"].items():
+        print("{}: {:,} in shards, {:,} added".format(table, shard_rows, added))
+
 
 if __name__ == "__main__":
     main()
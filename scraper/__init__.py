@@ -1,3 +1,30 @@
-from .scraper import JArchiveScraper
-from .database import Database
+import importlib
 
+# Public name -> submodule defining it. Submodules are imported on first access, so "from scraper import Database"
+# does not load the crawler, its HTTP stack or its parsers.
+_EXPORTS = {
+        "JArchiveScraper": ".scraper",
+        "ArchiveReplayScraper": ".scraper",
+        "Database": ".database",
+        "GameWriter": ".writer",
+        "PageArchive": ".archive",
+        "CrawlLedger": ".ledger",
+        "SqliteWorkStore": ".coordination",
+        "SeasonIndex": ".season_index",
+        "ClueSearch": ".search",
+        "ClueSampler": ".query",
+        }
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
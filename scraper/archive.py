@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""This module contains an on-disk store of raw j-archive pages.
+
+Pages are content addressed: each distinct page body is compressed once into an append-only pack file, keyed by the
+sha256 of its markup. A second append-only index file records every fetch as one line of
+<fetched_at> <digest> <offset> <length> <url>, so the same url may appear many times and the latest fetch wins. Both files
+are only ever appended to, so a crawl killed mid-write loses at most the record being written.
+"""
+import hashlib
+import os
+import threading
+import time
+import zlib
+
+PACK_FILENAME = "pages.pack"
+INDEX_FILENAME = "pages.idx"
+GAME_PAGE_MARKER = "showgame.php"
+SEASON_PAGE_MARKER = "showseason.php"
+
+
+class PageArchive:
+    """
+    Compressed, content-addressed store of fetched pages. Safe to share between worker threads.
+
+    Args:
+        directory (str): Directory holding the pack and index files. Created if it does not exist.
+
+    Attributes:
+        blobs (dict): Digest -> (offset, length) of each compressed page body in the pack file.
+
+        entries (dict): Url -> (fetched_at, digest) of the latest fetch of each url.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pack_path = os.path.join(directory, PACK_FILENAME)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.blobs = {}
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        self._pack = open(self.pack_path, "ab+")
+        self._index = open(self.index_path, "a", encoding="utf-8")
+
+    def _load_index(self):
+        if not os.path.isfile(self.index_path):
+            return
+        pack_size = os.path.getsize(self.pack_path) if os.path.isfile(self.pack_path) else 0
+        with open(self.index_path, "r", encoding="utf-8") as index:
+            for line in index:
+                try:
+                    fetched_at, digest, offset, length, url = line.rstrip("\n").split("\t", 4)
+                    offset, length = int(offset), int(length)
+                except ValueError:
+                    continue  # Torn final line from an interrupted write.
+                if offset + length > pack_size:
+                    continue
+                self.blobs[digest] = (offset, length)
+                self.entries[url] = (float(fetched_at), digest)
+
+    def put(self, url, markup, fetched_at=None):
+        """Records a fetch of url. The page body is only written to the pack if its content is new.
+
+        Returns:
+            sha256 hex digest of markup.
+        """
+
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        data = markup.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest not in self.blobs:
+                compressed = zlib.compress(data)
+                self._pack.seek(0, os.SEEK_END)
+                offset = self._pack.tell()
+                self._pack.write(compressed)
+                self._pack.flush()
+                self.blobs[digest] = (offset, len(compressed))
+            offset, length = self.blobs[digest]
+            self._index.write("{:.6f}\t{}\t{}\t{}\t{}\n".format(fetched_at, digest, offset, length, url))
+            self._index.flush()
+            self.entries[url] = (fetched_at, digest)
+        return digest
+
+    def get(self, url):
+        """Returns the markup of the latest fetch of url, or None if url has never been archived."""
+
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            offset, length = self.blobs[entry[1]]
+            self._pack.seek(offset)
+            compressed = self._pack.read(length)
+        return zlib.decompress(compressed).decode("utf-8")
+
+    def game_urls(self):
+        """Returns archived game page urls, ordered by their latest fetch."""
+
+        with self._lock:
+            urls = [url for url in self.entries if GAME_PAGE_MARKER in url]
+            return sorted(urls, key=lambda url: self.entries[url][0])
+
+    def season_urls(self):
+        """Returns archived season page urls."""
+
+        with self._lock:
+            return [url for url in self.entries if SEASON_PAGE_MARKER in url]
+
+    def close(self):
+        with self._lock:
+            self._pack.close()
+            self._index.close()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""This module contains an asyncio alternative to the ScraperWorker thread pool.
+
+Scraping j-archive is almost entirely spent waiting on the network. Instead of a fixed number of blocking threads, the
+async engine runs <concurrency> consumer tasks on a single event loop, fed game urls through a queue bounded like the
+threaded engine's url_queue, so a crawl never holds more than that many urls ahead of its consumers. Requests follow the
+retry policy of the scraper's transport.HttpTransport: connection errors, timeouts and 429/5xx responses are retried
+with its backoff and Retry-After handling, and its (connect, read) timeout bounds every request. Parsing is handed to the scraper's
+parse process pool, or to the loop's default executor if there is none, so a large page does not stall every in-flight
+request. Archiving pages and saving games are run in the loop's default executor as well, so neither compression, file
+I/O nor a database write stalls the loop. Games are saved through a writer.GameWriter, which a database given on its own
+is wrapped in, so the database is only ever touched from the writer thread that opened it.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+import aiohttp
+
+from .parser import (make_page_soup,
+        parse_current_season_number,
+        parse_season_game_urls
+        )
+from .parser_backends import parse_game_markup
+from .scraper import URL_SENTINEL, JArchiveScraper, hash_markup, record_game_parsed
+from .transport import RETRY_STATUSES
+from .writer import GameWriter
+
+DEFAULT_CONCURRENCY = 100
+
+def client_timeout(timeout):
+    """Returns the aiohttp.ClientTimeout of an HttpTransport timeout, either (connect, read) seconds or one number for both."""
+
+    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+
+class AsyncJArchiveScraper(JArchiveScraper):
+    """
+    Scrapes j-archive with an asyncio event loop instead of ScraperWorker threads. Accepts the same database
+    interface as JArchiveScraper. A database that is not a writer.GameWriter is saved to through one.
+
+    Args:
+        concurrency (int): Number of consumer tasks scraping game pages, and maximum number of page requests in flight
+            at any time.
+    """
+
+    def __init__(self, database, starting_season=None, get_single_season=False, concurrency=DEFAULT_CONCURRENCY, **kwargs):
+        if kwargs.get("work_store") is not None:
+            raise ValueError("Work stores are only supported by the threaded engine.")
+        if not isinstance(database, GameWriter):
+            database = GameWriter({"database": database})  # Saves are made off the loop, on a thread owning the connection.
+        super().__init__(database, starting_season, get_single_season, **kwargs)
+        self.concurrency = concurrency
+        self._request_slots = None
+
+    def init_workers(self):
+        return  # Work is scheduled as tasks on the event loop in mainloop().
+
+    def mainloop(self):
+        startime = datetime.now()
+        asyncio.run(self._crawl())
+
+        finished_time = datetime.now() - startime
+        logging.info(finished_time)
+        logging.info("FINISHED scraping jarchive in scraper.mainloop")
+        self.finished = True
+        self.on_finished()
+
+    async def _crawl(self):
+        self._request_slots = asyncio.Semaphore(self.concurrency)
+        self.metrics.workers_total.set(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=client_timeout(self.transport.timeout)) as session:
+            url_queue = asyncio.Queue(maxsize=self.url_queue.maxsize)
+            consumers = [asyncio.ensure_future(self._scrape_queued_urls(session, url_queue)) for _ in range(self.concurrency)]
+            try:
+                await self._queue_game_urls(session, url_queue)
+            finally:
+                for _ in consumers:
+                    await url_queue.put(URL_SENTINEL)
+            await asyncio.gather(*consumers)
+
+    async def _queue_game_urls(self, session, url_queue):
+        """Puts the game urls of every season to crawl into url_queue, waiting while it is full."""
+
+        current_season = None
+        if self.starting_season is None or self.season_index:
+            current_season = await self._get_current_season_number(session)
+        starting_season = self.starting_season or current_season
+        if starting_season is None:
+            logging.warning("Unable to retrieve starting season game URLs. Exiting!")
+            return
+
+        seasons = [starting_season] if self.get_single_season else range(starting_season, 0, -1)
+        completed_urls = self.ledger.completed_urls() if self.ledger else set()
+        season_tasks = [self._get_season_game_urls(session, season, current_season) for season in seasons]
+        for season_task in asyncio.as_completed(season_tasks):  # Games are queued as soon as their season resolves.
+            season, game_urls = await season_task
+            if not game_urls:
+                logging.warning("Unable to get game urls for season {}.".format(season))
+                continue
+            for url in game_urls:
+                if url not in completed_urls:
+                    self.game_seasons[url] = season
+                    await url_queue.put(url)
+
+    async def _scrape_queued_urls(self, session, url_queue):
+        while True:
+            url = await url_queue.get()
+            if url == URL_SENTINEL:
+                return
+            try:
+                await self._scrape_game(session, url)
+            except Exception:
+                logging.exception("Exception scraping JArchive page at {}".format(url))  # The consumer keeps going.
+
+    async def _fetch_page(self, session, url, fetch_histogram=None):
+        """Returns the markup at url. fetch_histogram, if given, observes the request time once a slot is acquired."""
+
+        async with self._request_slots:
+            self.metrics.workers_busy.inc()
+            try:
+                if fetch_histogram is None:
+                    markup = await self._get_markup(session, url)
+                else:
+                    with fetch_histogram.time():
+                        markup = await self._get_markup(session, url)
+            finally:
+                self.metrics.workers_busy.dec()
+        if self.archive is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.archive.put, url, markup)
+        return markup
+
+    async def _get_markup(self, session, url):
+        """Returns the markup at url, retrying as HttpTransport.get does."""
+
+        transport = self.transport
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                self.metrics.http_requests.inc()
+                async with session.get(url) as response:
+                    if response.status not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        return await response.text()
+                    if attempt >= transport.max_retries:
+                        self.metrics.http_retries_exhausted.inc()
+                        response.raise_for_status()
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+                if attempt >= transport.max_retries:
+                    self.metrics.http_retries_exhausted.inc()
+                    raise
+            delay = transport.retry_delay(attempt, retry_after)
+            attempt += 1
+            self.metrics.http_retries.inc()
+            await asyncio.sleep(delay)
+
+    async def _get_current_season_number(self, session):
+        if self.season_index:
+            cached_season = self.season_index.get_current_season()
+            if cached_season is not None:
+                return cached_season
+
+        try:
+            markup = await self._fetch_page(session, self.base_url)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            logging.exception("Exception getting current season number")
+            return None
+
+        season_number = parse_current_season_number(make_page_soup(markup))
+        if season_number is None:
+            logging.info("Unable to parse current season page.")
+        elif self.season_index:
+            self.season_index.put_current_season(season_number)
+        return season_number
+
+    async def _get_season_game_urls(self, session, season, current_season):
+        """Returns (season, game urls of season). Closed seasons are read from and saved to the season index."""
+
+        if self.season_index:
+            cached_urls = self.season_index.get(season)
+            if cached_urls is not None:
+                return season, cached_urls
+
+        logging.info("Getting URLs for season {}".format(season))
+        season_url = "{}/showseason.php?season={}".format(self.base_url, season)
+        try:
+            markup = await self._fetch_page(session, season_url)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            logging.exception("Exception getting season {} page soup".format(season))
+            return season, None
+
+        game_urls = parse_season_game_urls(make_page_soup(markup))
+        if self.season_index and game_urls and current_season and season < current_season:
+            self.season_index.put(season, game_urls)
+        return season, game_urls
+
+    async def _scrape_game(self, session, url):
+        logging.info('Scraping game at {}'.format(url))
+        try:
+            markup = await self._fetch_page(session, url, self.metrics.fetch_seconds)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.exception("Exception scraping JArchive page at {}".format(url))
+            self.metrics.fetch_failures.inc()
+            if self.ledger:
+                self.ledger.mark_failed([url], error=str(e))
+            return
+
+        self.metrics.pages_fetched.inc()
+
+        loop = asyncio.get_running_loop()
+        with self.metrics.parse_seconds.time():
+            game = await loop.run_in_executor(self.parse_pool, parse_game_markup, markup, self.parser_backend, url)
+        if self.ledger:
+            await loop.run_in_executor(None, record_game_parsed, self.ledger, url, hash_markup(markup), game)
+        if not game:
+            self.metrics.games_empty.inc()
+            logging.info("Categories and clues for {} was None".format(url))
+            return
+
+        await loop.run_in_executor(None, self.save_game, url, game)
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""This module contains the work store that lets several scraper processes, on one host or several, share a crawl.
+
+The crawl is split into work units: a unit per season, whose page lists the season's games, and a unit per game. Each
+process leases a few units at a time. A lease expires unless its owner renews it with a heartbeat, so the units of a
+crashed process are leased again by the others. Units move through these statuses:
+
+    pending: Not leased yet.
+    leased: Held by the process named in owner until lease_expires.
+    done: Season games listed, or game data durably stored.
+    empty: Game page had no complete categories.
+    failed: Could not be fetched or saved. Leased again until it has been attempted max_attempts times.
+
+Stores record game status through the same methods as ledger.CrawlLedger, so the scraper reports completed, empty and
+failed games to a store exactly as it does to a ledger. A game whose lease expired while its owner was still saving it
+can be saved twice; the databases skip clues they already hold, so this only costs time.
+"""
+import abc
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+UNIT_STATUS_PENDING = "pending"
+UNIT_STATUS_LEASED = "leased"
+UNIT_STATUS_DONE = "done"
+UNIT_STATUS_EMPTY = "empty"
+UNIT_STATUS_FAILED = "failed"
+UNIT_KIND_SEASON = "season"
+UNIT_KIND_GAME = "game"
+DEFAULT_LEASE_SECONDS = 60
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def season_unit_key(season):
+    return "season:{}".format(season)
+
+
+def make_owner_id():
+    """Returns an id unique to this process, readable enough to tell which host and pid hold a lease."""
+
+    return "{}:{}:{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+
+class WorkUnit:
+    """
+    A leased unit of work.
+
+    Attributes:
+        key (str): Game url, or season_unit_key(season) for a season unit.
+        kind (str): UNIT_KIND_SEASON or UNIT_KIND_GAME.
+        season (int): Season of the unit.
+    """
+
+    __slots__ = ("key", "kind", "season")
+
+    def __init__(self, key, kind, season):
+        self.key = key
+        self.kind = kind
+        self.season = season
+
+    def __eq__(self, other):
+        return isinstance(other, WorkUnit) and (self.key, self.kind, self.season) == (other.key, other.kind, other.season)
+
+    def __repr__(self):
+        return "WorkUnit({!r}, {}, season={})".format(self.key, self.kind, self.season)
+
+
+class WorkStore(abc.ABC):
+    """
+    Interface of a shared store of work units. A backend for a shared server implements the abstract methods, and
+    cannot be created until it does; SqliteWorkStore shares a crawl between processes on one host, and MemoryWorkStore
+    stands in for a shared store within one process.
+
+    Args:
+        lease_seconds (float): Time a lease is held without a heartbeat.
+        max_attempts (int): Leases of a unit before a failure is final.
+        clock (callable): Returns the current time in seconds. Every process sharing a store must agree on it.
+    """
+
+    def __init__(self, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS, clock=time.time):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+
+    @abc.abstractmethod
+    def add_seasons(self, seasons):
+        """Adds a pending unit for each season not in the store yet."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_season_games(self, season, game_urls):
+        """Adds a pending unit for each game url not in the store yet, and marks the season's unit done, atomically."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def lease(self, owner, count):
+        """Leases up to count units to owner: pending units, units whose lease expired, and failed units with attempts
+        left. Game units come before season units. Returns a list of WorkUnit."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def heartbeat(self, owner):
+        """Extends every lease held by owner. Returns the number of leases extended."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def remaining(self, exclude_owner=None):
+        """Returns the number of units not finished yet: pending, leased, or failed with attempts left. Units leased by
+        exclude_owner are not counted."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def counts(self):
+        """Returns {status: number of units}."""
+        raise NotImplementedError
+
+    def mark_fetched(self, url, content_hash):
+        """Game page was downloaded and parsed. Its unit stays leased until the game is stored."""
+        pass
+
+    @abc.abstractmethod
+    def mark_empty(self, url):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def mark_done(self, urls):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def mark_failed(self, urls, error=None):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def completed_urls(self):
+        """Returns the set of game urls that are done or empty."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteWorkStore(WorkStore):
+    """
+    Work store in an SQLite file, shared by every process that opens it. Leases are claimed in an immediate
+    transaction, so two processes never lease the same unit. Safe to share between threads.
+
+    Args:
+        path (str): Store file path. Created if it does not exist.
+    """
+
+    def __init__(self, path, **options):
+        super().__init__(**options)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS units(key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    season INT,
+                    status TEXT NOT NULL,
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INT NOT NULL DEFAULT 0,
+                    content_hash TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )""")
+        self.conn.execute("""CREATE INDEX IF NOT EXISTS units_status ON units(status, kind)""")
+        self.conn.execute("""CREATE INDEX IF NOT EXISTS units_owner ON units(owner)""")
+
+    def _write(self, statements):
+        """Runs [(sql, params or [params, ...]), ...] in one immediate transaction."""
+
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                results = [self.conn.executemany(sql, params) if isinstance(params, list) else self.conn.execute(sql, params)
+                        for sql, params in statements]
+                rows = [cursor.fetchall() for cursor in results]
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def add_seasons(self, seasons):
+        now = self.clock()
+        self._write([("""INSERT OR IGNORE INTO units(key, kind, season, status, updated_at) VALUES (?,?,?,?,?)""",
+                [(season_unit_key(season), UNIT_KIND_SEASON, season, UNIT_STATUS_PENDING, now) for season in seasons])])
+
+    def add_season_games(self, season, game_urls):
+        now = self.clock()
+        self._write([
+                ("""INSERT OR IGNORE INTO units(key, kind, season, status, updated_at) VALUES (?,?,?,?,?)""",
+                    [(url, UNIT_KIND_GAME, season, UNIT_STATUS_PENDING, now) for url in game_urls]),
+                ("""UPDATE units SET status = ?, owner = NULL, lease_expires = NULL, updated_at = ? WHERE key = ?""",
+                    (UNIT_STATUS_DONE, now, season_unit_key(season)))
+                ])
+
+    def lease(self, owner, count):
+        now = self.clock()
+        rows = self._write([("""UPDATE units SET status = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE key IN (SELECT key FROM units
+                    WHERE status = ? OR (status = ? AND lease_expires < ?) OR (status = ? AND attempts < ?)
+                    ORDER BY kind = ? DESC, season DESC, key
+                    LIMIT ?)
+                RETURNING key, kind, season""",
+                (UNIT_STATUS_LEASED, owner, now + self.lease_seconds, now,
+                    UNIT_STATUS_PENDING, UNIT_STATUS_LEASED, now, UNIT_STATUS_FAILED, self.max_attempts,
+                    UNIT_KIND_GAME, count))])[0]
+        units = [WorkUnit(*row) for row in rows]
+        units.sort(key=lambda unit: (unit.kind != UNIT_KIND_GAME, -(unit.season or 0), unit.key))  # RETURNING order is unspecified.
+        return units
+
+    def heartbeat(self, owner):
+        with self._lock:
+            cursor = self.conn.execute("""UPDATE units SET lease_expires = ? WHERE owner = ? AND status = ?""",
+                    (self.clock() + self.lease_seconds, owner, UNIT_STATUS_LEASED))
+        return cursor.rowcount
+
+    def remaining(self, exclude_owner=None):
+        with self._lock:
+            return self.conn.execute("""SELECT COUNT(*) FROM units
+                    WHERE (status IN (?,?) OR (status = ? AND attempts < ?)) AND (owner IS NULL OR owner IS NOT ?)""",
+                    (UNIT_STATUS_PENDING, UNIT_STATUS_LEASED, UNIT_STATUS_FAILED, self.max_attempts, exclude_owner)).fetchone()[0]
+
+    def counts(self):
+        with self._lock:
+            return dict(self.conn.execute("""SELECT status, COUNT(*) FROM units GROUP BY status""").fetchall())
+
+    def _set_status(self, keys, status, **columns):
+        assignments = "".join(", {} = ?".format(name) for name in columns)
+        now = self.clock()
+        self._write([("""UPDATE units SET status = ?, owner = NULL, lease_expires = NULL, updated_at = ?{} WHERE key = ?""".format(assignments),
+                [(status, now) + tuple(columns.values()) + (key,) for key in keys])])
+
+    def mark_fetched(self, url, content_hash):
+        with self._lock:
+            self.conn.execute("""UPDATE units SET content_hash = ? WHERE key = ?""", (content_hash, url))
+
+    def mark_empty(self, url):
+        self._set_status([url], UNIT_STATUS_EMPTY)
+
+    def mark_done(self, urls):
+        if urls:
+            self._set_status(urls, UNIT_STATUS_DONE)
+
+    def mark_failed(self, urls, error=None):
+        if urls:
+            self._set_status(urls, UNIT_STATUS_FAILED, error=error)
+
+    def completed_urls(self):
+        with self._lock:
+            rows = self.conn.execute("""SELECT key FROM units WHERE kind = ? AND status IN (?,?)""",
+                    (UNIT_KIND_GAME, UNIT_STATUS_DONE, UNIT_STATUS_EMPTY)).fetchall()
+        return {row[0] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class MemoryWorkStore(WorkStore):
+    """Work store held in memory. Stands in for a shared store in tests, and for crawls confined to one process."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._lock = threading.Lock()
+        self.units = {}  # Key -> dict of the unit's columns, as in SqliteWorkStore.
+
+    def _add(self, key, kind, season):
+        self.units.setdefault(key, {"kind": kind, "season": season, "status": UNIT_STATUS_PENDING, "owner": None,
+                "lease_expires": None, "attempts": 0, "error": None})
+
+    def _leasable(self, unit, now):
+        return (unit["status"] == UNIT_STATUS_PENDING or
+                (unit["status"] == UNIT_STATUS_LEASED and unit["lease_expires"] < now) or
+                (unit["status"] == UNIT_STATUS_FAILED and unit["attempts"] < self.max_attempts))
+
+    def add_seasons(self, seasons):
+        with self._lock:
+            for season in seasons:
+                self._add(season_unit_key(season), UNIT_KIND_SEASON, season)
+
+    def add_season_games(self, season, game_urls):
+        with self._lock:
+            for url in game_urls:
+                self._add(url, UNIT_KIND_GAME, season)
+            self._set_status_locked([season_unit_key(season)], UNIT_STATUS_DONE)
+
+    def lease(self, owner, count):
+        now = self.clock()
+        with self._lock:
+            keys = sorted((key for key, unit in self.units.items() if self._leasable(unit, now)),
+                    key=lambda key: (self.units[key]["kind"] != UNIT_KIND_GAME, -(self.units[key]["season"] or 0), key))[:count]
+            for key in keys:
+                self.units[key].update(status=UNIT_STATUS_LEASED, owner=owner, lease_expires=now + self.lease_seconds,
+                        attempts=self.units[key]["attempts"] + 1)
+            return [WorkUnit(key, self.units[key]["kind"], self.units[key]["season"]) for key in keys]
+
+    def heartbeat(self, owner):
+        expires = self.clock() + self.lease_seconds
+        with self._lock:
+            held = [unit for unit in self.units.values() if unit["owner"] == owner and unit["status"] == UNIT_STATUS_LEASED]
+            for unit in held:
+                unit["lease_expires"] = expires
+        return len(held)
+
+    def remaining(self, exclude_owner=None):
+        with self._lock:
+            return sum(1 for unit in self.units.values()
+                    if (unit["status"] in (UNIT_STATUS_PENDING, UNIT_STATUS_LEASED) or
+                        (unit["status"] == UNIT_STATUS_FAILED and unit["attempts"] < self.max_attempts))
+                    and (unit["owner"] is None or unit["owner"] != exclude_owner))
+
+    def counts(self):
+        counts = {}
+        with self._lock:
+            for unit in self.units.values():
+                counts[unit["status"]] = counts.get(unit["status"], 0) + 1
+        return counts
+
+    def _set_status_locked(self, keys, status, error=None):
+        for key in keys:
+            if key in self.units:
+                self.units[key].update(status=status, owner=None, lease_expires=None, error=error)
+
+    def mark_empty(self, url):
+        with self._lock:
+            self._set_status_locked([url], UNIT_STATUS_EMPTY)
+
+    def mark_done(self, urls):
+        with self._lock:
+            self._set_status_locked(urls, UNIT_STATUS_DONE)
+
+    def mark_failed(self, urls, error=None):
+        with self._lock:
+            self._set_status_locked(urls, UNIT_STATUS_FAILED, error=error)
+
+    def completed_urls(self):
+        with self._lock:
+            return {key for key, unit in self.units.items()
+                    if unit["kind"] == UNIT_KIND_GAME and unit["status"] in (UNIT_STATUS_DONE, UNIT_STATUS_EMPTY)}
+
+
+class LeaseHeartbeat(threading.Thread):
+    """
+    Daemon thread renewing every lease held by owner, three times per lease period, until stopped.
+
+    Args:
+        store (WorkStore): Store the leases are held in.
+        owner (str): Owner id the leases were taken under.
+    """
+
+    def __init__(self, store, owner):
+        threading.Thread.__init__(self, name="Lease Heartbeat Thread", daemon=True)
+        self.store = store
+        self.owner = owner
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.store.lease_seconds / 3):
+            try:
+                self.store.heartbeat(self.owner)
+            except sqlite3.Error:
+                pass  # Retried on the next beat; the lease period covers a few missed beats.
+
+    def stop(self):
+        self._stopped.set()
@@ -1,107 +1,189 @@
 #!/usr/bin/env python3
+import importlib
 import os
-import pymongo
 import sqlite3
 from .exceptions import DatabaseOperationalError
 from .database_status_codes import DATABASE_STATUS_CODES
+from .file_sinks import PARQUET_SCHEME, is_file_sink
+from .models import as_game
+from .search import FTS_MODES, create_fts_index, rebuild_fts_index
 
 class Database:
+    """
+    Selects and creates the engine a connection parameter names.
+
+    Engines are registered with register(), and checked in registration order. Each is named by the module and class
+    that implement it, and the module is only imported once a connection parameter selects it, so a crawl never loads
+    the drivers of engines it does not use.
+    """
+
+    engines = []  # [(engine name, matches(connection_param), module, class name)]
+
+    @classmethod
+    def register(cls, name, matches, module, class_name):
+        """Registers the engine class_name in module (absolute, or relative to this package) for every connection
+        parameter matches returns True for."""
+
+        cls.engines.append((name, matches, module, class_name))
 
     @classmethod
-    def factory(cls, connection_param):
+    def factory(cls, connection_param, **options):
+        """Returns a database object for connection_param. options are passed on to the engine's constructor."""
+
         database_cls = cls.determine_engine(connection_param)
         if not database_cls:
             raise ValueError("Invalid database factory arg!: {}".format(connection_param))
-        return database_cls(connection_param)
+        return database_cls(connection_param, **options)
 
     @classmethod
-    def determine_engine(cls, connection_param):
-        if connection_param.startswith("mongodb://"):
-            return MongoDatabase
-        elif connection_param.startswith("sqlite:///") or connection_param.endswith(".db"):
-            return SqliteDatabase
-        else:
-            return None 
-
-
-
-class MongoDatabase:
-    def __init__(self, host_uri):
-        self.host_uri = host_uri
-        self.collection_name = "categories"
-        self.client = None
-        self.db = None
-        self.db_status = DATABASE_STATUS_CODES["not connected"]
-        self.category_count = 0
+    def engine_name(cls, connection_param):
+        """Returns the name of the engine connection_param selects, or None. Imports nothing."""
 
-    def init_connection(self):
-        print("Attempting to connect to {}".format(self.host_uri))
-        self.client = pymongo.MongoClient(self.host_uri)
+        for name, matches, _, _ in cls.engines:
+            if matches(connection_param):
+                return name
+        return None
 
-        try:
-            self.client.server_info()  # Check conn was successful. Polls for <serverSelectionTimeoutMS passed to client constructor, default=30s>
-        except pymongo.errors.ServerSelectionTimeoutError as e:
-            self.db_status = DATABASE_STATUS_CODES["failure"]
-            raise DatabaseOperationalError("Timed out trying to connect to Mongo server at . Please ensure an instance of mongod is running".format(self.host_uri)) from e
+    @classmethod
+    def determine_engine(cls, connection_param):
+        """Returns the engine class connection_param selects, importing its module, or None."""
 
-        self.db_status = DATABASE_STATUS_CODES["success"]
-        self.db = self.client.get_default_database()  # Database specified in host_uri.
-        print("Connection successful. Category collections will be saved to {}".format(self.db.name))
+        for _, matches, module, class_name in cls.engines:
+            if matches(connection_param):
+                return getattr(importlib.import_module(module, __package__), class_name)
+        return None
 
 
-    def save(self, categories_dict):
-        for category, clues in categories_dict.items():
-            self.db[self.collection_name].insert({  # TODO: chaining access too messy?
-                    "category": category,
-                    "clues": clues
-                })
+SQLITE_URI_PREFIX = "sqlite:///"
+SQLITE_GAMES_PER_FLUSH = 50
+SQLITE_BUSY_TIMEOUT = 60  # Seconds a write waits for another connection's transaction, e.g. another process sharing the file.
+SQLITE_PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",  # With WAL, only a checkpoint fsyncs; a crash can lose recent commits but not corrupt the file.
+        "PRAGMA cache_size=-65536",  # 64MB page cache.
+        "PRAGMA temp_store=MEMORY"
+        )
+# PRAGMA user_version of the current table layout. Files with an older layout are copied over by migrate.py.
+SQLITE_SCHEMA_VERSION = 2
 
-        self.category_count += 1
-        return
 
-    def get_connection_status(self):
-        return self.db_status
+def index_name(index_sql):
+    """Returns the name of the index a CREATE INDEX IF NOT EXISTS statement creates."""
 
-    def cleanup(self):
-        if self.client:
-            self.client.close()
+    return index_sql.split(" IF NOT EXISTS ", 1)[1].split()[0]
 
 
 class SqliteDatabase:
-
-    def __init__(self, db_path):
+    """
+    Saves games to an SQLite file. Rows are inserted with executemany, and games are grouped into one transaction
+    per <games_per_flush> saves, instead of committing after every category.
+
+    Category titles are interned: each distinct title is one categories row, which clues reference along with their
+    game and round. Clues are deduplicated on models.clue_content_hash, so re-crawled or repeated clues are stored once.
+
+    Args:
+        db_path (str): File path, optionally prefixed with sqlite:///.
+
+        games_per_flush (int): Number of saved games to group into each transaction. Games saved since the last commit
+            are committed by cleanup().
+
+        fts (str): Maintain a full-text index of clues (see search.py). "sync" indexes each clue as it is inserted;
+            "rebuild" re-indexes every clue in bulk in cleanup(). None leaves any existing index untouched.
+
+        secondary_indexes (bool): Whether the indexes in INDEXES are kept. Without them, any that exist are dropped, so
+            bulk inserts do not maintain them; build_indexes() creates them again. The unique indexes in
+            UNIQUE_INDEXES, which saves depend on to deduplicate, are always kept.
+
+    Attributes:
+        duplicate_clue_count (int): Clues not stored because an equal clue already was.
+    """
+
+    INSERT_GAME_SQL = """INSERT OR REPLACE INTO games(id, season, url) VALUES (?,?,?)"""
+    INTERN_CATEGORY_SQL = """INSERT INTO categories(title) VALUES (?) ON CONFLICT(title) DO NOTHING"""
+    INSERT_CLUE_SQL = """INSERT INTO clues(question, answer, category_id, game_id, round, value, daily_double, content_hash)
+                VALUES (?,?,?,?,?,?,?,?) ON CONFLICT(content_hash) DO NOTHING"""
+    UNIQUE_INDEXES = (
+            """CREATE UNIQUE INDEX IF NOT EXISTS categories_title ON categories(title)""",
+            """CREATE UNIQUE INDEX IF NOT EXISTS clues_content_hash ON clues(content_hash)"""
+            )
+    INDEXES = (
+            """CREATE INDEX IF NOT EXISTS clues_category_id ON clues(category_id)""",
+            """CREATE INDEX IF NOT EXISTS clues_value ON clues(value)""",
+            """CREATE INDEX IF NOT EXISTS games_season ON games(season)"""
+            )
+
+    def __init__(self, db_path, games_per_flush=SQLITE_GAMES_PER_FLUSH, fts=None, secondary_indexes=True):
+        if fts not in (None,) + FTS_MODES:
+            raise ValueError("Invalid full-text index mode: {}".format(fts))
+        self.fts = fts
+        if db_path.startswith(SQLITE_URI_PREFIX):
+            db_path = db_path[len(SQLITE_URI_PREFIX):]
         self.db_path = db_path
+        self.games_per_flush = games_per_flush
+        self.secondary_indexes = secondary_indexes
         self.conn = None
         self.db_status = DATABASE_STATUS_CODES["not connected"]
         self.category_count = 0
-
-        #TODO: define sql strings here.
+        self.duplicate_clue_count = 0
+        self.unflushed_games = 0
+        self._category_ids = {}  # Interned title -> categories.id, filled as titles are saved.
 
     def init_connection(self):
         print("Attempting to connect to {}".format(self.db_path))
         if not self._file_exists(self.db_path):
             print("Creating new file: {}".format(self.db_path))
-            open(self.db_path, 'w').close() # Create file.
+            open(self.db_path, 'a').close() # Create file. Appending never truncates one another process just created.
 
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            self.conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT)
+            for pragma in SQLITE_PRAGMAS:
+                self.conn.execute(pragma)
             self._build_tables()
             self.db_status = DATABASE_STATUS_CODES["success"]
         except Exception as e:
+            print("Could not open {}: {}".format(self.db_path, e))
             self.db_status = DATABASE_STATUS_CODES["failure"]
 
-    def save(self, categories_dict):
-        cursor = self.conn.cursor()
-        for category, clues in categories_dict.items():
-            cursor.execute("""INSERT INTO categories(title) VALUES (?)""", (category,))
-            category_id = cursor.lastrowid
-            for clue in clues:
-                cursor.execute("""INSERT INTO clues(question, answer, category_id) VALUES(?,?,?)""", (clue["question"], clue["answer"], category_id))
+    def save(self, game):
+        """Saves a models.Game, or a categories and clues dictionary."""
+
+        game = as_game(game)
+        category_ids = self._intern_titles(category.title for category in game)
+        clue_rows = []
+        for category in game:
+            count = len(category)
+            clue_rows.extend(zip(category.questions, category.answers, [category_ids[category.title]] * count,
+                    [game.game_id] * count, [category.round_number] * count, category.values, category.daily_doubles,
+                    category.content_hashes()))
+
+        if game.game_id is not None:
+            self.conn.execute(self.INSERT_GAME_SQL, (game.game_id, game.season, game.url))
+        inserted = self.conn.executemany(self.INSERT_CLUE_SQL, clue_rows).rowcount
+        self.duplicate_clue_count += len(clue_rows) - inserted
+        self.category_count += len(game)
+
+        self.unflushed_games += 1
+        if self.unflushed_games >= self.games_per_flush:
+            self.flush()
+        return
 
-            self.conn.commit()
-            self.category_count += 1
+    def _intern_titles(self, titles):
+        """Returns {title: categories.id} for titles, inserting the ones not stored yet."""
 
-        return
+        missing = [title for title in dict.fromkeys(titles) if title not in self._category_ids]
+        if missing:
+            # Upserted rather than numbered here, so ids stay consistent with anything else writing to the file.
+            self.conn.executemany(self.INTERN_CATEGORY_SQL, [(title,) for title in missing])
+            rows = self.conn.execute("""SELECT title, id FROM categories WHERE title IN ({})""".format(",".join("?" * len(missing))),
+                    missing)
+            self._category_ids.update(rows)
+        return self._category_ids
+
+    def flush(self):
+        """Commits every game saved since the last commit."""
+
+        self.conn.commit()
+        self.unflushed_games = 0
 
 
     def _file_exists(self, fpath):
@@ -109,25 +191,90 @@ class SqliteDatabase:
 
     def _build_tables(self):
         cursor = self.conn.cursor()
+        schema_version = cursor.execute("""PRAGMA user_version""").fetchone()[0]
+        has_tables = cursor.execute("""SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'categories'""").fetchone()
+        if has_tables and schema_version < SQLITE_SCHEMA_VERSION:
+            raise DatabaseOperationalError("{} uses an older layout without deduplicated clues. Copy it to a new file with "
+                    "python3 -m scraper.migrate {} NEW.db".format(self.db_path, self.db_path))
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS games(id INTEGER PRIMARY KEY, season INT, url TEXT)""")
+
         cursor.execute("""CREATE TABLE IF NOT EXISTS categories(id INTEGER PRIMARY KEY, title TEXT NOT NULL)""")
 
         cursor.execute("""CREATE TABLE IF NOT EXISTS clues(id INTEGER PRIMARY KEY,
                     question TEXT NOT NULL,
                     answer TEXT NOT NULL,
                     category_id INT NOT NULL,
-                    FOREIGN KEY(category_id) REFERENCES categories(id)
+                    game_id INT,
+                    round INT,
+                    value INT,
+                    daily_double INT NOT NULL DEFAULT 0,
+                    content_hash INT NOT NULL,
+                    FOREIGN KEY(category_id) REFERENCES categories(id),
+                    FOREIGN KEY(game_id) REFERENCES games(id)
                 )""")
+        for index_sql in self.UNIQUE_INDEXES:
+            cursor.execute(index_sql)
+        if self.secondary_indexes:
+            for index_sql in self.INDEXES:
+                cursor.execute(index_sql)
+        else:
+            for index_sql in self.INDEXES:
+                cursor.execute("""DROP INDEX IF EXISTS {}""".format(index_name(index_sql)))
+        cursor.execute("""PRAGMA user_version = {}""".format(SQLITE_SCHEMA_VERSION))
+        if self.fts:
+            create_fts_index(self.conn, sync=self.fts == "sync")
         self.conn.commit()
         cursor.close()
 
+    def build_indexes(self):
+        """Creates the indexes in INDEXES, in one pass over each table, and commits."""
+
+        for index_sql in self.INDEXES:
+            self.conn.execute(index_sql)
+        self.conn.commit()
+        self.secondary_indexes = True
+
+    def stored_game_urls(self):
+        """Returns the set of urls of stored games. Reads through a connection of its own, so it can be called from
+        any thread."""
+
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT)
+        try:
+            return {row[0] for row in conn.execute("""SELECT url FROM games WHERE url IS NOT NULL""")}
+        finally:
+            conn.close()
+
     def get_connection_status(self):
         return self.db_status
 
     def cleanup(self):
         if self.conn:
+            if self.fts == "rebuild":
+                rebuild_fts_index(self.conn)
+            self.flush()
             self.conn.close()
+            self.conn = None
 
 
 
 if __name__ == "__main__":
     pass
+
+
+Database.register("mongodb", lambda param: param.startswith("mongodb://"), ".mongo_database", "MongoDatabase")
+Database.register("sqlite", lambda param: param.startswith(SQLITE_URI_PREFIX) or param.endswith(".db"), ".database",
+        "SqliteDatabase")
+Database.register("parquet", lambda param: param.startswith(PARQUET_SCHEME), ".file_sinks", "ParquetSink")
+Database.register("jsonl", is_file_sink, ".file_sinks", "JsonlSink")
+
+_MOVED_TO_MONGO_DATABASE = frozenset(("MongoDatabase", "MONGO_GAMES_PER_FLUSH", "MONGO_FLUSH_INTERVAL", "MONGO_FLUSH_RETRIES",
+        "MONGO_DUPLICATE_KEY_ERROR", "MONGO_TRANSIENT_ERRORS", "MONGO_INDEXES"))
+
+
+def __getattr__(name):
+    # MongoDatabase lives in mongo_database.py, so importing this module does not import pymongo. Loaded on first use
+    # for code that still imports it from here.
+    if name in _MOVED_TO_MONGO_DATABASE:
+        return getattr(importlib.import_module(".mongo_database", __package__), name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
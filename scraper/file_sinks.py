@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""This module contains file sinks, which stream games to files instead of a database server.
+
+    jsonl://<path>, jsonl+gzip://<path>, jsonl+zstd://<path>: Newline-delimited JSON, one category per line:
+        {"category": title, "game_id": ..., "season": ..., "round": ...,
+        "clues": [{"question": ..., "answer": ..., "value": ..., "daily_double": ...}, ...]}. Runs append to the file;
+        concatenated gzip members and zstd frames decompress as one stream. zstd requires zstandard.
+
+    parquet://<directory>: Parquet files with one row per clue and columns category_id, category, game_id, season,
+        round, question, answer, value and daily_double. Each flush writes one row group, and a new part file is
+        started every <games_per_file> games. Requires pyarrow.
+
+Sinks have the same interface as the database engines, and only hold one flush worth of games in memory.
+"""
+import glob
+import importlib
+import io
+import gzip
+import json
+import os
+import time
+from .database_status_codes import DATABASE_STATUS_CODES
+from .models import as_game
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+pyarrow = None  # Imported by the first ParquetSink. It takes longer to load than the rest of the scraper together.
+
+JSONL_SCHEMES = {
+        "jsonl://": None,
+        "jsonl+gzip://": "gzip",
+        "jsonl+zstd://": "zstd"
+        }
+PARQUET_SCHEME = "parquet://"
+SINK_GAMES_PER_FLUSH = 50
+PARQUET_GAMES_PER_FILE = 5000
+ZSTD_LEVEL = 3
+
+
+def is_file_sink(connection_param):
+    return connection_param.startswith(PARQUET_SCHEME) or any(connection_param.startswith(s) for s in JSONL_SCHEMES)
+
+
+class JsonlSink:
+    """
+    Streams games to a newline-delimited JSON file, optionally compressed.
+
+    Args:
+        connection_param (str): jsonl://, jsonl+gzip:// or jsonl+zstd:// followed by the file path.
+
+        games_per_flush (int): Number of saved games after which the stream is flushed through to the file.
+
+    Raises:
+        ValueError if the scheme is unknown, or zstd is requested without the zstandard package.
+    """
+
+    def __init__(self, connection_param, games_per_flush=SINK_GAMES_PER_FLUSH):
+        scheme = next((s for s in JSONL_SCHEMES if connection_param.startswith(s)), None)
+        if scheme is None:
+            raise ValueError("Invalid JSONL sink: {}".format(connection_param))
+        self.compression = JSONL_SCHEMES[scheme]
+        if self.compression == "zstd" and zstandard is None:
+            raise ValueError("jsonl+zstd:// requires the zstandard package to be installed.")
+        self.path = connection_param[len(scheme):]
+        self.games_per_flush = games_per_flush
+        self.db_status = DATABASE_STATUS_CODES["not connected"]
+        self.category_count = 0
+        self.unflushed_games = 0
+        self._file = None
+        self._stream = None
+
+    def init_connection(self):
+        print("Attempting to open {}".format(self.path))
+        try:
+            self._file = open(self.path, "ab")
+            if self.compression == "gzip":
+                binary_stream = gzip.GzipFile(fileobj=self._file, mode="ab")
+            elif self.compression == "zstd":
+                binary_stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(self._file, closefd=False)
+            else:
+                binary_stream = self._file
+            self._stream = io.TextIOWrapper(binary_stream, encoding="utf-8", write_through=False)
+            self.db_status = DATABASE_STATUS_CODES["success"]
+        except OSError:
+            self.db_status = DATABASE_STATUS_CODES["failure"]
+
+    def save(self, game):
+        """Writes a models.Game, or a categories and clues dictionary."""
+
+        game = as_game(game)
+        for category in game:
+            document = {"category": category.title, "game_id": game.game_id, "season": game.season,
+                    "round": category.round_number, "clues": category.clues(detailed=True)}
+            self._stream.write(json.dumps(document, ensure_ascii=False))
+            self._stream.write("\n")
+        self.category_count += len(game)
+        self.unflushed_games += 1
+        if self.unflushed_games >= self.games_per_flush:
+            self.flush()
+
+    def flush(self):
+        """Pushes every saved game through the compressor to the file."""
+
+        self._stream.flush()  # gzip does a sync flush and zstd ends its block, so everything written so far is decodable.
+        self._file.flush()
+        self.unflushed_games = 0
+
+    def get_connection_status(self):
+        return self.db_status
+
+    def cleanup(self):
+        if self._stream:
+            self._stream.flush()
+            self._stream.close()  # Writes the gzip trailer, or ends the zstd frame.
+            if not self._file.closed:
+                self._file.close()
+            self._stream = None
+            self.unflushed_games = 0
+
+
+class ParquetSink:
+    """
+    Streams games to Parquet part files in a directory, one row per clue. Clues of a category share a category_id,
+    unique across every part file in the directory.
+
+    A part file is only readable once it is closed, so unflushed_games counts every game in the open part file, not
+    just those waiting for the next row group.
+
+    Args:
+        connection_param (str): parquet:// followed by the directory path. Created if it does not exist.
+
+        games_per_flush (int): Number of games written per row group.
+
+        games_per_file (int): Number of games after which the part file is closed and a new one started.
+
+    Raises:
+        ValueError if pyarrow is not installed.
+    """
+
+    batch_flush = False  # flush() closes the part file, so writer.SinkWriter leaves flushing to games_per_file.
+
+    def __init__(self, connection_param, games_per_flush=SINK_GAMES_PER_FLUSH, games_per_file=PARQUET_GAMES_PER_FILE):
+        if _import_pyarrow() is None:
+            raise ValueError("parquet:// requires the pyarrow package to be installed.")
+        self.directory = connection_param[len(PARQUET_SCHEME):]
+        self.games_per_flush = games_per_flush
+        self.games_per_file = games_per_file
+        self.schema = pyarrow.schema([
+                ("category_id", pyarrow.int64()),
+                ("category", pyarrow.string()),
+                ("game_id", pyarrow.int64()),
+                ("season", pyarrow.int32()),
+                ("round", pyarrow.int8()),
+                ("question", pyarrow.string()),
+                ("answer", pyarrow.string()),
+                ("value", pyarrow.int32()),
+                ("daily_double", pyarrow.bool_())
+                ])
+        self.db_status = DATABASE_STATUS_CODES["not connected"]
+        self.category_count = 0
+        self.unflushed_games = 0
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered_games = 0
+        self._writer = None
+        self._part_number = 0
+        self._next_category_id = None
+
+    def init_connection(self):
+        print("Attempting to open {}".format(self.directory))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._next_category_id = self._max_existing_category_id() + 1
+            self.db_status = DATABASE_STATUS_CODES["success"]
+        except (OSError, pyarrow.ArrowException):
+            self.db_status = DATABASE_STATUS_CODES["failure"]
+
+    def _part_files(self):
+        return sorted(glob.glob(os.path.join(self.directory, "part-*.parquet")))
+
+    def _max_existing_category_id(self):
+        """Reads the largest category_id from the row group statistics of existing part files. Only footers are read."""
+
+        max_id = 0
+        for path in self._part_files():
+            metadata = pyarrow.parquet.ParquetFile(path).metadata
+            for i in range(metadata.num_row_groups):
+                statistics = metadata.row_group(i).column(0).statistics
+                if statistics is not None and statistics.has_min_max:
+                    max_id = max(max_id, statistics.max)
+        return max_id
+
+    def save(self, game):
+        """Buffers a models.Game, or a categories and clues dictionary."""
+
+        game = as_game(game)
+        columns = self._columns
+        for category in game:
+            category_id = self._next_category_id
+            self._next_category_id += 1
+            clue_count = len(category)
+            columns["category_id"].extend([category_id] * clue_count)
+            columns["category"].extend([category.title] * clue_count)
+            columns["game_id"].extend([game.game_id] * clue_count)
+            columns["season"].extend([game.season] * clue_count)
+            columns["round"].extend([category.round_number] * clue_count)
+            columns["question"].extend(category.questions)
+            columns["answer"].extend(category.answers)
+            columns["value"].extend(category.values)
+            columns["daily_double"].extend(category.daily_doubles)
+        self.category_count += len(game)
+        self.unflushed_games += 1
+        self._buffered_games += 1
+        if self._buffered_games >= self.games_per_flush:
+            self._write_row_group()
+        if self.unflushed_games >= self.games_per_file:
+            self.flush()
+
+    def _write_row_group(self):
+        if not self._buffered_games:
+            return
+        if self._writer is None:
+            self._part_number += 1
+            path = os.path.join(self.directory, "part-{}-{:04d}.parquet".format(int(time.time() * 1000), self._part_number))
+            self._writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression="zstd")
+        self._writer.write_table(pyarrow.Table.from_pydict(self._columns, schema=self.schema))
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered_games = 0
+
+    def flush(self):
+        """Writes buffered games, and closes the part file so that every saved game is readable."""
+
+        self._write_row_group()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.unflushed_games = 0
+
+    def get_connection_status(self):
+        return self.db_status
+
+    def cleanup(self):
+        if self._next_category_id is not None:
+            self.flush()
+
+
+def _import_pyarrow():
+    """Imports pyarrow and pyarrow.parquet on first use. Returns the pyarrow module, or None if it is not installed."""
+
+    global pyarrow
+    if pyarrow is None:
+        try:
+            importlib.import_module("pyarrow.parquet")
+        except ImportError:
+            return None
+        pyarrow = importlib.import_module("pyarrow")
+    return pyarrow
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""This module contains the crawl ledger, a record of every game page the scraper has attempted.
+
+Games move through these statuses:
+
+    fetched: Page was downloaded and parsed, but its data has not been flushed to the database yet.
+    done: Game data is durably stored. Resumed crawls skip these games.
+    empty: Page had no complete categories. Resumed crawls skip these games as well.
+    failed: Page could not be fetched, or its data could not be saved. Resumed crawls retry these games.
+
+A game left "fetched" by a killed crawl is treated like a failure and fetched again.
+"""
+import sqlite3
+import threading
+import time
+
+LEDGER_STATUS_FETCHED = "fetched"
+LEDGER_STATUS_DONE = "done"
+LEDGER_STATUS_EMPTY = "empty"
+LEDGER_STATUS_FAILED = "failed"
+COMPLETE_STATUSES = (LEDGER_STATUS_DONE, LEDGER_STATUS_EMPTY)
+
+
+class CrawlLedger:
+    """
+    SQLite file recording the status, content hash and last update time of each game url. Safe to share between
+    worker threads.
+
+    Args:
+        path (str): Ledger file path. Created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS games(url TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    content_hash TEXT,
+                    attempts INT NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )""")
+        self.conn.commit()
+
+    def _set_status(self, urls, status, content_hash=None, error=None, count_attempt=False):
+        now = time.time()
+        rows = [(url, status, content_hash, int(count_attempt), error, now) for url in urls]
+        with self._lock:
+            self.conn.executemany("""INSERT INTO games(url, status, content_hash, attempts, error, updated_at)
+                        VALUES (?,?,?,?,?,?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        status=excluded.status,
+                        content_hash=COALESCE(excluded.content_hash, games.content_hash),
+                        attempts=games.attempts + excluded.attempts,
+                        error=excluded.error,
+                        updated_at=excluded.updated_at""", rows)
+            self.conn.commit()
+
+    def mark_fetched(self, url, content_hash):
+        self._set_status([url], LEDGER_STATUS_FETCHED, content_hash=content_hash, count_attempt=True)
+
+    def mark_empty(self, url):
+        self._set_status([url], LEDGER_STATUS_EMPTY)
+
+    def mark_done(self, urls):
+        if urls:
+            self._set_status(urls, LEDGER_STATUS_DONE)
+
+    def mark_failed(self, urls, error=None):
+        if urls:
+            self._set_status(urls, LEDGER_STATUS_FAILED, error=error, count_attempt=True)
+
+    def status(self, url):
+        """Returns the status of url, or None if it has never been attempted."""
+
+        with self._lock:
+            row = self.conn.execute("""SELECT status FROM games WHERE url = ?""", (url,)).fetchone()
+        return row[0] if row else None
+
+    def completed_urls(self):
+        """Returns the set of urls that do not need to be fetched again."""
+
+        with self._lock:
+            rows = self.conn.execute("""SELECT url FROM games WHERE status IN (?,?)""", COMPLETE_STATUSES).fetchall()
+        return {row[0] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""This module contains the scraper's runtime instrumentation.
+
+PipelineMetrics holds counters, gauges and latency histograms for every pipeline stage: fetch, parse, the wait in
+game_data_queue, and the database save. It can be exposed in the Prometheus text format over HTTP with
+serve_metrics, and written periodically to a JSON file with MetricsSnapshotWriter.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "jarchive_"
+LATENCY_BUCKETS = tuple(round(0.001 * 1.5 ** i, 6) for i in range(28))  # 1ms to ~57s.
+BATCH_SIZE_BUCKETS = tuple(2 ** i for i in range(11))  # 1 to 1024 games.
+
+
+class Counter:
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [(self.name + "_total", "", self.value)]
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """Gauge set directly, or read from value_fn at collection time."""
+
+    def __init__(self, name, description, value_fn=None):
+        self.name = name
+        self.description = description
+        self.value_fn = value_fn
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self.value_fn() if self.value_fn else self._value
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def samples(self):
+        return [(self.name, "", self.value)]
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as in Prometheus. Quantiles are estimated by interpolating within a bucket."""
+
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # Last slot counts observations above every bound.
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the wall time of its block."""
+
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Returns an estimate of quantile q (0-1) of the observed values, or None if nothing was observed."""
+
+        with self._lock:
+            counts, total = list(self.bucket_counts), self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def samples(self):
+        with self._lock:
+            counts, total, value_sum = list(self.bucket_counts), self.count, self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            samples.append((self.name + "_bucket", '{{le="{}"}}'.format(bound), cumulative))
+        samples.append((self.name + "_bucket", '{le="+Inf"}', total))
+        samples.append((self.name + "_sum", "", value_sum))
+        samples.append((self.name + "_count", "", total))
+        return samples
+
+    def snapshot(self):
+        return {
+                "count": self.count,
+                "sum": self.sum,
+                "mean": self.sum / self.count if self.count else None,
+                "p50": self.quantile(0.5),
+                "p99": self.quantile(0.99)
+                }
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def _register(self, metric):
+        metric.name = METRIC_PREFIX + metric.name
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, description):
+        return self._register(Counter(name, description))
+
+    def gauge(self, name, description, value_fn=None):
+        return self._register(Gauge(name, description, value_fn))
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, description, buckets))
+
+    def render_prometheus(self):
+        """Returns every metric in the Prometheus text exposition format."""
+
+        metric_types = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+        lines = []
+        for metric in self.metrics:
+            lines.append("# HELP {} {}".format(metric.name, metric.description))
+            lines.append("# TYPE {} {}".format(metric.name, metric_types[type(metric)]))
+            lines.extend("{}{} {}".format(name, labels, value) for name, labels, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Returns a JSON serializable dict of every metric's current value."""
+
+        return {metric.name[len(METRIC_PREFIX):]: metric.snapshot() for metric in self.metrics}
+
+
+class PipelineMetrics(MetricsRegistry):
+    """
+    Metrics for one scraper run. Queue depth gauges read the queues directly when collected.
+
+    Args:
+        url_queue (queue.Queue): Queue of game urls waiting to be fetched, or None.
+        game_data_queue (queue.Queue): Queue of parsed games waiting to be saved, or None.
+    """
+
+    def __init__(self, url_queue=None, game_data_queue=None):
+        super().__init__()
+        self.pages_fetched = self.counter("pages_fetched", "Game pages fetched.")
+        self.fetch_failures = self.counter("fetch_failures", "Game pages that could not be fetched.")
+        self.parse_failures = self.counter("parse_failures", "Game pages whose parse raised.")
+        self.games_empty = self.counter("games_empty", "Game pages without a single complete category.")
+        self.games_saved = self.counter("games_saved", "Games the database has flushed.")
+        self.categories_saved = self.counter("categories_saved", "Categories in games the database has flushed.")
+        self.clues_saved = self.counter("clues_saved", "Clues in games the database has flushed, including duplicates.")
+        self.clues_duplicate = self.counter("clues_duplicate", "Clues not stored because an equal clue already was, "
+                "summed over every database.")
+        self.save_failures = self.counter("save_failures", "Database saves or flushes that raised.")
+        self.games_spilled = self.counter("games_spilled", "Games written to a spill file because a sink was behind or failing.")
+        self.http_requests = self.counter("http_requests", "HTTP requests sent, including retries.")
+        self.http_connections_opened = self.counter("http_connections_opened", "HTTP requests that opened a new connection.")
+        self.http_connections_reused = self.counter("http_connections_reused", "HTTP requests sent on a kept-alive connection.")
+        self.http_retries = self.counter("http_retries", "HTTP requests retried after a connection error, timeout or 429/5xx.")
+        self.http_retries_exhausted = self.counter("http_retries_exhausted", "HTTP requests given up on after every retry failed.")
+        self.http_not_modified = self.counter("http_not_modified", "Conditional HTTP requests answered with 304 Not Modified.")
+        self.watch_polls = self.counter("watch_polls", "Checks of the watched season page for new games.")
+        self.watch_games_found = self.counter("watch_games_found", "New games found on the watched season page.")
+
+        self.fetch_seconds = self.histogram("fetch_seconds", "Time to fetch a game page.")
+        self.parse_seconds = self.histogram("parse_seconds", "Time spent parsing a game page, in a parse process or in-thread.")
+        self.queue_wait_seconds = self.histogram("queue_wait_seconds", "Time a parsed game waits in game_data_queue.")
+        self.save_seconds = self.histogram("save_seconds", "Time spent in database save, including flushes it triggers.")
+        self.writer_batch_seconds = self.histogram("writer_batch_seconds", "Time a writer thread spends saving and flushing one batch.")
+        self.writer_batch_games = self.histogram("writer_batch_games", "Games a writer thread saves per batch.", BATCH_SIZE_BUCKETS)
+
+        self.url_queue_depth = self.gauge("url_queue_depth", "Game urls waiting to be fetched.",
+                (lambda: url_queue.qsize()) if url_queue is not None else None)
+        self.game_data_queue_depth = self.gauge("game_data_queue_depth", "Parsed games waiting to be saved.",
+                (lambda: game_data_queue.qsize()) if game_data_queue is not None else None)
+        self.workers_total = self.gauge("workers_total", "Fetch workers, or async request slots.")
+        self.workers_busy = self.gauge("workers_busy", "Fetch workers, or async request slots, processing a game.")
+        self.worker_utilization = self.gauge("worker_utilization", "Fraction of fetch workers processing a game.",
+                lambda: self.workers_busy.value / self.workers_total.value if self.workers_total.value else 0)
+
+    def record_saved(self, category_count, clue_count):
+        """Counts one game the database has flushed."""
+
+        self.games_saved.inc()
+        self.categories_saved.inc(category_count)
+        self.clues_saved.inc(clue_count)
+
+
+def serve_metrics(registry, port, host="127.0.0.1"):
+    """Serves registry in the Prometheus text format at http://host:port/metrics from a daemon thread.
+
+    Returns:
+        The running http.server.ThreadingHTTPServer.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            return
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="Metrics Server Thread", daemon=True)
+    thread.start()
+    return server
+
+
+class MetricsSnapshotWriter(threading.Thread):
+    """Daemon thread writing registry.snapshot() to path as JSON every interval seconds, and once more on stop()."""
+
+    def __init__(self, registry, path, interval=10):
+        threading.Thread.__init__(self, name="Metrics Snapshot Thread", daemon=True)
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.write_snapshot()
+
+    def stop(self):
+        self._stopped.set()
+        self.write_snapshot()
+
+    def write_snapshot(self):
+        snapshot = {"time": time.time(), "metrics": self.registry.snapshot()}
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, self.path)
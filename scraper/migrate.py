@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""This module copies a database written by an older version of the scraper into a new database with interned
+category titles and deduplicated clues. The source is only read, so it can be kept until the copy is checked.
+
+SQLite files are copied in SQL: the source is attached to the new file, titles are interned with one INSERT ... SELECT
+and clues copied with another, skipping any whose content hash is already stored. A full-text index on the source is
+rebuilt on the copy. MongoDB category documents are read back into games and saved through MongoDatabase.
+
+    $ python3 -m scraper.migrate jtrivia.db jtrivia-dedup.db
+    $ python3 -m scraper.migrate mongodb://localhost:27017/jtrivia mongodb://localhost:27017/jtrivia_dedup
+"""
+import argparse
+import contextlib
+import io
+import os
+
+from .database import Database, SqliteDatabase
+from .database_status_codes import DATABASE_STATUS_CODES
+from .exceptions import DatabaseOperationalError
+from .models import Category, Game, clue_content_hash
+from .search import FTS_TABLE, FTS_TRIGGER, create_fts_index, rebuild_fts_index, sqlite_file_path
+
+# New clue column -> candidate source columns, as (table, column), in order of preference. Layouts before game ids,
+# rounds and values were stored have none of them.
+SQLITE_SOURCE_COLUMNS = {
+        "game_id": (("clues", "game_id"), ("categories", "game_id")),
+        "round": (("clues", "round"), ("categories", "round")),
+        "value": (("clues", "value"),),
+        "daily_double": (("clues", "daily_double"),)
+        }
+SQLITE_COLUMN_DEFAULTS = {"daily_double": "0"}
+SQLITE_TABLE_ALIASES = {"clues": "src_clues", "categories": "src_categories"}
+
+
+def _source_columns(conn, table):
+    return {row[1] for row in conn.execute("""PRAGMA src.table_info({})""".format(table))}
+
+
+def _source_has(conn, name):
+    return conn.execute("""SELECT 1 FROM src.sqlite_master WHERE name = ?""", (name,)).fetchone() is not None
+
+
+def _column_expression(column, columns_by_table):
+    for table, source_column in SQLITE_SOURCE_COLUMNS[column]:
+        if source_column in columns_by_table[table]:
+            return "{}.{}".format(SQLITE_TABLE_ALIASES[table], source_column)
+    return SQLITE_COLUMN_DEFAULTS.get(column, "NULL")
+
+
+def _count(conn, schema, table):
+    return conn.execute("""SELECT COUNT(*) FROM {}.{}""".format(schema, table)).fetchone()[0]
+
+
+def migrate_sqlite(src_path, dst_path):
+    """
+    Copies the SQLite file at src_path into a new file at dst_path.
+
+    Returns:
+        dict of {table: (source row count, copied row count)} for the categories and clues tables.
+
+    Raises:
+        DatabaseOperationalError if dst_path already exists, or the new file could not be created.
+    """
+
+    src_path, dst_path = sqlite_file_path(src_path), sqlite_file_path(dst_path)
+    if not os.path.isfile(src_path):
+        raise DatabaseOperationalError("{} does not exist".format(src_path))
+    if os.path.exists(dst_path):
+        raise DatabaseOperationalError("{} already exists. Migrations only write to a new file.".format(dst_path))
+
+    database = SqliteDatabase(dst_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_connection()
+    if database.get_connection_status() != DATABASE_STATUS_CODES["success"]:
+        raise DatabaseOperationalError("Could not create {}".format(dst_path))
+
+    conn = database.conn
+    conn.create_function("clue_content_hash", 3, clue_content_hash, deterministic=True)
+    conn.execute("""ATTACH DATABASE ? AS src""", (src_path,))
+    try:
+        columns_by_table = {table: _source_columns(conn, table) for table in SQLITE_TABLE_ALIASES}
+        if _source_has(conn, "games"):
+            conn.execute("""INSERT INTO games(id, season, url) SELECT id, season, url FROM src.games""")
+        conn.execute("""INSERT OR IGNORE INTO categories(title) SELECT title FROM src.categories GROUP BY title ORDER BY MIN(id)""")
+        conn.execute("""INSERT OR IGNORE INTO clues(question, answer, category_id, game_id, round, value, daily_double, content_hash)
+                    SELECT src_clues.question, src_clues.answer, categories.id, {game_id}, {round}, {value}, {daily_double},
+                        clue_content_hash(src_categories.title, src_clues.question, src_clues.answer)
+                    FROM src.clues AS src_clues
+                    JOIN src.categories AS src_categories ON src_categories.id = src_clues.category_id
+                    JOIN categories ON categories.title = src_categories.title
+                    ORDER BY src_clues.id""".format(**{column: _column_expression(column, columns_by_table)
+                            for column in SQLITE_SOURCE_COLUMNS}))
+        if _source_has(conn, FTS_TABLE):
+            rebuild_fts_index(conn)
+            if _source_has(conn, FTS_TRIGGER):
+                create_fts_index(conn, sync=True)
+        counts = {table: (_count(conn, "src", table), _count(conn, "main", table)) for table in ("categories", "clues")}
+        conn.commit()
+    finally:
+        conn.execute("""DETACH DATABASE src""")
+        database.cleanup()
+    return counts
+
+
+def _legacy_mongo_games(collection):
+    """Yields a one-category Game for each category document in collection."""
+
+    for document in collection.find({"clues": {"$exists": True}}):
+        game = Game([Category.from_clues(document["category"], document.get("round"), document["clues"])],
+                season=document.get("season"))
+        game.game_id = document.get("game_id")
+        yield game
+
+
+def migrate_mongo(src_uri, dst_uri):
+    """
+    Copies the category documents of the database at src_uri into the database at dst_uri.
+
+    Returns:
+        dict of {"categories": (source document count, titles stored), "clues": (source clue count, clues stored)}.
+    """
+
+    import pymongo  # Only needed, and only installed, for MongoDB migrations.
+    from .mongo_database import MongoDatabase
+
+    if src_uri == dst_uri:
+        raise DatabaseOperationalError("The source and destination must be different databases.")
+    database = MongoDatabase(dst_uri)
+    database.init_connection()
+    source_client = pymongo.MongoClient(src_uri)
+    source_collection = source_client.get_default_database()[database.categories_collection_name]
+    source_categories = source_clues = 0
+    try:
+        for game in _legacy_mongo_games(source_collection):
+            source_categories += 1
+            source_clues += game.clue_count
+            database.save(game)
+        database.flush()
+        counts = {"categories": (source_categories, database.db[database.categories_collection_name].count_documents({})),
+                "clues": (source_clues, database.db[database.collection_name].count_documents({}))}
+    finally:
+        database.cleanup()
+        source_client.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy a database into a new one with interned category titles and "
+            "deduplicated clues.")
+    parser.add_argument("source", help="Existing SQLite file or MongoDB URI.")
+    parser.add_argument("destination", help="New SQLite file or MongoDB URI, of the same kind as the source.")
+    args = parser.parse_args()
+
+    engines = {Database.engine_name(args.source), Database.engine_name(args.destination)}
+    try:
+        if engines == {"sqlite"}:
+            counts = migrate_sqlite(args.source, args.destination)
+        elif engines == {"mongodb"}:
+            counts = migrate_mongo(args.source, args.destination)
+        else:
+            parser.error("the source and destination must both be SQLite files or both be MongoDB URIs")
+    except DatabaseOperationalError as e:
+        parser.error(str(e))
+
+    for table, (before, after) in counts.items():
+        print("{}: {:,} -> {:,}".format(table, before, after))
+    if engines == {"sqlite"}:
+        print("size: {:,} -> {:,} bytes".format(os.path.getsize(sqlite_file_path(args.source)),
+                os.path.getsize(sqlite_file_path(args.destination))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""This module contains the compact in-memory representation of parsed games.
+
+Parsed games wait in game_data_queue until the database catches up, so their size bounds the scraper's peak memory.
+Instead of a dict per clue, a Category keeps its questions, answers and values as parallel tuples, and both records
+use __slots__. Game.to_dict() converts a game back to the categories and clues dictionary that
+parser.parse_jarchive_page returns.
+"""
+import hashlib
+import re
+import unicodedata
+
+GAME_ID_REGEX = re.compile(r'''game_id=(\d+)''')
+CONTENT_HASH_SEPARATOR = "\x00"
+
+
+def game_id_from_url(url):
+    """Returns the integer j-archive game id in a game page url, or None."""
+
+    match = GAME_ID_REGEX.search(url or "")
+    return int(match.group(1)) if match else None
+
+
+def normalize_clue_text(text):
+    """Returns text with Unicode compatibility forms folded, case folded and runs of whitespace collapsed."""
+
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.casefold().split())
+
+
+def _hash_normalized(texts):
+    digest = hashlib.blake2b(CONTENT_HASH_SEPARATOR.join(texts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def content_hash(*texts):
+    """Returns a signed 64-bit hash of the normalized texts, sized to be stored as an SQLite INTEGER or a BSON int64."""
+
+    return _hash_normalized([normalize_clue_text(text) for text in texts])
+
+
+def clue_content_hash(title, question, answer):
+    """Returns the key clues are deduplicated on: the same question and answer, under the same category title, up to
+    case and whitespace."""
+
+    return content_hash(title, question, answer)
+
+
+def as_game(data):
+    """Returns data as a Game. Accepts a Game, or a categories and clues dictionary."""
+
+    return data if isinstance(data, Game) else Game.from_dict(data)
+
+
+class Category:
+    """
+    One complete category of a game.
+
+    Attributes:
+        title (str): Category title.
+        round_number (int): 1-based position of the category's round table on the game page, or None if unknown.
+        questions (tuple): Clue questions, top to bottom.
+        answers (tuple): Clue answers, parallel to questions.
+        values (tuple): Dollar value shown on each clue (the wager, for daily doubles), or None where unknown.
+        daily_doubles (tuple): Whether each clue was a daily double.
+    """
+
+    __slots__ = ("title", "round_number", "questions", "answers", "values", "daily_doubles")
+
+    def __init__(self, title, round_number, questions, answers, values=None, daily_doubles=None):
+        self.title = str(title)  # Plain str, so no parse tree node is kept alive through a str subclass.
+        self.round_number = round_number
+        self.questions = tuple(str(q) for q in questions)
+        self.answers = tuple(str(a) for a in answers)
+        self.values = tuple(values) if values is not None else (None,) * len(self.questions)
+        self.daily_doubles = tuple(bool(d) for d in daily_doubles) if daily_doubles is not None else (False,) * len(self.questions)
+
+    @classmethod
+    def from_clues(cls, title, round_number, clues):
+        """Builds a category from a list of {"question": ..., "answer": ...} clue dicts, with optional "value" and
+        "daily_double" keys."""
+
+        return cls(title, round_number, [clue["question"] for clue in clues], [clue["answer"] for clue in clues],
+                [clue.get("value") for clue in clues], [clue.get("daily_double", False) for clue in clues])
+
+    def clues(self, detailed=False):
+        """Returns the category's clues as a list of {"question": ..., "answer": ...} dicts. With detailed, each dict
+        also has "value" and "daily_double" keys."""
+
+        if detailed:
+            return [{"question": q, "answer": a, "value": v, "daily_double": d}
+                    for q, a, v, d in zip(self.questions, self.answers, self.values, self.daily_doubles)]
+        return [{"question": q, "answer": a} for q, a in zip(self.questions, self.answers)]
+
+    def content_hashes(self):
+        """Returns the clue_content_hash of each clue, parallel to questions."""
+
+        title = normalize_clue_text(self.title)
+        return [_hash_normalized((title, normalize_clue_text(q), normalize_clue_text(a))) for q, a in zip(self.questions, self.answers)]
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __eq__(self, other):
+        if not isinstance(other, Category):
+            return NotImplemented
+        return (self.title, self.round_number, self.questions, self.answers, self.values, self.daily_doubles) == \
+                (other.title, other.round_number, other.questions, other.answers, other.values, other.daily_doubles)
+
+    def __repr__(self):
+        return "Category({!r}, round_number={}, clues={})".format(self.title, self.round_number, len(self))
+
+
+class Game:
+    """
+    Every complete category parsed from one game page, in page order. A game without categories is falsy.
+
+    Attributes:
+        url (str): Game page url, or None.
+        game_id (int): j-archive game id, read from url.
+        season (int): Season the game was listed under, or None if unknown. Not on the game page itself; the scraper
+            sets it from the season page the url was found on.
+        categories (tuple): Category records.
+    """
+
+    __slots__ = ("url", "game_id", "season", "categories")
+
+    def __init__(self, categories, url=None, season=None):
+        self.url = url
+        self.game_id = game_id_from_url(url)
+        self.season = season
+        self.categories = tuple(categories)
+
+    @classmethod
+    def from_dict(cls, categories_dict, url=None, round_number=None, season=None):
+        """Builds a game from a categories and clues dictionary. Round numbers are not part of that shape."""
+
+        return cls([Category.from_clues(title, round_number, clues) for title, clues in categories_dict.items()], url=url,
+                season=season)
+
+    def to_dict(self):
+        """Returns the game as {category title: [{"question": ..., "answer": ...}, ...]}.
+
+        Identical to what parser.parse_jarchive_page returns for the same page, including its handling of a title
+        repeated across rounds: the later round's clues replace the earlier ones, at the earlier position.
+        """
+
+        return {category.title: category.clues() for category in self.categories}
+
+    def to_record(self):
+        """Returns the game as a JSON-serializable dict, which from_record() turns back into an equal game. Unlike
+        to_dict(), it keeps round numbers, values, daily doubles and every category of a title repeated across rounds."""
+
+        return {"url": self.url, "season": self.season, "categories": [{"title": category.title,
+                "round": category.round_number, "questions": category.questions, "answers": category.answers,
+                "values": category.values, "daily_doubles": category.daily_doubles} for category in self.categories]}
+
+    @classmethod
+    def from_record(cls, record):
+        """Builds a game from a to_record() dict."""
+
+        return cls([Category(category["title"], category["round"], category["questions"], category["answers"],
+                category["values"], category["daily_doubles"]) for category in record["categories"]], url=record["url"],
+                season=record["season"])
+
+    @property
+    def clue_count(self):
+        return sum(len(category) for category in self.categories)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def __iter__(self):
+        return iter(self.categories)
+
+    def __eq__(self, other):
+        if not isinstance(other, Game):
+            return NotImplemented
+        return (self.url, self.season, self.categories) == (other.url, other.season, other.categories)
+
+    def __repr__(self):
+        return "Game(game_id={}, season={}, categories={}, clues={})".format(self.game_id, self.season, len(self), self.clue_count)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""This module contains the MongoDB engine. It is imported by database.Database.factory only when a mongodb:// URI
+is given, so pymongo is never loaded by crawls writing elsewhere.
+"""
+import logging
+import random
+import time
+
+import pymongo
+
+from .exceptions import DatabaseOperationalError
+from .database_status_codes import DATABASE_STATUS_CODES
+from .models import as_game
+
+MONGO_GAMES_PER_FLUSH = 50
+MONGO_FLUSH_INTERVAL = 5  # Seconds. Buffered games are flushed on the next save after this long, even if below games_per_flush.
+MONGO_FLUSH_RETRIES = 3
+MONGO_DUPLICATE_KEY_ERROR = 11000
+MONGO_TRANSIENT_ERRORS = (pymongo.errors.AutoReconnect, pymongo.errors.NetworkTimeout)
+# Secondary indexes of the clues collection. Filters used by query.MongoClueSampler end in sample_key, so a filtered
+# random draw is a single index seek.
+MONGO_INDEXES = (
+        [("sample_key", pymongo.ASCENDING)],
+        [("season", pymongo.ASCENDING), ("sample_key", pymongo.ASCENDING)],
+        [("round", pymongo.ASCENDING), ("sample_key", pymongo.ASCENDING)],
+        [("category", pymongo.ASCENDING), ("sample_key", pymongo.ASCENDING)],
+        [("value", pymongo.ASCENDING), ("sample_key", pymongo.ASCENDING)],
+        [("daily_double", pymongo.ASCENDING), ("sample_key", pymongo.ASCENDING)],
+        [("game_id", pymongo.ASCENDING)]
+        )
+
+
+class MongoDatabase:
+    """
+    Saves games to MongoDB, one document per distinct clue. Documents are buffered across games and written with
+    unordered bulk upserts, instead of one round trip per category.
+
+    A clue document's _id is its models.clue_content_hash, and it is only written if no document has that _id yet, so
+    re-crawled or repeated clues are stored once. Clue documents look like {"_id": hash, "category": title,
+    "game_id": ..., "season": ..., "round": ..., "question": ..., "answer": ..., "value": ..., "daily_double": ...,
+    "sample_key": random float}. Category titles are interned in the categories collection, keyed by title, which
+    clue documents refer to in their category field.
+
+    Args:
+        host_uri (str): MongoDB connection URI, including the database name.
+
+        games_per_flush (int): Number of buffered games that triggers a flush.
+
+        flush_interval (float): Seconds after which buffered games are flushed on the next save, however few there are.
+
+    Attributes:
+        duplicate_clue_count (int): Clues not stored because an equal clue already was.
+
+        flush_count (int): Number of flushes written.
+
+        last_flush_seconds (float): Wall time of the most recent flush, including retries.
+
+        total_flush_seconds (float): Wall time spent in all flushes.
+    """
+
+    def __init__(self, host_uri, games_per_flush=MONGO_GAMES_PER_FLUSH, flush_interval=MONGO_FLUSH_INTERVAL):
+        self.host_uri = host_uri
+        self.collection_name = "clues"
+        self.categories_collection_name = "categories"
+        self.client = None
+        self.db = None
+        self.db_status = DATABASE_STATUS_CODES["not connected"]
+        self.category_count = 0
+        self.duplicate_clue_count = 0
+
+        self.games_per_flush = games_per_flush
+        self.flush_interval = flush_interval
+        self.buffered_categories = {}  # Title -> game_id it was first seen in.
+        self.buffered_clues = {}  # Content hash -> clue document.
+        self.unflushed_games = 0
+        self.last_flush_time = time.monotonic()
+        self.flush_count = 0
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def init_connection(self):
+        print("Attempting to connect to {}".format(self.host_uri))
+        self.client = pymongo.MongoClient(self.host_uri)
+
+        try:
+            self.client.server_info()  # Check conn was successful. Polls for <serverSelectionTimeoutMS passed to client constructor, default=30s>
+        except pymongo.errors.ServerSelectionTimeoutError as e:
+            self.db_status = DATABASE_STATUS_CODES["failure"]
+            raise DatabaseOperationalError("Timed out trying to connect to Mongo server at . Please ensure an instance of mongod is running".format(self.host_uri)) from e
+
+        self.db = self.client.get_default_database()  # Database specified in host_uri.
+        if self.db[self.categories_collection_name].find_one({"clues": {"$exists": True}}) is not None:
+            self.db_status = DATABASE_STATUS_CODES["failure"]
+            raise DatabaseOperationalError("{} holds a category document per game, an older layout. Copy it to a new database with "
+                    "python3 -m scraper.migrate".format(self.db.name))
+        self.db_status = DATABASE_STATUS_CODES["success"]
+        for keys in MONGO_INDEXES:
+            self.db[self.collection_name].create_index(keys)
+        print("Connection successful. Clues will be saved to {}".format(self.db.name))
+
+
+    def save(self, game):
+        """Buffers a models.Game, or a categories and clues dictionary."""
+
+        game = as_game(game)
+        for category in game:
+            self.buffered_categories.setdefault(category.title, game.game_id)
+            for content_hash, clue in zip(category.content_hashes(), category.clues(detailed=True)):
+                if content_hash in self.buffered_clues:
+                    self.duplicate_clue_count += 1
+                    continue
+                self.buffered_clues[content_hash] = dict(clue,
+                        category=category.title,
+                        game_id=game.game_id,
+                        season=game.season,
+                        round=category.round_number,
+                        sample_key=random.random())
+
+        self.category_count += len(game)
+        self.unflushed_games += 1
+        if (self.unflushed_games >= self.games_per_flush or
+                time.monotonic() - self.last_flush_time >= self.flush_interval):
+            self.flush()
+        return
+
+    def flush(self):
+        """Upserts every buffered category title and clue with one unordered bulk write per collection.
+
+        Upserts only insert, so retrying a partly applied write is harmless: transient network errors are retried up to
+        MONGO_FLUSH_RETRIES times, and duplicate key errors (two upserts of one new _id racing) mean the document exists.
+
+        Raises:
+            DatabaseOperationalError if the documents could not be written.
+        """
+
+        self.last_flush_time = time.monotonic()
+        if not self.buffered_clues and not self.buffered_categories:
+            return
+
+        # The buffers are released up front; documents from a flush that ultimately fails are dropped, not re-sent forever.
+        categories, clues, games = self.buffered_categories, self.buffered_clues, self.unflushed_games
+        self.buffered_categories = {}
+        self.buffered_clues = {}
+        self.unflushed_games = 0
+
+        start = time.perf_counter()
+        self._bulk_upsert(self.categories_collection_name,
+                [pymongo.UpdateOne({"_id": title}, {"$setOnInsert": {"first_game_id": game_id}}, upsert=True)
+                    for title, game_id in categories.items()])
+        inserted = self._bulk_upsert(self.collection_name,
+                [pymongo.UpdateOne({"_id": content_hash}, {"$setOnInsert": document}, upsert=True)
+                    for content_hash, document in clues.items()])
+        if inserted is not None:
+            self.duplicate_clue_count += len(clues) - inserted
+
+        self.last_flush_seconds = time.perf_counter() - start
+        self.total_flush_seconds += self.last_flush_seconds
+        self.flush_count += 1
+        logging.info("Flushed {} clues from {} games to Mongo in {:.3f}s".format(len(clues), games, self.last_flush_seconds))
+
+    def _bulk_upsert(self, collection_name, operations):
+        """Writes operations, retrying transient errors. Returns the number of documents inserted, or None if a retry
+        or duplicate key error made that unknowable."""
+
+        if not operations:
+            return 0
+        for attempt in range(MONGO_FLUSH_RETRIES + 1):
+            try:
+                result = self.db[collection_name].bulk_write(operations, ordered=False)
+                return result.upserted_count if attempt == 0 else None
+            except pymongo.errors.BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                if all(err.get("code") == MONGO_DUPLICATE_KEY_ERROR for err in write_errors):
+                    return None
+                raise DatabaseOperationalError("Bulk upsert of {} documents failed".format(len(operations))) from e
+            except MONGO_TRANSIENT_ERRORS as e:
+                if attempt == MONGO_FLUSH_RETRIES:
+                    raise DatabaseOperationalError("Bulk upsert failed after {} retries".format(MONGO_FLUSH_RETRIES)) from e
+                logging.warning("Transient error flushing to Mongo, retrying: {}".format(e))
+                time.sleep(0.5 * 2 ** attempt)
+
+    def get_connection_status(self):
+        return self.db_status
+
+    def cleanup(self):
+        if self.client:
+            if self.db is not None:
+                self.flush()
+            self.client.close()
+            self.client = None
@@ -1,13 +1,13 @@
-import bs4
 import re
-import requests
 from .exceptions import MalformedRoundHTMLError, IncompleteClueError
+from .models import Category, Game
 
 """This module contains functions to parse clue answers and question from j-archive HTML.
 """
 
 JARCHIVE_BASE_URL = "http://j-archive.com"
 CLUE_ANSWER_REGEX = re.compile(r'''<em class="correct_response">(.+)</em>''')
+CLUE_VALUE_REGEX = re.compile(r'''\$([\d,]+)''')
 
 """
 Clue answers on j-archive are not the string content of an HTML element (like questions are), but instead are part of a string that
@@ -15,18 +15,53 @@ inline JavaScript writes to the document when a user hovers over a clue box. Reg
 Instead of recompiling the regex with every call to _parse_clue_answer, we initialize it here as a global variable.
 """
 
-def get_page_soup(url):
-    """Returns bs4.BeautifulSoup object of page at url."""
+def get_page_soup(url, archive=None, transport=None):
+    """Returns bs4.BeautifulSoup object of page at url. The raw markup is also stored in archive, if given."""
+
+    return make_page_soup(get_page_markup(url, archive, transport))
+
+
+def get_page_markup(url, archive=None, transport=None):
+    """Returns the markup of page at url, requested through transport.HttpTransport transport, or the shared default
+    one. The markup is also stored in archive, if given."""
+
+    import requests  # HTTP is only loaded once a page is requested; parsing stored markup never needs it.
+    from .transport import default_transport
 
     try:
-        req = requests.get(url)
-        req.raise_for_status()
+        markup = (transport or default_transport()).get_text(url)
     except requests.exceptions.RequestException as err:
         print('Error getting page soup for <{}>: {}'.format(url, err))
         # return None
         raise
-    page_soup = bs4.BeautifulSoup(req.text, "html.parser")
-    return page_soup
+    if archive is not None:
+        archive.put(url, markup)
+    return markup
+
+
+def make_page_soup(markup):
+    """Returns bs4.BeautifulSoup object of already fetched page markup."""
+
+    import bs4  # Only loaded once a page is parsed with BeautifulSoup.
+    return bs4.BeautifulSoup(markup, "html.parser")
+
+
+def parse_current_season_number(page_soup):
+    """Returns the number of the current season linked from the j-archive home page, or None if it cannot be parsed."""
+
+    try:
+        current_season_href = page_soup.find("table", class_="fullpageheight").find("a")["href"]
+        season_number = re.search(r'''showseason.php\?season=(\d{1,2})''', current_season_href).group(1)
+    except (AttributeError, KeyError, TypeError):
+        return None
+    return int(season_number)
+
+
+def parse_season_game_urls(season_page_soup):
+    """Returns a list of the game page urls linked from a j-archive season page."""
+
+    game_hrefs = [td.find("a") for td in season_page_soup.find_all("td", {"align":"left", "valign":"top", "style":"width:140px"})]
+    return [a["href"] for a in game_hrefs]
 
 
 def parse_jarchive_page(page_soup):
@@ -38,15 +73,20 @@ def parse_jarchive_page(page_soup):
         Dictionary serialization of all valid categories on the j-archive page. Keys are category titles, with values of a list of serialized clue dictionaries. Example: {"Famous People": ["question": "First president of the United States", "answer":"George Washington"...]}.
     """
 
-    all_categories_and_clues = {}
-    jeopardy_rounds = _get_jeopardy_rounds(page_soup)
-    for j_round in jeopardy_rounds:
+    return parse_jarchive_game(page_soup).to_dict()
+
+
+def parse_jarchive_game(page_soup, url=None):
+    """Returns a models.Game of all valid categories on the j-archive page, with the round each came from."""
+
+    categories = []
+    for round_number, j_round in enumerate(_get_jeopardy_rounds(page_soup), 1):
         try:
             round_categories_and_clues = _serialize_jeopardy_round(j_round)
-            all_categories_and_clues.update(round_categories_and_clues)
         except MalformedRoundHTMLError:
             continue
-    return all_categories_and_clues
+        categories.extend(Category.from_clues(title, round_number, clues) for title, clues in round_categories_and_clues.items())
+    return Game(categories, url=url)
 
 
 def _remove_html_tags(string):
@@ -71,8 +111,24 @@ def _parse_clue_answer(clue_node):
     return answer
 
 
+def parse_clue_value(value_text):
+    """Returns the dollar amount in a clue value cell ("$400", "DD: $1,300") as an int, or None."""
+
+    match = CLUE_VALUE_REGEX.search(value_text or "")
+    return int(match.group(1).replace(",", "")) if match else None
+
+
+def _parse_clue_value(clue_node):
+    """Returns (value, whether the clue is a daily double)."""
+
+    value_node = clue_node.find("td", class_=["clue_value", "clue_value_daily_double"])
+    if value_node is None:
+        return None, False
+    return parse_clue_value(value_node.text), "clue_value_daily_double" in value_node.get("class", [])
+
+
 def _serialize_clue_node(clue_node):
-    """Returns dict of clue question and answer parsed from clue_node.
+    """Returns dict of clue question, answer, value and daily double flag parsed from clue_node.
     
         Raises:
             IncompleteClueError is a question and/or answer cannot be parsed.
@@ -84,7 +140,8 @@ def _serialize_clue_node(clue_node):
     answer = _parse_clue_answer(clue_node)
     if not answer:
         raise IncompleteClueError
-    return {"question": question, "answer": answer}
+    value, daily_double = _parse_clue_value(clue_node)
+    return {"question": question, "answer": answer, "value": value, "daily_double": daily_double}
 
 
 def _get_jeopardy_rounds(page_soup):
@@ -118,15 +175,30 @@ def _serialize_jeopardy_round(round_soup):
         the HTML is not structured as the parsing functions expect.
     """
 
-    categories_and_clues = {}
     categories = _get_round_categories(round_soup)
     all_clue_nodes = _get_round_clue_nodes(round_soup) 
+    return serialize_round_nodes(categories, all_clue_nodes, _serialize_clue_node)
+
+
+def serialize_round_nodes(categories, all_clue_nodes, serialize_clue_node):
+    """Pairs a round's category titles with its clue nodes, independent of the tree the nodes come from.
+
+    Args:
+        categories: List of the round's category titles.
+        all_clue_nodes: List of the round's clue nodes, in document order.
+        serialize_clue_node: Function returning a clue dict from a single clue node, or raising IncompleteClueError.
+
+    Raises:
+        MalformedRoundHTMLError: If there are not 6 categories and 30 clue nodes.
+    """
+
+    categories_and_clues = {}
     if not (len(categories) == 6 and len(all_clue_nodes) == 30):
         raise MalformedRoundHTMLError
     for (category_index, category) in enumerate(categories):
         category_clue_nodes = [all_clue_nodes[i] for i in range(category_index,30,6)]
         try:
-            clues = [_serialize_clue_node(node) for node in category_clue_nodes]
+            clues = [serialize_clue_node(node) for node in category_clue_nodes]
         except IncompleteClueError:
             continue  # Category contains an incomplete clue; move on the the next category of the round.
         categories_and_clues[category] = clues
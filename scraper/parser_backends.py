@@ -0,0 +1,307 @@
+"""This module contains the interchangeable tree builders used to parse j-archive game pages.
+
+Every backend exposes parse_game(markup, url), returning a models.Game, and parse_game_markup(markup), returning the
+same categories and clues dictionary as parser.parse_jarchive_page. Backends only differ in how the round tables are
+found and walked; pairing categories with clues is shared through parser.serialize_round_nodes, so their output is
+identical. The parse tree is released before parse_game returns; only plain strings reach the Game.
+
+Each backend imports its library when it is first instantiated by get_parser_backend, so only the selected one is
+loaded. The stream backend builds no tree at all. Its StreamingGameParser is fed markup in chunks of any size, as they are
+downloaded, and turns each round table into categories as soon as the table's closing tag is read.
+"""
+from html.parser import HTMLParser
+from .exceptions import MalformedRoundHTMLError, IncompleteClueError
+from .models import Category, Game
+from .parser import (CLUE_ANSWER_REGEX,
+        parse_clue_value,
+        parse_jarchive_game,
+        serialize_round_nodes,
+        _remove_html_tags
+        )
+
+DEFAULT_PARSER_BACKEND = "bs4"
+
+
+def _class_xpath(tag, class_name):
+    """XPath matching tag elements whose class attribute contains the class_name token, like bs4's class_ filter."""
+
+    return '{}[contains(concat(" ", normalize-space(@class), " "), " {} ")]'.format(tag, class_name)
+
+
+class Bs4Backend:
+    """
+    The original BeautifulSoup backend, using the pure-Python html.parser tree builder. A strainer restricts the
+    tree to the round tables, so the rest of the page is tokenized but never built.
+    """
+
+    name = "bs4"
+
+    def __init__(self):
+        import bs4
+        self._bs4 = bs4
+        self.round_strainer = bs4.SoupStrainer("table", class_="round")
+
+    def parse_game(self, markup, url=None):
+        page_soup = self._bs4.BeautifulSoup(markup, "html.parser", parse_only=self.round_strainer)
+        try:
+            return parse_jarchive_game(page_soup, url)
+        finally:
+            page_soup.decompose()  # Breaks the tree's parent/child reference cycles now, instead of at the next gc pass.
+
+    def parse_game_markup(self, markup):
+        return self.parse_game(markup).to_dict()
+
+
+class LxmlBackend:
+    """
+    libxml2 backend. Round tables, categories and clues are located with precompiled XPath expressions instead of
+    repeated find_all walks.
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        try:
+            import lxml.etree
+            import lxml.html
+        except ImportError:
+            raise ValueError("The lxml parser backend requires the lxml package to be installed.")
+        self._document_fromstring = lxml.html.document_fromstring
+        self._rounds = lxml.etree.XPath("//" + _class_xpath("table", "round"))
+        self._category_names = lxml.etree.XPath(".//" + _class_xpath("td", "category_name"))
+        self._clue_nodes = lxml.etree.XPath(".//" + _class_xpath("td", "clue"))
+        self._clue_text = lxml.etree.XPath("(.//" + _class_xpath("td", "clue_text") + ")[1]")
+        self._answer_div = lxml.etree.XPath("(.//div)[1]")
+        self._clue_value = lxml.etree.XPath("(.//" + _class_xpath("td", "clue_value") + " | .//" +
+                _class_xpath("td", "clue_value_daily_double") + ")[1]")
+
+    def parse_game(self, markup, url=None):
+        document = self._document_fromstring(markup)
+        categories = []
+        for round_number, j_round in enumerate(self._rounds(document), 1):
+            titles = [node.text_content() for node in self._category_names(j_round)]
+            try:
+                round_categories_and_clues = serialize_round_nodes(titles, self._clue_nodes(j_round), self._serialize_clue_node)
+            except MalformedRoundHTMLError:
+                continue
+            categories.extend(Category.from_clues(title, round_number, clues) for title, clues in round_categories_and_clues.items())
+        return Game(categories, url=url)  # lxml trees hold no reference cycles, so the document is freed on return.
+
+    def parse_game_markup(self, markup):
+        return self.parse_game(markup).to_dict()
+
+    def _serialize_clue_node(self, clue_node):
+        question_nodes = self._clue_text(clue_node)
+        question = _remove_html_tags(question_nodes[0].text_content()) if question_nodes else None
+        if not question:
+            raise IncompleteClueError
+
+        answer_divs = self._answer_div(clue_node)
+        answer_match = CLUE_ANSWER_REGEX.search(answer_divs[0].get("onmouseover", "")) if answer_divs else None
+        answer = _remove_html_tags(answer_match.group(1)) if answer_match else None
+        if not answer:
+            raise IncompleteClueError
+
+        value_nodes = self._clue_value(clue_node)
+        value = parse_clue_value(value_nodes[0].text_content()) if value_nodes else None
+        daily_double = bool(value_nodes) and "clue_value_daily_double" in value_nodes[0].get("class", "").split()
+        return {"question": question, "answer": answer, "value": value, "daily_double": daily_double}
+
+
+VOID_ELEMENTS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source",
+        "track", "wbr"))  # Never closed, so never pushed onto StreamingGameParser's stack.
+ROLE_ROUND, ROLE_CATEGORY, ROLE_CLUE, ROLE_QUESTION, ROLE_VALUE = range(5)
+
+
+class _StreamedClue:
+    """The parts of one td.clue the parsers read: the text of its first clue_text and value cells, and the onmouseover
+    script of its first div."""
+
+    __slots__ = ("question", "answer_script", "value_text", "daily_double")
+
+    def __init__(self):
+        self.question = None
+        self.answer_script = None
+        self.value_text = None
+        self.daily_double = False
+
+
+def _serialize_streamed_clue(clue):
+    question = _remove_html_tags(clue.question) if clue.question else None
+    if not question:
+        raise IncompleteClueError
+
+    answer_match = CLUE_ANSWER_REGEX.search(clue.answer_script) if clue.answer_script else None
+    answer = _remove_html_tags(answer_match.group(1)) if answer_match else None
+    if not answer:
+        raise IncompleteClueError
+
+    value = parse_clue_value(clue.value_text) if clue.value_text is not None else None
+    return {"question": question, "answer": answer, "value": value, "daily_double": clue.daily_double}
+
+
+class StreamingGameParser(HTMLParser):
+    """
+    Incremental parser of a j-archive game page. Call feed() with each chunk of markup, then close().
+
+    Outside a round table, start tags are only checked for class="round". Inside one, a stack of the open elements'
+    tag names is kept, and only the round's category titles and clue fields are collected. When the round table
+    closes they are paired up like the other backends' rounds, and released.
+
+    Attributes:
+        categories [models.Category]: Categories of every round table closed so far, in page order.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.categories = []
+        self._round_count = 0
+        self._stack = None  # [(tag, role)] of the elements open inside the current round table, or None outside one.
+        self._titles = []
+        self._clues = []
+        self._clue = None  # Clue of the open td.clue.
+        self._text = None  # Text parts of the open title, question or value cell.
+
+    # feed() and close() are overridden only so their frames are in this module, where profiling.STAGE_MARKERS
+    # recognizes them as parsing.
+    def feed(self, data):
+        super().feed(data)
+
+    def close(self):
+        super().close()
+
+    def handle_starttag(self, tag, attrs):
+        if self._stack is None:
+            if tag == "table" and "round" in _attr_classes(attrs):
+                self._stack = [(tag, ROLE_ROUND)]
+            return
+        if tag in VOID_ELEMENTS:
+            return
+
+        role = None
+        if tag == "td":
+            classes = _attr_classes(attrs)
+            if "category_name" in classes:
+                role = ROLE_CATEGORY
+            elif "clue" in classes:
+                role = ROLE_CLUE
+                self._clue = _StreamedClue()
+                self._clues.append(self._clue)
+            elif self._clue is not None and self._clue.question is None and "clue_text" in classes:
+                role = ROLE_QUESTION
+            elif self._clue is not None and self._clue.value_text is None and \
+                    ("clue_value" in classes or "clue_value_daily_double" in classes):
+                role = ROLE_VALUE
+                self._clue.daily_double = "clue_value_daily_double" in classes
+            if role in (ROLE_CATEGORY, ROLE_QUESTION, ROLE_VALUE):
+                self._text = []
+        elif tag == "div" and self._clue is not None and self._clue.answer_script is None:
+            self._clue.answer_script = dict(attrs).get("onmouseover") or ""
+        self._stack.append((tag, role))
+
+    def handle_endtag(self, tag):
+        if self._stack is None or not any(open_tag == tag for open_tag, _ in self._stack):
+            return  # Stray end tags are ignored, as bs4 does.
+        while True:
+            open_tag, role = self._stack.pop()
+            self._close_element(role)
+            if open_tag == tag:
+                return
+
+    def handle_data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def _close_element(self, role):
+        if role == ROLE_CATEGORY:
+            self._titles.append("".join(self._text))
+        elif role == ROLE_QUESTION:
+            self._clue.question = "".join(self._text)
+        elif role == ROLE_VALUE:
+            self._clue.value_text = "".join(self._text)
+        elif role == ROLE_CLUE:
+            self._clue = None
+        elif role == ROLE_ROUND:
+            self._close_round()
+        if role in (ROLE_CATEGORY, ROLE_QUESTION, ROLE_VALUE):
+            self._text = None
+
+    def _close_round(self):
+        self._round_count += 1
+        try:
+            round_categories_and_clues = serialize_round_nodes(self._titles, self._clues, _serialize_streamed_clue)
+        except MalformedRoundHTMLError:
+            round_categories_and_clues = {}
+        self.categories.extend(Category.from_clues(title, self._round_count, clues)
+                for title, clues in round_categories_and_clues.items())
+        self._stack = None
+        self._titles, self._clues = [], []
+
+    def game(self, url=None):
+        """Returns a models.Game of the categories parsed so far."""
+
+        return Game(self.categories, url=url)
+
+
+def _attr_classes(attrs):
+    for name, value in attrs:
+        if name == "class":
+            return (value or "").split()
+    return ()
+
+
+class StreamBackend:
+    """
+    Tree-free backend built on the standard library's incremental HTML tokenizer. Markup can be fed as it downloads
+    (see scraper.ScraperWorker.stream_game_page), so a page is mostly parsed by the time its last byte arrives.
+    """
+
+    name = "stream"
+    streaming = True
+
+    def parse_game(self, markup, url=None):
+        return self.parse_game_chunks((markup,), url)
+
+    def parse_game_chunks(self, chunks, url=None):
+        """Returns a models.Game parsed from an iterable of markup chunks."""
+
+        parser = StreamingGameParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+        return parser.game(url)
+
+    def parse_game_markup(self, markup):
+        return self.parse_game(markup).to_dict()
+
+
+PARSER_BACKENDS = {
+        Bs4Backend.name: Bs4Backend,
+        LxmlBackend.name: LxmlBackend,
+        StreamBackend.name: StreamBackend
+        }
+
+_backend_instances = {}
+
+
+def get_parser_backend(name=DEFAULT_PARSER_BACKEND):
+    """Returns the shared instance of the backend registered under name.
+
+    Raises:
+        ValueError if name is not a registered backend, or if the backend's library is not installed.
+    """
+
+    if name not in _backend_instances:
+        if name not in PARSER_BACKENDS:
+            raise ValueError("Unknown parser backend: {}".format(name))
+        _backend_instances[name] = PARSER_BACKENDS[name]()
+    return _backend_instances[name]
+
+
+def parse_game_markup(markup, backend=DEFAULT_PARSER_BACKEND, url=None):
+    """Parses the markup of the j-archive game page at url with the named backend. Returns a models.Game.
+
+    Defined at module level, so it can be submitted to a process pool and only the compact result is sent back.
+    """
+
+    return get_parser_backend(backend).parse_game(markup, url)
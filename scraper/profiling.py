@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""This module contains the scraper's profiling mode.
+
+cProfile only sees the thread that enabled it, and the main thread spends a crawl waiting on game_data_queue.
+PipelineProfiler covers every thread in two ways:
+
+    Deterministic: a cProfile.Profile is enabled in each thread started while profiling, through threading.setprofile.
+        On Python 3.12+ cProfile sees every thread already, so a single profile is used.
+    Sampling: a daemon thread samples the stack of every thread each <interval> seconds with sys._current_frames.
+
+Results are written to an output directory:
+
+    profile.pstats: Deterministic profile merged across all threads. Open with pstats, snakeviz or gprof2dot.
+    profile-<role>.pstats: Deterministic profile of one thread role: main, discovery, worker or writer (Python < 3.12 only).
+    stacks.collapsed: Every stack sample, in the collapsed format read by flamegraph.pl and speedscope.
+    stacks-<stage>.collapsed: Stack samples of one pipeline stage: discover, fetch, parse, save or other.
+
+Parse process pools run in other processes, and are not profiled.
+"""
+import collections
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# A sample belongs to the stage of the outermost marker function on its stack, so the season page fetches made during
+# discovery count as discovery rather than fetch. Samples without a marker, such as workers waiting on a queue, are "other".
+# Markers are (module, function name) pairs of this package, so a same-named function elsewhere is never mistaken for one.
+STAGE_MARKERS = {
+        ("scraper.scraper", "discover_game_urls"): "discover",
+        ("scraper.async_engine", "_get_season_game_urls"): "discover",
+        ("scraper.async_engine", "_get_current_season_number"): "discover",
+        ("scraper.scraper", "get_game_page_markup"): "fetch",
+        ("scraper.parser", "get_page_markup"): "fetch",
+        ("scraper.async_engine", "_fetch_page"): "fetch",
+        ("scraper.transport", "iter_text"): "fetch",  # Pages downloaded chunk by chunk by ScraperWorker.stream_game_page.
+        ("scraper.parser_backends", "parse_game_markup"): "parse",
+        ("scraper.parser_backends", "feed"): "parse",  # StreamingGameParser, fed each chunk by stream_game_page.
+        ("scraper.parser_backends", "close"): "parse",
+        ("scraper.scraper", "save_game"): "save",
+        ("scraper.scraper", "cleanup"): "save",
+        ("scraper.writer", "_write_batch"): "save",
+        ("scraper.writer", "_cleanup"): "save"
+        }
+STAGES = ("discover", "fetch", "parse", "save", "other")
+
+
+def thread_role(thread_name):
+    """Returns the pipeline role of a thread, from the names JArchiveScraper gives its threads."""
+
+    if thread_name == "MainThread":
+        return "main"
+    if thread_name == "URL Worker Thread":
+        return "discovery"
+    if thread_name.startswith("Worker Thread"):
+        return "worker"
+    if thread_name.startswith("Sink Writer Thread"):
+        return "writer"
+    return "other"
+
+
+def classify_stack(functions):
+    """Returns the pipeline stage of a stack, given its (module, function name) pairs from outermost to innermost."""
+
+    for function in functions:
+        stage = STAGE_MARKERS.get(function)
+        if stage:
+            return stage
+    return "other"
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return "{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class StackSampler(threading.Thread):
+    """
+    Daemon thread counting the collapsed stacks of every other thread.
+
+    Attributes:
+        stacks (collections.Counter): Maps (stage, "thread;outer frame;...;inner frame") -> number of samples.
+    """
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        threading.Thread.__init__(self, name="Profile Sampler Thread", daemon=True)
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def sample(self):
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == self.ident:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+            frames.reverse()
+            stage = classify_stack([(f.f_globals.get("__name__"), f.f_code.co_name) for f in frames])
+            thread_name = thread_names.get(thread_id, "thread-{}".format(thread_id))
+            stack = ";".join([thread_name] + [_frame_label(f) for f in frames])
+            self.stacks[(stage, stack)] += 1
+
+
+class PipelineProfiler:
+    """
+    Profiles every thread of a scraper run. Use as a context manager around JArchiveScraper.start() and cleanup().
+
+    Args:
+        output_dir (str): Directory the pstats and collapsed stack files are written to. Created if needed.
+        interval (float): Seconds between stack samples.
+
+    Attributes:
+        profiles (list): (thread name, cProfile.Profile) of every profiled thread.
+        sampler (StackSampler): Sampling thread, once started.
+    """
+
+    def __init__(self, output_dir, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.per_thread = sys.version_info < (3, 12)
+        self.profiles = []
+        self.sampler = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        self.write()
+
+    def start(self):
+        self.sampler = StackSampler(self.interval)
+        self.sampler.start()  # Started before the thread hook is installed, so the sampler itself is not profiled.
+        if self.per_thread:
+            threading.setprofile(self._profile_new_thread)
+        self._enable_profile(threading.current_thread().name)
+
+    def stop(self):
+        if self.per_thread:
+            threading.setprofile(None)
+        for name, profile in self.profiles:
+            if name == threading.current_thread().name:
+                profile.disable()
+        self.sampler.stop()
+
+    def _profile_new_thread(self, frame, event, arg):
+        # Installed as the profile function of each new thread. Replaces itself with a cProfile.Profile on the first event.
+        sys.setprofile(None)
+        self._enable_profile(threading.current_thread().name)
+
+    def _enable_profile(self, thread_name):
+        profile = cProfile.Profile()
+        with self._lock:
+            self.profiles.append((thread_name, profile))
+        profile.enable()
+
+    def write(self):
+        """Writes the pstats and collapsed stack files, and returns their paths."""
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        paths = [self._write_pstats("profile.pstats", self.profiles)]
+        if self.per_thread:
+            roles = collections.defaultdict(list)
+            for name, profile in self.profiles:
+                roles[thread_role(name)].append((name, profile))
+            for role, profiles in sorted(roles.items()):
+                paths.append(self._write_pstats("profile-{}.pstats".format(role), profiles))
+
+        paths.append(self._write_collapsed("stacks.collapsed", STAGES))
+        for stage in STAGES:
+            paths.append(self._write_collapsed("stacks-{}.collapsed".format(stage), [stage]))
+        return paths
+
+    def _write_pstats(self, filename, profiles):
+        path = os.path.join(self.output_dir, filename)
+        stats = pstats.Stats(profiles[0][1])
+        for _, profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+        return path
+
+    def _write_collapsed(self, filename, stages):
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w", encoding="utf-8") as f:
+            for (stage, stack), count in sorted(self.sampler.stacks.items()):
+                if stage in stages:
+                    f.write("{} {}\n".format(stack, count))
+        return path
+
+    def stage_samples(self):
+        """Returns a dict mapping each stage to its number of stack samples."""
+
+        counts = dict.fromkeys(STAGES, 0)
+        for (stage, _), count in self.sampler.stacks.items():
+            counts[stage] += count
+        return counts
+
+    def print_summary(self, top=15):
+        total = sum(self.stage_samples().values()) or 1
+        print("Stack samples by pipeline stage:")
+        for stage, count in self.stage_samples().items():
+            print("    {:<9} {:>8,} ({:.1%})".format(stage, count, count / total))
+        print("Profile files written to {}".format(self.output_dir))
+        stats = pstats.Stats(os.path.join(self.output_dir, "profile.pstats"))
+        stats.sort_stats("cumulative").print_stats(top)
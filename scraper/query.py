@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""This module contains the query API for drawing random clues, optionally filtered by season, game, round, category
+title, value or daily double.
+
+ClueSampler (SQLite) keeps a sample index per filter: every matching clue gets a dense ordinal 0..count-1, stored in a
+WITHOUT ROWID table keyed by (filter, ordinal). A draw picks random ordinals and looks each one up with a primary key
+seek, so it costs O(log n) instead of the full scan behind ORDER BY RANDOM(). An index is built by one pass over the
+matching clues the first time its filter is used, and extended with newer clues (clue ids only grow) on later draws.
+
+The indexes are stored in the clue database, so they outlive the sampler and are shared by every sampler of the file.
+Triggers on clues, categories and games bump a row of version numbers whenever a change other than a new clue could
+move clues in or out of an index: clues deleted or changed, categories renamed, or games deleted or given another
+season. An index records the versions it was built at, and is built again on its next draw once they differ. Checking
+an index is a read of that row, of MAX(clues.id) and of the index's own row, all primary key seeks.
+
+MongoClueSampler draws from the clues collection using the random sample_key stored on every document, through the
+compound indexes MongoDatabase creates.
+"""
+import json
+import random
+import sqlite3
+import threading
+
+# Filter name -> SQL column. Every filter is an equality test.
+SQLITE_FILTER_COLUMNS = {
+        "season": "games.season",
+        "game_id": "clues.game_id",
+        "round_number": "clues.round",
+        "category": "categories.title",
+        "value": "clues.value",
+        "daily_double": "clues.daily_double"
+        }
+
+CLUE_COLUMNS_SQL = """clues.id, categories.title, clues.question, clues.answer, clues.value, clues.daily_double,
+            clues.round, clues.game_id, games.season"""
+CLUE_JOIN_SQL = """JOIN categories ON categories.id = clues.category_id
+            LEFT JOIN games ON games.id = clues.game_id"""
+SAMPLE_CHUNK_SIZE = 500  # Ordinals looked up per query, well under SQLite's bound parameter limit.
+SAMPLE_TABLES_SQL = (
+        """CREATE TABLE IF NOT EXISTS sample_versions(id INTEGER PRIMARY KEY CHECK (id = 0), clues INT NOT NULL,
+                    seasons INT NOT NULL)""",
+        """INSERT OR IGNORE INTO sample_versions(id, clues, seasons) VALUES (0, 0, 0)""",
+        """CREATE TABLE IF NOT EXISTS sample_filters(filter_key TEXT PRIMARY KEY, built_through INT NOT NULL,
+                    count INT NOT NULL, clues_version INT NOT NULL, seasons_version INT NOT NULL)""",
+        """CREATE TABLE IF NOT EXISTS sample_index(filter_key TEXT NOT NULL,
+                    ordinal INT NOT NULL,
+                    clue_id INT NOT NULL,
+                    PRIMARY KEY(filter_key, ordinal)
+                ) WITHOUT ROWID"""
+        )
+BUMP_CLUES_VERSION_SQL = """UPDATE sample_versions SET clues = clues + 1"""
+BUMP_SEASONS_VERSION_SQL = """UPDATE sample_versions SET seasons = seasons + 1"""
+# INSERT OR REPLACE does not fire delete triggers, so a game saved again under another season is caught before the insert.
+SAMPLE_TRIGGERS_SQL = tuple("""CREATE TRIGGER IF NOT EXISTS {} BEGIN {}; END""".format(head, body) for head, body in (
+        ("sample_clues_deleted AFTER DELETE ON clues", BUMP_CLUES_VERSION_SQL),
+        ("sample_clues_updated AFTER UPDATE OF id, category_id, game_id, round, value, daily_double ON clues",
+                BUMP_CLUES_VERSION_SQL),
+        ("sample_categories_deleted AFTER DELETE ON categories", BUMP_CLUES_VERSION_SQL),
+        ("sample_categories_updated AFTER UPDATE OF id, title ON categories", BUMP_CLUES_VERSION_SQL),
+        ("sample_games_deleted AFTER DELETE ON games", BUMP_SEASONS_VERSION_SQL),
+        ("sample_games_updated AFTER UPDATE OF id, season ON games", BUMP_SEASONS_VERSION_SQL),
+        ("""sample_games_replaced BEFORE INSERT ON games
+                    WHEN EXISTS (SELECT 1 FROM games WHERE id = new.id AND season IS NOT new.season)""",
+                BUMP_SEASONS_VERSION_SQL)
+        ))
+
+
+def _filter_sql(filters):
+    """Returns (SQL condition, parameters) for a dict of filters. Unknown filter names raise ValueError."""
+
+    conditions, params = [], []
+    for name, value in sorted(filters.items()):
+        if name not in SQLITE_FILTER_COLUMNS:
+            raise ValueError("Unknown clue filter: {}".format(name))
+        conditions.append("{} = ?".format(SQLITE_FILTER_COLUMNS[name]))
+        params.append(int(value) if isinstance(value, bool) else value)
+    return (" AND ".join(conditions) or "1"), params
+
+
+def _clue_from_row(row):
+    return {"id": row[0], "category": row[1], "question": row[2], "answer": row[3], "value": row[4],
+            "daily_double": bool(row[5]), "round_number": row[6], "game_id": row[7], "season": row[8]}
+
+
+def naive_sample(conn, n=1, **filters):
+    """Draws n random clues matching filters with ORDER BY RANDOM(), which reads every matching row. For comparison."""
+
+    condition, params = _filter_sql(filters)
+    rows = conn.execute("""SELECT {} FROM clues {} WHERE {} ORDER BY RANDOM() LIMIT ?""".format(CLUE_COLUMNS_SQL, CLUE_JOIN_SQL, condition),
+            params + [n]).fetchall()
+    return [_clue_from_row(row) for row in rows]
+
+
+class ClueSampler:
+    """
+    Draws random clues from an SQLite database written by SqliteDatabase. Safe to share between threads. Creates its
+    sample index tables and triggers in the clue database when first opened on it.
+
+    Args:
+        db_path (str): File path, optionally prefixed with sqlite:///.
+        rng (random.Random): Source of randomness. Defaults to a new random.Random.
+    """
+
+    def __init__(self, db_path, rng=None):
+        from .search import sqlite_file_path
+        self.db_path = sqlite_file_path(db_path)
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for sql in SAMPLE_TABLES_SQL + SAMPLE_TRIGGERS_SQL:
+            self.conn.execute(sql)
+        self.conn.commit()
+
+    def sample(self, n=1, **filters):
+        """
+        Returns up to n distinct random clues matching every filter, as dicts with id, category, question, answer,
+        value, daily_double, round_number, game_id and season keys. Fewer are returned if fewer clues match.
+
+        Filters: season, game_id, round_number, category (exact title), value, daily_double.
+        """
+
+        filter_key = json.dumps({name: value for name, value in filters.items() if value is not None}, sort_keys=True)
+        active_filters = json.loads(filter_key)
+        with self._lock:
+            count = self._update_index(filter_key, active_filters)
+            if not count:
+                return []
+            ordinals = self.rng.sample(range(count), min(n, count))
+            clues_by_ordinal = {}
+            for start in range(0, len(ordinals), SAMPLE_CHUNK_SIZE):
+                chunk = ordinals[start:start + SAMPLE_CHUNK_SIZE]
+                rows = self.conn.execute("""SELECT sample_index.ordinal, {} FROM sample_index
+                            JOIN clues ON clues.id = sample_index.clue_id {}
+                            WHERE sample_index.filter_key = ? AND sample_index.ordinal IN ({})""".format(
+                                CLUE_COLUMNS_SQL, CLUE_JOIN_SQL, ",".join("?" * len(chunk))),
+                        [filter_key] + chunk).fetchall()
+                clues_by_ordinal.update((row[0], _clue_from_row(row[1:])) for row in rows)
+        return [clues_by_ordinal[ordinal] for ordinal in ordinals if ordinal in clues_by_ordinal]
+
+    def prepare(self, **filters):
+        """Builds or extends the sample index of a filter ahead of the first draw. Returns the number of matching clues."""
+
+        filter_key = json.dumps({name: value for name, value in filters.items() if value is not None}, sort_keys=True)
+        with self._lock:
+            return self._update_index(filter_key, json.loads(filter_key))
+
+    def _update_index(self, filter_key, filters):
+        """Appends clues saved since the index of filter_key was last built, building it again from the start if the
+        clue database changed under it. Returns the index's clue count."""
+
+        built_through, count, clues_through, _ = self._index_state(filter_key, filters)
+        if built_through >= clues_through:
+            return count
+        self.conn.execute("""BEGIN IMMEDIATE""")  # Another sampler of the file may be extending the same index.
+        try:
+            built_through, count, clues_through, versions = self._index_state(filter_key, filters)
+            if built_through == 0:
+                self.conn.execute("""DELETE FROM sample_index WHERE filter_key = ?""", (filter_key,))
+            if clues_through > built_through:
+                condition, params = _filter_sql(filters)
+                cursor = self.conn.execute("""INSERT INTO sample_index(filter_key, ordinal, clue_id)
+                            SELECT ?, ? + ROW_NUMBER() OVER (ORDER BY clues.id) - 1, clues.id FROM clues {}
+                            WHERE clues.id > ? AND clues.id <= ? AND {}""".format(CLUE_JOIN_SQL, condition),
+                        [filter_key, count, built_through, clues_through] + params)
+                count += cursor.rowcount
+            self.conn.execute("""INSERT OR REPLACE INTO sample_filters(filter_key, built_through, count, clues_version,
+                        seasons_version) VALUES (?,?,?,?,?)""", (filter_key, clues_through, count) + versions)
+        except BaseException:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+        return count
+
+    def _index_state(self, filter_key, filters):
+        """Returns (built_through, count) of the index of filter_key, or (0, 0) if it is missing or out of date, then
+        the highest clue id and the current (clues, seasons) versions."""
+
+        versions = self.conn.execute("""SELECT clues, seasons FROM sample_versions WHERE id = 0""").fetchone()
+        clues_through = self.conn.execute("""SELECT COALESCE(MAX(id), 0) FROM clues""").fetchone()[0]
+        row = self.conn.execute("""SELECT built_through, count, clues_version, seasons_version FROM sample_filters
+                    WHERE filter_key = ?""", (filter_key,)).fetchone()
+        if row is None or row[2] != versions[0] or ("season" in filters and row[3] != versions[1]):
+            return 0, 0, clues_through, versions
+        return row[0], row[1], clues_through, versions
+
+    def reset(self):
+        """Drops every sample index."""
+
+        with self._lock:
+            self.conn.execute("""DELETE FROM sample_index""")
+            self.conn.execute("""DELETE FROM sample_filters""")
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+# Filter name -> clue document field.
+MONGO_FILTER_FIELDS = {
+        "season": "season",
+        "game_id": "game_id",
+        "round_number": "round",
+        "category": "category",
+        "value": "value",
+        "daily_double": "daily_double"
+        }
+
+
+class MongoClueSampler:
+    """
+    Draws random clues from the clues collection written by MongoDatabase.
+
+    Each draw seeks to the first matching document whose sample_key is at or after a random point, wrapping around
+    at the end, through an index on (filter field, sample_key): one O(log n) seek per draw. A document is chosen with
+    probability proportional to the gap before its key, which averages out to uniform over a large collection.
+
+    Args:
+        collection (pymongo.collection.Collection): The clues collection.
+        rng (random.Random): Source of randomness. Defaults to a new random.Random.
+    """
+
+    def __init__(self, collection, rng=None):
+        self.collection = collection
+        self.rng = rng or random.Random()
+
+    def sample(self, n=1, **filters):
+        """Returns up to n random clues matching every filter, in the same shape as ClueSampler.sample. Draws are
+        independent, so a clue may be returned more than once."""
+
+        document_filter = {}
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name not in MONGO_FILTER_FIELDS:
+                raise ValueError("Unknown clue filter: {}".format(name))
+            document_filter[MONGO_FILTER_FIELDS[name]] = value
+
+        clues = []
+        for _ in range(n):
+            clue = self._draw(document_filter)
+            if clue is None:
+                break  # Nothing matches.
+            clues.append(clue)
+        return clues
+
+    def _draw(self, document_filter):
+        point = self.rng.random()
+        document = self.collection.find_one(dict(document_filter, sample_key={"$gte": point}), sort=[("sample_key", 1)])
+        if document is None:
+            document = self.collection.find_one(dict(document_filter, sample_key={"$lt": point}), sort=[("sample_key", 1)])
+        if document is None:
+            return None
+        return {"id": document["_id"], "category": document["category"], "question": document["question"],
+                "answer": document["answer"], "value": document.get("value"), "daily_double": bool(document.get("daily_double")),
+                "round_number": document.get("round"), "game_id": document.get("game_id"), "season": document.get("season")}
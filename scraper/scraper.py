@@ -1,20 +1,46 @@
 #!/usr/bin/env python3
 import atexit
+import hashlib
 import queue
-import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import requests
 import sys
 import threading
-from time import sleep
+from time import monotonic, sleep
 from .exceptions import MalformedRoundHTMLError, IncompleteClueError, DatabaseOperationalError
-from .parser import get_page_soup, parse_jarchive_page #, get_season_game_urls
+from .parser import (JARCHIVE_BASE_URL,
+        get_page_soup,
+        get_page_markup,
+        make_page_soup,
+        parse_current_season_number,
+        parse_season_game_urls
+        )
+from .parser_backends import DEFAULT_PARSER_BACKEND, StreamingGameParser, get_parser_backend, parse_game_markup
 from .database_status_codes import DATABASE_STATUS_CODES
+from .ledger import COMPLETE_STATUSES, LEDGER_STATUS_FAILED
+from .coordination import UNIT_KIND_SEASON, LeaseHeartbeat, make_owner_id, season_unit_key
+from .metrics import PipelineMetrics
+from .season_index import CURRENT_SEASON_MAX_AGE
+from .sharding import archived_game_seasons
+from .transport import DEFAULT_MAX_RETRIES, DEFAULT_TIMEOUT, HttpTransport, default_transport
+from .writer import GameWriter
 
 import logging
 from datetime import datetime
 
 MAX_THREADS = 8
+SEASON_DISCOVERY_THREADS = 8
 URL_SENTINEL = "FINISHED"
+WORKER_FINISHED_SENTINEL = "WORKER FINISHED"  # Put into game_data_queue by each ScraperWorker as it exits.
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_LEASE_BATCH = 8  # Work units leased at a time by LeasedUrlWorker.
+LEASE_POLL_INTERVAL = 2  # Seconds LeasedUrlWorker waits for other processes' leases to finish or expire.
+DEFAULT_MAX_QUEUED_LEASES = 8  # Leased game urls LeasedUrlWorker lets wait in url_queue before leasing more.
+QUEUED_LEASE_POLL_INTERVAL = 0.1
+WATCH_MIN_INTERVAL = 5 * 60  # Seconds between polls of a watched season page while games are being found.
+WATCH_MAX_INTERVAL = 3 * 60 * 60  # Longest wait between polls, reached after a run of unchanged polls.
+WATCH_BACKOFF_FACTOR = 2
+WATCH_MAX_GAME_ATTEMPTS = 3  # Times a watched game that failed is queued before it is left for the next crawl.
 
 class JArchiveScraper:
     """
@@ -23,24 +49,103 @@ class JArchiveScraper:
     Args:
         database: Object responsible for saving the data scraped from j-archive. Should expose a 
         'save' method that accepts a dictionary of category:[clues] parsed from the webpage.
+            A writer.GameWriter saves games on threads of its own instead of the main loop, to one or more databases.
 
     Attributes:
         url_queue (queue.Queue): Shared among worker threads and populated with j-archive page urls that
-            are queued to be scraped.
+            are queued to be scraped. Holds at most queue_size urls, so url discovery waits for the workers.
 
-        game_data_queue (queue.Queue): Populated with game data dicts created by ScraperWorker threads, for entry into database.
+        game_data_queue (queue.Queue): Populated with models.Game records created by ScraperWorker threads, for entry into database.
+            Holds at most queue_size games, so workers stop fetching while the database falls behind.
 
         workers [ScraperWorker]: List of references to worker threads.
 
         url_worker (threading.Thread): Responsible for populating the url_queue for ScraperWorkers threads to consume.
+
+        base_url (str): Root of the j-archive site to scrape. Overridden to point the scraper at a local stand-in server.
+
+        archive (archive.PageArchive): If given, the raw markup of every fetched page is stored here for offline re-parsing.
+
+        parse_processes (int): If given, game pages are parsed in a pool of this many processes instead of in the fetching
+            threads, so parsing is not serialized by the GIL. Workers hand each page to the pool and go on fetching; the
+            main loop waits for the parse once the page reaches the front of game_data_queue, so up to queue_size pages
+            can be parsing at once whatever the number of worker threads.
+
+        parse_pool (concurrent.futures.ProcessPoolExecutor): Pool started with parse_processes workers, or None.
+
+        parser_backend (str): Name of the parser_backends backend game pages are parsed with.
+
+        ledger (ledger.CrawlLedger): If given, records the status of every game, so an interrupted crawl can be resumed
+            without fetching or saving completed games again. Games are only marked done once the database has flushed them.
+
+        season_index (season_index.SeasonIndex): If given, caches the game urls of closed seasons between crawls.
+
+        queue_size (int): Item budget of url_queue and game_data_queue.
+
+        worker_threads (int): Number of ScraperWorker threads.
+
+        metrics (metrics.PipelineMetrics): Per-stage counters, gauges and latency histograms for this run.
+
+        game_seasons (dict): Maps each queued game url to the season page it was listed on, until the game is saved.
+
+        work_store (coordination.WorkStore): If given, seasons and games are leased from this store, which other
+            scraper processes share, instead of all being discovered by this process. The store also takes the place
+            of the ledger.
+
+        owner (str): Id this process leases work units under.
+
+        transport (transport.HttpTransport): Pooled, retrying HTTP transport every page is requested through. If none
+            is given, one counting into metrics is created with http_timeout, a (connect, read) timeout in seconds, and
+            http_retries retries per request.
+
+        watch (bool): Instead of crawling once, keep polling the current season page (or starting_season's) for new
+            games, until stop_watching() is called. Requires a ledger, which records the games already stored.
+            See WatchUrlWorker; watch_interval and watch_max_interval bound the seconds between polls.
     """
 
-    def __init__(self, database, starting_season=None, get_single_season=False):
+    def __init__(self, database, starting_season=None, get_single_season=False, base_url=JARCHIVE_BASE_URL, archive=None,
+            parse_processes=None, parser_backend=DEFAULT_PARSER_BACKEND, ledger=None, season_index=None,
+            queue_size=DEFAULT_QUEUE_SIZE, worker_threads=MAX_THREADS-1, work_store=None, transport=None,
+            http_timeout=DEFAULT_TIMEOUT, http_retries=DEFAULT_MAX_RETRIES, watch=False, watch_interval=WATCH_MIN_INTERVAL,
+            watch_max_interval=WATCH_MAX_INTERVAL):
+        if watch and (ledger is None or work_store is not None):
+            raise ValueError("Watching for new games requires a ledger, and cannot be combined with a work store.")
+        if work_store is not None:
+            if ledger is not None:
+                raise ValueError("A work store records game status itself, so it cannot be combined with a ledger.")
+            ledger = work_store  # Stores take the ledger's status updates.
+        self.work_store = work_store
+        self.owner = make_owner_id()
+        self.heartbeat = None
         self.database = database
-        self.url_queue = queue.Queue()
-        self.game_data_queue = queue.Queue()
+        self.worker_threads = worker_threads
+        self.season_index = season_index
+        self.ledger = ledger
+        self._unflushed_urls = []
+        self._unflushed_counts = {}  # {url: (categories, clues)} of games saved but not flushed yet.
+        self._unflushed_counts_lock = threading.Lock()  # The writer's callbacks run on its threads.
+        self._counted_duplicate_clues = 0
+        self._saved_reported = False
+        self.parser_backend = parser_backend
+        self.base_url = base_url
+        self.archive = archive
+        self.parse_processes = parse_processes
+        self.parse_pool = None
+        self.url_queue = queue.Queue(maxsize=queue_size)
+        self.game_data_queue = queue.Queue(maxsize=queue_size)
+        self.metrics = PipelineMetrics(self.url_queue, self.game_data_queue)
+        self.transport = transport or HttpTransport(timeout=http_timeout, max_retries=http_retries, metrics=self.metrics)
+        self.writer = database if isinstance(database, GameWriter) else None
+        if self.writer:
+            self.writer.metrics = self.metrics
+            self.writer.on_flushed = self._on_games_written
+            self.writer.on_failed = self._on_games_not_written
+        self.game_seasons = {}
         self.starting_season = starting_season
         self.get_single_season = get_single_season
+        self.watch = watch
+        self.watch_interval = watch_interval
+        self.watch_max_interval = watch_max_interval
         self.finished = False
 
         self.url_worker = None;  # TODO: more than one?
@@ -49,18 +154,37 @@ class JArchiveScraper:
         atexit.register(self.cleanup)
 
     def init_workers(self):
-        for i in range(MAX_THREADS-1):
-            w = ScraperWorker(self.url_queue, self.game_data_queue)
+        self._start_scraper_workers(ScraperWorker)
+
+        if self.work_store:
+            self.heartbeat = LeaseHeartbeat(self.work_store, self.owner)
+            self.heartbeat.start()
+            self.url_worker = LeasedUrlWorker(self.url_queue, self.work_store, self.owner, base_url=self.base_url,
+                    archive=self.archive, season_index=self.season_index, game_seasons=self.game_seasons,
+                    transport=self.transport)
+        elif self.watch:
+            stored_game_urls = getattr(self.database, "stored_game_urls", None)
+            self.url_worker = WatchUrlWorker(self.url_queue, self.ledger, min_interval=self.watch_interval,
+                    max_interval=self.watch_max_interval, stored_urls=stored_game_urls() if stored_game_urls else None,
+                    metrics=self.metrics, base_url=self.base_url, archive=self.archive, season_index=self.season_index,
+                    game_seasons=self.game_seasons, transport=self.transport)
+        else:
+            self.url_worker = UrlWorker(self.url_queue, base_url=self.base_url, archive=self.archive, ledger=self.ledger,
+                    season_index=self.season_index, game_seasons=self.game_seasons, transport=self.transport)
+        self.url_worker.daemon = True
+        self.url_worker.name = "URL Worker Thread"
+        self.url_worker.start(starting_season = self.starting_season, get_single_season = self.get_single_season)
+
+    def _start_scraper_workers(self, worker_cls):
+        self.metrics.workers_total.set(self.worker_threads)
+        for i in range(self.worker_threads):
+            w = worker_cls(self.url_queue, self.game_data_queue, archive=self.archive, parse_pool=self.parse_pool,
+                    parser_backend=self.parser_backend, ledger=self.ledger, metrics=self.metrics, transport=self.transport)
             w.daemon = True
             self.workers.append(w)
             w.name = "Worker Thread {}".format(i)
             w.start()
 
-        self.url_worker = UrlWorker(self.url_queue)
-        self.url_worker.daemon = True
-        self.url_worker.name = "URL Worker Thread"
-        self.url_worker.start(starting_season = self.starting_season, get_single_season = self.get_single_season)
-
     def start(self):
         """Entry point for scraping j-archive.
         Args:
@@ -72,10 +196,18 @@ class JArchiveScraper:
         if not connection_success:
             print("DB CONNECTION ERROR: <put error here>")
             sys.exit(0)
-        
+
+        if self.parse_processes:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_processes)
         self.init_workers()
         self.mainloop()
 
+    def stop_watching(self):
+        """Stops polling for new games. The crawl finishes once the games already queued are saved."""
+
+        if isinstance(self.url_worker, WatchUrlWorker):
+            self.url_worker.stop()
+
     def _wait_for_db_connection(self):
         for attempt in range(10):  # 10 second timeout window.
             connection_status = self.database.get_connection_status()  #TODO: get err message, to return.
@@ -94,26 +226,41 @@ class JArchiveScraper:
 
     def on_finished(self):
         print("Finished scraping JArchive")
-        print("{:,} categories and {:,} clues were collected!".format(self.database.category_count, self.database.category_count * 5))
+        failures = self.metrics.fetch_failures.value + self.metrics.parse_failures.value + self.metrics.save_failures.value
+        if failures:
+            print("{:,} game pages could not be fetched, {:,} could not be parsed, and {:,} database saves failed.".format(
+                self.metrics.fetch_failures.value, self.metrics.parse_failures.value, self.metrics.save_failures.value))
+        if self.metrics.http_retries.value:
+            print("{:,} requests were retried.".format(self.metrics.http_retries.value))
+        if self.metrics.games_spilled.value:
+            print("{:,} games were spilled to disk while a database was behind or failing.".format(self.metrics.games_spilled.value))
         return
     
 
+    def report_saved(self):
+        """Prints how much the database stored, once it has flushed everything."""
+
+        if self._saved_reported:
+            return
+        self._saved_reported = True
+        print("{:,} categories and {:,} clues were collected!".format(self.metrics.categories_saved.value, self.metrics.clues_saved.value))
+        if self.metrics.clues_duplicate.value:
+            print("{:,} of those clues were already stored, so the database skipped them.".format(self.metrics.clues_duplicate.value))
+
     def onerror(self):  # What type of args?
         pass
 
 
     def mainloop(self):
         startime = datetime.now()
-        while not self.finished:
-            try:
-                data = self.game_data_queue.get(timeout=1)
-            except queue.Empty:
-                self._handle_empty_data_queue()
+        finished_workers = 0
+        while finished_workers < len(self.workers):
+            item = self.game_data_queue.get()
+            if item == WORKER_FINISHED_SENTINEL:
+                finished_workers += 1
                 continue
-            try:
-                self.database.save(data)
-            except DatabaseOperationalError as e:
-                self._handle_database_exception(e)  # TODO: implement this method!
+            self.save_queued_game(*item)
+        self.finished = True  # Every worker has exited, and everything they queued has been saved.
 
         finished_time = datetime.now() - startime
         logging.info(finished_time)
@@ -121,17 +268,140 @@ class JArchiveScraper:
         self.on_finished()
 
 
-    def _handle_empty_data_queue(self):
-        logging.info('Empty data queue. Active threads: ')
-        for t in threading.enumerate():
-            logging.info("\t{}".format(t.name))
-        logging.info('****************************************')
-        if any(t.is_alive() for t in self.workers):
-            return  # No data in queue right now, but workers are still working. Data will come eventually.
-        else:
-            self.finished = True
-            # No more workers are processing data. Once data queue is empty, we're finished.
-    
+    def save_queued_game(self, game_url, data, enqueued_at):
+        """Saves a game taken from game_data_queue, waiting for its parse first if it is a ParseJob."""
+
+        self.metrics.queue_wait_seconds.observe(monotonic() - enqueued_at)
+        if isinstance(data, ParseJob):
+            data = self.finish_parse(game_url, data)
+            if not data:
+                return
+        self.save_game(game_url, data)
+
+    def finish_watching(self):
+        """Stops watching when the main loop was interrupted. Game urls no worker has taken yet are dropped and left to
+        the next run; the games workers are fetching, and those waiting in game_data_queue, are saved. Returns once
+        every worker has exited, so none records into the ledger after cleanup() closes it. Call cleanup() afterwards
+        to flush the database."""
+
+        self.stop_watching()
+        threads = [thread for thread in [self.url_worker] + self.workers if thread is not None]
+        while True:
+            running = any(thread.is_alive() for thread in threads)
+            self._drop_queued_urls()
+            try:
+                item = self.game_data_queue.get(timeout=0.1) if running else self.game_data_queue.get_nowait()
+            except queue.Empty:
+                if running:
+                    continue
+                return
+            if item != WORKER_FINISHED_SENTINEL:
+                self.save_queued_game(*item)
+
+    def _join_watch_worker(self):
+        """Stops the watch worker, if any, and waits for it to exit."""
+
+        if not isinstance(self.url_worker, WatchUrlWorker):
+            return
+        self.url_worker.stop()
+        while self.url_worker.is_alive():
+            self._drop_queued_urls()  # So it is never left blocked queueing a game or the sentinel.
+            self.url_worker.join(0.1)
+
+    def _drop_queued_urls(self):
+        """Empties url_queue up to the sentinel, which is left for the workers to exit on."""
+
+        while True:
+            try:
+                url = self.url_queue.get_nowait()
+            except queue.Empty:
+                return
+            if url == URL_SENTINEL:
+                self.url_queue.put(URL_SENTINEL)
+                return
+
+    def finish_parse(self, game_url, job):
+        """Waits for a ParseJob, and records its page as parsed. Returns the models.Game, or None if the page had no
+        game or could not be parsed."""
+
+        try:
+            game, parse_seconds = job.future.result()
+        except Exception as e:
+            self.game_seasons.pop(game_url, None)
+            record_parse_failed(self.metrics, self.ledger, game_url, e)
+            return None
+        self.metrics.parse_seconds.observe(parse_seconds)
+        if not game:
+            self.metrics.games_empty.inc()
+            logging.info("Categories and clues for {} was None".format(game_url))
+        if self.ledger:
+            record_game_parsed(self.ledger, game_url, job.markup_hash, game)
+        return game
+
+    def save_game(self, game_url, game):
+        """Saves one models.Game, or hands it to the writer, and records in the ledger every game the database has flushed
+        as a result. The writer records them itself, through _on_games_written."""
+
+        if game.season is None:
+            game.season = self.game_seasons.pop(game_url, None)
+        with self._unflushed_counts_lock:
+            self._unflushed_counts[game_url] = (len(game), game.clue_count)
+        if self.writer:
+            self.writer.save(game, game_url)  # Returns without waiting for any database.
+            return
+        self._unflushed_urls.append(game_url)
+        try:
+            with self.metrics.save_seconds.time():
+                self.database.save(game)
+        except DatabaseOperationalError as e:
+            self.metrics.save_failures.inc()
+            self._on_flush_failed(e)
+            self._handle_database_exception(e)  # TODO: implement this method!
+            return
+        if self.database.unflushed_games == 0:
+            self._on_flushed()
+
+    def _on_flushed(self):
+        duplicate_clues = getattr(self.database, "duplicate_clue_count", 0)
+        self.metrics.clues_duplicate.inc(duplicate_clues - self._counted_duplicate_clues)
+        self._counted_duplicate_clues = duplicate_clues
+        self._record_saved(self._unflushed_urls)
+        if self.ledger:
+            self.ledger.mark_done(self._unflushed_urls)
+        self._unflushed_urls = []
+
+    def _on_flush_failed(self, e):
+        self._counted_duplicate_clues = getattr(self.database, "duplicate_clue_count", 0)  # Rolled back with the games.
+        self._forget_saved(self._unflushed_urls)
+        if self.ledger:
+            self.ledger.mark_failed(self._unflushed_urls, error=str(e))
+        self._unflushed_urls = []
+
+    def _on_games_written(self, urls):
+        """Called by the writer, from one of its threads, once every database has flushed urls."""
+
+        self._record_saved(urls)
+        if self.ledger:
+            self.ledger.mark_done(urls)
+
+    def _on_games_not_written(self, urls, error):
+        self._forget_saved(urls)
+        if self.ledger:
+            self.ledger.mark_failed(urls, error=error)
+
+    def _record_saved(self, urls):
+        """Counts the games at urls as saved, once the database has flushed them."""
+
+        with self._unflushed_counts_lock:
+            counts = [self._unflushed_counts.pop(url) for url in urls if url in self._unflushed_counts]
+        for category_count, clue_count in counts:
+            self.metrics.record_saved(category_count, clue_count)
+
+    def _forget_saved(self, urls):
+        with self._unflushed_counts_lock:
+            for url in urls:
+                self._unflushed_counts.pop(url, None)
+
     def _handle_database_exception(self, e):
         print("Inside handle DB exception: {}".format(e))
 
@@ -143,20 +413,74 @@ class JArchiveScraper:
             sys.exit(0)
 
     def cleanup(self):
-        self.database.cleanup()
+        if self.parse_pool:
+            self.parse_pool.shutdown()
+        try:
+            with self.metrics.save_seconds.time():
+                self.database.cleanup()  # Flushes any buffered games.
+        except DatabaseOperationalError as e:
+            self.metrics.save_failures.inc()
+            self._on_flush_failed(e)
+            raise
+        else:
+            self._on_flushed()
+            self.report_saved()
+        finally:
+            if self.heartbeat:
+                self.heartbeat.stop()
+            self.transport.close()
+            if self.archive:
+                self.archive.close()
+            if self.ledger:
+                self._join_watch_worker()  # It reads game statuses from the ledger on every poll.
+                self.ledger.close()
+
+
+class ArchiveReplayScraper(JArchiveScraper):
+    """
+    Re-runs the parse and save stages over every game page stored in a PageArchive, without touching the network.
+    Season arguments are ignored; the whole archive is replayed. Games are saved with the season of the archived
+    season page that lists them, if any.
+    """
+
+    def init_workers(self):
+        self._start_scraper_workers(ArchiveReplayWorker)
+
+        self.url_worker = ArchiveUrlWorker(self.url_queue, self.archive, game_seasons=self.game_seasons)
+        self.url_worker.daemon = True
+        self.url_worker.name = "URL Worker Thread"
+        self.url_worker.start()
 
 
 class ScraperWorker(threading.Thread):
     """
-    Thread that requests a j-archive webpage, passes a bs4.BeautifulSoup object of the page to the parsing
-    functions, and passes the game data to the database interface for saving.
+    Thread that requests a j-archive webpage, passes the page markup to the parsing functions (in this thread, or
+    in parse_pool if one is given), and passes the game data to the database interface for saving. Pages sent to
+    parse_pool are queued as a ParseJob, without waiting for the parse.
+
+    With a streaming parser backend and no parse_pool, each page is parsed chunk by chunk while it downloads.
     """
-    def __init__(self, url_queue, out_queue): 
+
+    streams_pages = True  # Whether pages come from the network, and so can be parsed as they download.
+    def __init__(self, url_queue, out_queue, archive=None, parse_pool=None, parser_backend=DEFAULT_PARSER_BACKEND, ledger=None,
+            metrics=None, transport=None):
         threading.Thread.__init__(self)
+        self.metrics = metrics or PipelineMetrics()
+        self.transport = transport
+        self.parser_backend = parser_backend
+        self.ledger = ledger
         self.url_queue = url_queue
         self.out_queue = out_queue
+        self.archive = archive
+        self.parse_pool = parse_pool
 
     def run(self):
+        try:
+            self.scrape_queued_urls()
+        finally:
+            self.out_queue.put(WORKER_FINISHED_SENTINEL)  # Lets the main loop count finished workers instead of polling them.
+
+    def scrape_queued_urls(self):
         while True:
             game_url = self.url_queue.get()
             logging.info("Got this URL from queue: {}".format(game_url))
@@ -166,10 +490,14 @@ class ScraperWorker(threading.Thread):
                 self.url_queue.put(URL_SENTINEL)  # For next worker to get
                 return
 
-            categories_and_clues = self.scrape_jarchive_page(game_url)
-            if categories_and_clues:
+            self.metrics.workers_busy.inc()
+            try:
+                game = self.scrape_jarchive_page(game_url)
+            finally:
+                self.metrics.workers_busy.dec()
+            if game:  # A models.Game, or a ParseJob for the main loop to wait on.
                 logging.info("Putting categories and clues into out queue")
-                self.out_queue.put(categories_and_clues)
+                self.out_queue.put((game_url, game, monotonic()))
             else:
                 logging.info("Categories and clues for {} was None".format(game_url))
 
@@ -178,111 +506,486 @@ class ScraperWorker(threading.Thread):
     def scrape_jarchive_page(self, url):
         print('Scraping game at {}'.format(url))
         logging.info('Scraping game at {}'.format(url))
+        streaming = self.streams_pages and not self.parse_pool and \
+                getattr(get_parser_backend(self.parser_backend), "streaming", False)
         try:
-            game_page_soup = get_page_soup(url)
+            if streaming:
+                game, markup_hash = self.stream_game_page(url)
+            else:
+                with self.metrics.fetch_seconds.time():
+                    game_page_markup = self.get_game_page_markup(url)
         except requests.exceptions.RequestException as e:
             logging.exception("Exception scraping JArchive page at {}".format(url))
+            self.metrics.fetch_failures.inc()
+            if self.ledger:
+                self.ledger.mark_failed([url], error=str(e))
+            return None
+        except Exception as e:  # Raised by the streaming parser, which runs as the page downloads.
+            record_parse_failed(self.metrics, self.ledger, url, e)
             return None
+        self.metrics.pages_fetched.inc()
+
+        if not streaming:
+            markup_hash = hash_markup(game_page_markup) if self.ledger else None
+            if self.parse_pool:
+                # Not waited on here, so this thread goes on fetching while the page is parsed.
+                return ParseJob(self.parse_pool.submit(timed_parse_game_markup, game_page_markup, self.parser_backend, url),
+                        markup_hash)
+            try:
+                with self.metrics.parse_seconds.time():
+                    game = parse_game_markup(game_page_markup, self.parser_backend, url)
+            except Exception as e:
+                record_parse_failed(self.metrics, self.ledger, url, e)  # The worker goes on with the next url.
+                return None
+        if not game:
+            self.metrics.games_empty.inc()
+        if self.ledger:
+            record_game_parsed(self.ledger, url, markup_hash, game)
+        return game # models.Game of ALL categories on the page.
+
+    def get_game_page_markup(self, url):
+        return get_page_markup(url, self.archive, self.transport)
+
+    def stream_game_page(self, url):
+        """
+        Requests the game page at url and feeds each chunk to a parser_backends.StreamingGameParser as it arrives.
+        Time spent feeding the parser is observed as parse time, and the rest as fetch time.
+
+        Returns:
+            (models.Game, sha256 hex digest of the markup).
+        """
 
-        categories_and_clues = parse_jarchive_page(game_page_soup)
-        return categories_and_clues # Dict of ALL cat:clues on the page.
+        parser = StreamingGameParser()
+        digest = hashlib.sha256()
+        chunks = [] if self.archive is not None else None  # The whole page is only kept to be archived.
+        parse_seconds = 0.0
+        start = monotonic()
+        for chunk in (self.transport or default_transport()).iter_text(url):
+            digest.update(chunk.encode("utf-8"))
+            if chunks is not None:
+                chunks.append(chunk)
+            parse_start = monotonic()
+            parser.feed(chunk)
+            parse_seconds += monotonic() - parse_start
+        parse_start = monotonic()
+        parser.close()
+        game = parser.game(url)
+        parse_seconds += monotonic() - parse_start
+
+        self.metrics.fetch_seconds.observe(monotonic() - start - parse_seconds)
+        self.metrics.parse_seconds.observe(parse_seconds)
+        if chunks is not None:
+            self.archive.put(url, "".join(chunks))
+        return game, digest.hexdigest()
 
     def on_page_request_error(self):
         return
 
 
+class ParseJob:
+    """
+    Game page handed to a parse process pool. Queued by a ScraperWorker in place of its models.Game.
+
+    Attributes:
+        future (concurrent.futures.Future): Resolves to (models.Game or None, seconds the parse took).
+
+        markup_hash (str): hash_markup of the page, if a ledger records it.
+    """
+
+    __slots__ = ("future", "markup_hash")
+
+    def __init__(self, future, markup_hash=None):
+        self.future = future
+        self.markup_hash = markup_hash
+
+
+def timed_parse_game_markup(markup, parser_backend, url):
+    """Runs parse_game_markup in a parse pool process. Returns (game, seconds the parse took there)."""
+
+    start = monotonic()
+    game = parse_game_markup(markup, parser_backend, url)
+    return game, monotonic() - start
+
+
+def hash_markup(markup):
+    """Returns the sha256 hex digest ledgers record for page markup."""
+
+    return hashlib.sha256(markup.encode("utf-8")).hexdigest()
+
+
+def record_parse_failed(metrics, ledger, url, e):
+    """Counts a game page whose parse raised e, and records it as failed in ledger, if any."""
+
+    logging.exception("Exception parsing JArchive page at {}".format(url))
+    metrics.parse_failures.inc()
+    if ledger:
+        ledger.mark_failed([url], error=str(e))
+
+
+def record_game_parsed(ledger, url, markup_hash, game):
+    """Records a parsed game page in ledger, with the hash_markup of its markup."""
+
+    if game:
+        ledger.mark_fetched(url, markup_hash)
+    else:
+        ledger.mark_empty(url)
+
+
+class ArchiveReplayWorker(ScraperWorker):
+    """ScraperWorker that reads game pages from its PageArchive instead of requesting them."""
+
+    streams_pages = False
+
+    def get_game_page_markup(self, url):
+        return self.archive.get(url)
+
+
+class ArchiveUrlWorker(threading.Thread):
+    """Populates url_queue with every game url stored in a PageArchive, and game_seasons with the season of each
+    game listed on an archived season page."""
+
+    def __init__(self, url_queue, archive, game_seasons=None):
+        threading.Thread.__init__(self)
+        self.url_queue = url_queue
+        self.archive = archive
+        self.game_seasons = game_seasons if game_seasons is not None else {}
+
+    def run(self):
+        self.game_seasons.update(archived_game_seasons(self.archive))  # Before any game is queued, and so saved.
+        for url in self.archive.game_urls():
+            self.url_queue.put(url)
+        logging.info("Archived URLs are exhausted. Putting sentinel into URL queue")
+        self.url_queue.put(URL_SENTINEL)
+
+
 class UrlWorker(threading.Thread):  # Responsible for populating game urls for the workers to process.
     """
     Responsible for providing scraper workers with j-archive game URLs to scrape data from.
 
+    Season pages are requested concurrently by a pool of <discovery_threads> threads, and each season's game URLs
+    are queued as soon as its page resolves, so scraper workers never wait on a season boundary.
+
     Attributes:
         
         url_queue(queue.Queue): Populated with game URLs. Scraper workers pop a URL to collect data from.
 
-        urls_exhausted(boolean): Set to True when unable to populate url_queue with more game URLs. This may be because
-            of an error requesting the season page soup, an error parsing the game URLs from the season page soup, or
-            when there are not more remaining games on j-archive.
+        urls_exhausted(boolean): Set to True once every season has been processed and the URL sentinel has been queued.
+
+        completed_urls(set): Game URLs the crawl ledger records as complete. These are never queued.
+
+        season_index(season_index.SeasonIndex): If given, game URLs of closed seasons are read from and saved to this cache.
+
+        current_season(int): Number of the current j-archive season, or None if it has not been requested.
+
+        game_seasons(dict): Season number of every queued game URL is recorded here.
+
+        transport(transport.HttpTransport): Transport season pages are requested through, or None for the shared default.
     """
 
-    def __init__(self, url_queue):
+    def __init__(self, url_queue, base_url=JARCHIVE_BASE_URL, archive=None, ledger=None, season_index=None,
+            discovery_threads=SEASON_DISCOVERY_THREADS, game_seasons=None, transport=None):
         threading.Thread.__init__(self)
+        self.transport = transport
+        self.game_seasons = game_seasons if game_seasons is not None else {}
         self.url_queue = url_queue
+        self.archive = archive
+        self.ledger = ledger
+        self.season_index = season_index
+        self.discovery_threads = discovery_threads
+        self.completed_urls = set()
         self.urls_exhausted = False
+        self.current_season = None
 
         self.starting_season = None
         self.get_single_season = False
-        self.base_url = "http://j-archive.com"
+        self.base_url = base_url
 
     def start(self, starting_season, get_single_season):
-        self.starting_season = starting_season or self.get_current_season_number()
+        self.starting_season = starting_season
         self.get_single_season = get_single_season
+        super().start()  # The current season is requested on this thread, so scraper startup never blocks on it.
+
+    def run(self):
+        try:
+            self.discover_game_urls()
+        finally:
+            self.finished()  # Scraper workers wait on the sentinel, so it is queued even if discovery fails.
+
+    def discover_game_urls(self):
+        if self.ledger:
+            self.completed_urls = self.ledger.completed_urls()
+        if self.starting_season is None or self.season_index:
+            self.current_season = self.get_current_season_number()
+        self.starting_season = self.starting_season or self.current_season
 
         if self.starting_season is None:
             logging.warning("Unable to retrieve starting season game URLs. Exiting!")
-            self.finished()
 
-        else:
-            super().start()
-    
-
-    def run(self):
-        if self.get_single_season:
+        elif self.get_single_season:
             self.populate_url_queue(self.starting_season)
-            self.finished()
 
         else:
-            curr_season = self.starting_season
-            while (curr_season > 0) and not self.urls_exhausted:
-                logging.info("Getting URLs for season {}".format(curr_season))
-                self.populate_url_queue(curr_season)
-                curr_season -= 1
-            self.finished()
+            seasons = range(self.starting_season, 0, -1)
+            with ThreadPoolExecutor(max_workers=self.discovery_threads, thread_name_prefix="Season Worker") as pool:
+                season_futures = {pool.submit(self.get_season_game_urls, season): season for season in seasons}
+                for future in as_completed(season_futures):
+                    self.queue_game_urls(season_futures[future], future.result())
 
     def get_current_season_number(self):
+        """Returns the current season number, from the season index if it has a recent one."""
+
+        if self.season_index:
+            cached_season = self.season_index.get_current_season()
+            if cached_season is not None:
+                return cached_season
+
         try:
-            page_soup = get_page_soup(self.base_url)
+            page_soup = get_page_soup(self.base_url, self.archive, self.transport)
         except requests.exceptions.RequestException as e:
             logging.exception("Exception getting current season number")
             return None
 
-        try:
-            current_season_href = page_soup.find("table", class_="fullpageheight").find("a")["href"]
-            season_number = re.search(r'''showseason.php\?season=(\d{1,2})''', current_season_href).group(1)
-        except (AttributeError, KeyError) as e:
+        season_number = parse_current_season_number(page_soup)
+        if season_number is None:
             logging.info("Unable to parse current season page.")
-            return None
-
-        return int(season_number)
+        elif self.season_index:
+            self.season_index.put_current_season(season_number)
+        return season_number
     
     def get_season_game_urls(self, season):
+        """Returns the game urls of season, from the season index if it is cached there.
+
+        Seasons older than the current season are closed, and are added to the season index once requested.
+        """
+
+        if self.season_index:
+            cached_urls = self.season_index.get(season)
+            if cached_urls is not None:
+                return cached_urls
+
+        logging.info("Getting URLs for season {}".format(season))
         season_url = "{}/showseason.php?season={}".format(self.base_url, season)
         try:
-            season_page_soup = get_page_soup(season_url)
+            season_page_soup = get_page_soup(season_url, self.archive, self.transport)
         except requests.exceptions.RequestException as e:
             logging.exception("Exception getting season {} page soup".format(season))
             return None
-        
-        game_hrefs = [td.find("a") for td in season_page_soup.find_all("td", {"align":"left", "valign":"top", "style":"width:140px"})]
-        game_urls = [a["href"] for a in game_hrefs]
 
+        game_urls = parse_season_game_urls(season_page_soup)
+        if self.season_index and game_urls and self.current_season and season < self.current_season:
+            self.season_index.put(season, game_urls)
         return game_urls
     
     def populate_url_queue(self, season):
-        """Populate url queue with game urls for workers to process.
-        
-        Sets "finished" flag to True if no more game urls are found.
-        """
-        game_urls = self.get_season_game_urls(season)  # TODO: class method
+        """Populate url queue with game urls for workers to process."""
+
+        self.queue_game_urls(season, self.get_season_game_urls(season))
+
+    def queue_game_urls(self, season, game_urls):
         if not game_urls:
-            logging.warning("Unable to get game urls for season {}. URLs exhausted, exiting.".format(season))
-            self.finished()
+            logging.warning("Unable to get game urls for season {}.".format(season))
             return
 
         for url in game_urls:
+            if url in self.completed_urls:
+                continue  # Already stored by an earlier crawl.
+            self.game_seasons[url] = season
             self.url_queue.put(url)
 
     def finished(self):
-        self.urls_exhaused = True
+        self.urls_exhausted = True
         logging.info("URLs are exhausted. Putting sentinel into URL queue")
         self.url_queue.put(URL_SENTINEL)
 
+
+class LeasedUrlWorker(UrlWorker):
+    """
+    Populates url_queue with game URLs leased from a work store shared with other scraper processes.
+
+    The seasons to crawl are added to the store as work units; adding a season some other process already added does
+    nothing. Leased season units are resolved to their game URLs, which are added to the store as game units, and leased
+    game units are queued. Once nothing is left to lease, the worker waits for units leased by other processes to finish,
+    or to expire and be leased here, and exits when every unit is finished. Units leased by this process are finished by
+    the scraper as the database flushes them.
+
+    Every process sharing a store should be started with the same season arguments.
+
+    Attributes:
+
+        work_store(coordination.WorkStore): Store the crawl's work units are leased from.
+
+        owner(str): Id the units are leased under.
+
+        lease_batch(int): Units leased at a time.
+
+        max_queued(int): No more units are leased while this many game urls wait in url_queue, so a process only
+            holds the leases it is about to work on, and the rest stay available to other processes.
+    """
+
+    def __init__(self, url_queue, work_store, owner, lease_batch=DEFAULT_LEASE_BATCH, poll_interval=LEASE_POLL_INTERVAL,
+            max_queued=DEFAULT_MAX_QUEUED_LEASES, **kwargs):
+        super().__init__(url_queue, **kwargs)
+        self.work_store = work_store
+        self.owner = owner
+        self.lease_batch = lease_batch
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+
+    def discover_game_urls(self):
+        if self.starting_season is None or self.season_index:
+            self.current_season = self.get_current_season_number()
+        self.starting_season = self.starting_season or self.current_season
+
+        if self.starting_season is None:
+            logging.warning("Unable to retrieve starting season game URLs. Exiting!")
+            return
+        seasons = [self.starting_season] if self.get_single_season else range(self.starting_season, 0, -1)
+        self.work_store.add_seasons(seasons)
+
+        with ThreadPoolExecutor(max_workers=self.discovery_threads, thread_name_prefix="Season Worker") as pool:
+            while True:
+                if self.url_queue.qsize() >= self.max_queued:
+                    sleep(QUEUED_LEASE_POLL_INTERVAL)
+                    continue
+                units = self.work_store.lease(self.owner, self.lease_batch)
+                if not units:
+                    if not self.work_store.remaining(exclude_owner=self.owner):
+                        return
+                    sleep(self.poll_interval)
+                    continue
+
+                season_units = [unit for unit in units if unit.kind == UNIT_KIND_SEASON]
+                for season, game_urls in zip((unit.season for unit in season_units),
+                        pool.map(self.get_season_game_urls, [unit.season for unit in season_units])):
+                    self.add_season_games(season, game_urls)
+                for unit in units:
+                    if unit.kind != UNIT_KIND_SEASON:
+                        self.game_seasons[unit.key] = unit.season
+                        self.url_queue.put(unit.key)
+
+    def add_season_games(self, season, game_urls):
+        if not game_urls:
+            logging.warning("Unable to get game urls for season {}.".format(season))
+            self.work_store.mark_failed([season_unit_key(season)], error="No game urls")
+            return
+        self.work_store.add_season_games(season, game_urls)
+
+
+class WatchUrlWorker(UrlWorker):
+    """
+    Watches the current season page, and queues each game that appears on it until stopped.
+
+    The page is requested with the validators of its last response, so while no game has aired it is answered with an
+    empty 304 Not Modified. When it did change, its game list is diffed against the games already stored, and only new
+    ones are queued. Polls start every min_interval seconds; each poll that finds nothing doubles the interval, up to
+    max_interval, and finding a game resets it.
+
+    The current season number is checked again every season_check_interval seconds. When a new season starts, the old
+    season's page is polled once more for games added since the last poll, and the new one is watched from then on.
+
+    Attributes:
+
+        stored_urls(set): Game URLs already in the database, besides those the ledger records as complete.
+
+        pending(dict): Game URL -> (season, times queued), for queued games the ledger does not record as complete
+            yet. Failed games are queued again with their season on later polls, up to max_game_attempts times.
+
+        interval(float): Seconds until the next poll.
+
+        polls(int): Polls made so far. The worker exits after max_polls polls, if given.
+    """
+
+    def __init__(self, url_queue, ledger, min_interval=WATCH_MIN_INTERVAL, max_interval=WATCH_MAX_INTERVAL,
+            season_check_interval=CURRENT_SEASON_MAX_AGE, max_game_attempts=WATCH_MAX_GAME_ATTEMPTS, stored_urls=None,
+            max_polls=None, metrics=None, **kwargs):
+        super().__init__(url_queue, ledger=ledger, **kwargs)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.season_check_interval = season_check_interval
+        self.max_game_attempts = max_game_attempts
+        self.stored_urls = set(stored_urls or ())
+        self.max_polls = max_polls
+        self.metrics = metrics or PipelineMetrics()
+        self.pending = {}
+        self.interval = min_interval
+        self.polls = 0
+        self._validators = None
+        self._season_checked_at = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Makes the worker exit after the poll in progress, if any."""
+
+        self._stop_event.set()
+
+    def discover_game_urls(self):
+        watch_current_season = self.starting_season is None
+        season = self.starting_season or self._check_current_season()
+        if season is None:
+            logging.warning("Unable to retrieve the current season. Exiting!")
+            return
+        print("Watching season {} for new games".format(season))
+
+        while not self._stop_event.is_set():
+            if watch_current_season and monotonic() - self._season_checked_at >= self.season_check_interval:
+                current_season = self._check_current_season()
+                if current_season is not None and current_season > season:
+                    self.poll(season)  # Games added to the old season since the last poll.
+                    season, self._validators = current_season, None
+                    print("Season {} started. Watching it for new games".format(season))
+            found = self.poll(season)
+            if self.max_polls is not None and self.polls >= self.max_polls:
+                return
+            self.interval = self.min_interval if found else min(self.interval * WATCH_BACKOFF_FACTOR, self.max_interval)
+            self._stop_event.wait(self.interval)
+
+    def _check_current_season(self):
+        self._season_checked_at = monotonic()
+        self.current_season = self.get_current_season_number()
+        return self.current_season
+
+    def poll(self, season):
+        """Requests season's page if it changed, and queues its new games, and failed games to retry. Returns the
+        number of new games found."""
+
+        self.metrics.watch_polls.inc()
+        self.polls += 1
+        self.completed_urls = self.ledger.completed_urls()
+        self.requeue_failed_games()
+
+        season_url = "{}/showseason.php?season={}".format(self.base_url, season)
+        try:
+            markup, self._validators = (self.transport or default_transport()).get_if_changed(season_url, self._validators)
+        except requests.exceptions.RequestException:
+            logging.exception("Exception polling season {} page".format(season))
+            return 0
+        if markup is None:
+            logging.info("Season {} page is unchanged".format(season))
+            return 0
+        if self.archive is not None:
+            self.archive.put(season_url, markup)
+
+        game_urls = parse_season_game_urls(make_page_soup(markup))
+        new_urls = [url for url in game_urls
+                if url not in self.completed_urls and url not in self.stored_urls and url not in self.pending]
+        if new_urls:
+            print("Found {} new games in season {}".format(len(new_urls), season))
+            self.metrics.watch_games_found.inc(len(new_urls))
+            self.queue_game_urls(season, new_urls)
+            for url in new_urls:
+                self.pending[url] = (season, 1)
+        return len(new_urls)
+
+    def requeue_failed_games(self):
+        for url, (season, attempts) in list(self.pending.items()):
+            status = self.ledger.status(url)
+            if status in COMPLETE_STATUSES:
+                del self.pending[url]
+            elif status == LEDGER_STATUS_FAILED:
+                if attempts >= self.max_game_attempts:
+                    logging.warning("Giving up on {} after {} attempts".format(url, attempts))
+                    del self.pending[url]
+                    continue
+                self.pending[url] = (season, attempts + 1)
+                self.game_seasons[url] = season  # Taken from game_seasons when the failed attempt was saved or parsed.
+                self.url_queue.put(url)
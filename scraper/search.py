@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""This module contains the full-text index over an SQLite clue database, and the search command built on it.
+
+The index is an FTS5 table over clue question, clue answer and category title. It is contentless: it stores only the
+inverted index, keyed by clue id, and search results are joined back to the clues and categories tables. It can be
+kept in sync as games are saved, by a trigger on clues, or rebuilt in bulk after a crawl, which is faster.
+
+    $ python3 -m scraper.search --db jtrivia.db "river delta"
+    $ python3 -m scraper.search --db jtrivia.db --rebuild
+"""
+import argparse
+import re
+import sqlite3
+
+FTS_TABLE = "clues_fts"
+FTS_TRIGGER = "clues_fts_insert"
+FTS_MODES = ("sync", "rebuild")
+DEFAULT_SEARCH_LIMIT = 20
+BM25_WEIGHTS = (1.0, 2.0, 0.5)  # question, answer, category. Answer matches are usually what a lookup is after.
+
+CREATE_FTS_SQL = """CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(question, answer, category,
+            content='', tokenize='porter unicode61 remove_diacritics 2')""".format(table=FTS_TABLE)
+CREATE_FTS_TRIGGER_SQL = """CREATE TRIGGER IF NOT EXISTS {trigger} AFTER INSERT ON clues BEGIN
+            INSERT INTO {table}(rowid, question, answer, category)
+                VALUES (new.id, new.question, new.answer, (SELECT title FROM categories WHERE id = new.category_id));
+        END""".format(trigger=FTS_TRIGGER, table=FTS_TABLE)
+REBUILD_FTS_SQL = """INSERT INTO {table}(rowid, question, answer, category)
+            SELECT clues.id, clues.question, clues.answer, categories.title
+            FROM clues JOIN categories ON clues.category_id = categories.id""".format(table=FTS_TABLE)
+SET_RANK_SQL = """INSERT INTO {table}({table}, rank) VALUES ('rank', 'bm25({weights})')""".format(
+        table=FTS_TABLE, weights=", ".join(str(w) for w in BM25_WEIGHTS))
+# Matches are ranked and limited inside FTS5 before the join, so only <limit> rows are looked up in clues and categories.
+SEARCH_SQL = """SELECT clues.id, categories.title, clues.question, clues.answer, matches.rank
+            FROM (SELECT rowid, rank FROM {table} WHERE {table} MATCH ? ORDER BY rank LIMIT ?) AS matches
+            JOIN clues ON clues.id = matches.rowid
+            JOIN categories ON categories.id = clues.category_id
+            ORDER BY matches.rank""".format(table=FTS_TABLE)
+
+QUERY_TOKEN_REGEX = re.compile(r'''\w+''', re.UNICODE)
+
+
+def sqlite_file_path(connection_param):
+    """Returns the file path of an SQLite connection parameter, without any sqlite:/// prefix."""
+
+    from .database import SQLITE_URI_PREFIX  # Imported here; database imports this module.
+    if connection_param.startswith(SQLITE_URI_PREFIX):
+        return connection_param[len(SQLITE_URI_PREFIX):]
+    return connection_param
+
+
+def create_fts_index(conn, sync=True):
+    """Creates the index table if needed. With sync, a trigger indexes every clue as it is inserted, and clues saved
+    before the index existed are indexed now; without, the trigger is dropped and the index only changes when rebuilt."""
+
+    created = not has_fts_index(conn)
+    conn.execute(CREATE_FTS_SQL)
+    if created:
+        conn.execute(SET_RANK_SQL)
+    if sync:
+        if created:
+            conn.execute(REBUILD_FTS_SQL)
+        conn.execute(CREATE_FTS_TRIGGER_SQL)
+    else:
+        conn.execute("""DROP TRIGGER IF EXISTS {}""".format(FTS_TRIGGER))
+
+
+def rebuild_fts_index(conn):
+    """Re-indexes every clue in one pass, then merges the index's b-trees. Does not commit."""
+
+    if not has_fts_index(conn):
+        conn.execute(CREATE_FTS_SQL)
+        conn.execute(SET_RANK_SQL)
+    conn.execute("""INSERT INTO {table}({table}) VALUES ('delete-all')""".format(table=FTS_TABLE))
+    conn.execute(REBUILD_FTS_SQL)
+    conn.execute("""INSERT INTO {table}({table}) VALUES ('optimize')""".format(table=FTS_TABLE))
+
+
+def has_fts_index(conn):
+    return conn.execute("""SELECT 1 FROM sqlite_master WHERE name = ?""", (FTS_TABLE,)).fetchone() is not None
+
+
+def make_match_query(text):
+    """Turns free text into an FTS5 query matching clues that contain every word, so punctuation never reaches the
+    FTS5 query parser. The last word also matches as a prefix."""
+
+    tokens = QUERY_TOKEN_REGEX.findall(text)
+    if not tokens:
+        return None
+    terms = ['"{}"'.format(token) for token in tokens]
+    terms[-1] += "*"
+    return " AND ".join(terms)
+
+
+def search_clues(conn, text, limit=DEFAULT_SEARCH_LIMIT, raw=False):
+    """
+    Returns up to limit clues matching text, best match first, as dicts with id, category, question, answer and score
+    keys. Lower scores are better.
+
+    Args:
+        raw (bool): Pass text to FTS5 as a query expression (phrases, NEAR, OR, column filters) instead of plain words.
+
+    Raises:
+        sqlite3.OperationalError if the database has no index, or a raw query is malformed.
+    """
+
+    query = text if raw else make_match_query(text)
+    if not query:
+        return []
+    rows = conn.execute(SEARCH_SQL, (query, limit)).fetchall()
+    return [{"id": row[0], "category": row[1], "question": row[2], "answer": row[3], "score": row[4]} for row in rows]
+
+
+class ClueSearch:
+    """
+    Read-only search API over an SQLite clue database.
+
+    Args:
+        db_path (str): File path, optionally prefixed with sqlite:///.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = sqlite_file_path(db_path)
+        self.conn = sqlite3.connect("file:{}?mode=ro".format(self.db_path), uri=True, check_same_thread=False)
+
+    def search(self, text, limit=DEFAULT_SEARCH_LIMIT, raw=False):
+        return search_clues(self.conn, text, limit, raw)
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the clues of an SQLite database built by run.py.")
+    parser.add_argument("query", nargs="?", help="Words to search for.")
+    parser.add_argument("--db", type=str, default="sqlite:///jtrivia.db")
+    parser.add_argument("--limit", type=int, default=DEFAULT_SEARCH_LIMIT)
+    parser.add_argument("--raw", action="store_true", help="Treat the query as an FTS5 query expression.")
+    parser.add_argument("--rebuild", action="store_true", help="Build or rebuild the full-text index, then exit.")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        db_path = sqlite_file_path(args.db)
+        conn = sqlite3.connect(db_path)
+        rebuild_fts_index(conn)
+        conn.commit()
+        conn.close()
+        print("Rebuilt full-text index of {}".format(db_path))
+        return
+    if not args.query:
+        parser.error("a query is required unless --rebuild is given")
+
+    clue_search = ClueSearch(args.db)
+    try:
+        if not has_fts_index(clue_search.conn):
+            parser.error("{} has no full-text index. Crawl with --fts, or run with --rebuild.".format(clue_search.db_path))
+        try:
+            results = clue_search.search(args.query, args.limit, args.raw)
+        except sqlite3.OperationalError as e:
+            parser.error("invalid query: {}".format(e))
+    finally:
+        clue_search.close()
+
+    for result in results:
+        print("[{}] {}\n    {}\n    -> {}".format(result["category"], result["id"], result["question"], result["answer"]))
+    print("{} result(s)".format(len(results)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""This module contains the season index, a cache of the game urls listed on each closed j-archive season page.
+
+Only seasons older than the current season are cached. Their game lists no longer change, so later crawls can skip
+requesting their season pages entirely. The current season is always requested again.
+
+The current season number, read from the j-archive home page, is cached too, for CURRENT_SEASON_MAX_AGE seconds. A
+new season starts about once a year, so crawls started within a day of each other skip the home page request.
+"""
+import json
+import os
+import threading
+import time
+
+CURRENT_SEASON_MAX_AGE = 24 * 60 * 60
+
+
+class SeasonIndex:
+    """
+    JSON file mapping season number -> list of game urls. Safe to share between threads.
+
+    Args:
+        path (str): Index file path. Created on the first put.
+
+        current_season_max_age (float): Seconds a cached current season number is trusted for.
+    """
+
+    def __init__(self, path, current_season_max_age=CURRENT_SEASON_MAX_AGE, clock=time.time):
+        self.path = path
+        self.current_season_max_age = current_season_max_age
+        self.clock = clock
+        self.seasons = {}
+        self.current_season = None  # {"season": number, "checked_at": clock time}
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self.seasons = {int(season): urls for season, urls in index.get("seasons", {}).items()}
+            self.current_season = index.get("current_season")
+
+    def get(self, season):
+        """Returns the cached game urls of season, or None if the season is not cached."""
+
+        with self._lock:
+            return self.seasons.get(season)
+
+    def put(self, season, game_urls):
+        """Caches the game urls of a closed season, and rewrites the index file."""
+
+        with self._lock:
+            self.seasons[season] = list(game_urls)
+            self._write()
+
+    def get_current_season(self):
+        """Returns the cached current season number, or None if it is not cached or older than current_season_max_age."""
+
+        with self._lock:
+            if self.current_season is None or self.clock() - self.current_season["checked_at"] > self.current_season_max_age:
+                return None
+            return self.current_season["season"]
+
+    def put_current_season(self, season):
+        """Caches the current season number, and rewrites the index file."""
+
+        with self._lock:
+            self.current_season = {"season": season, "checked_at": self.clock()}
+            self._write()
+
+    def _write(self):
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seasons": self.seasons, "current_season": self.current_season}, f)
+        os.replace(tmp_path, self.path)  # Readers never see a half written index.
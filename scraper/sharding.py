@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""This module contains sharded ingest, which rebuilds an SQLite database from a page archive in several processes.
+
+SQLite allows one writer per file, so a single database holds a full archive replay to one core however many parse. A
+sharded ingest splits the archived game pages into shards, and a pool of processes parses each shard and saves it to
+an SQLite file of its own. Games are sharded by season, read from the archived season pages, or by a hash of their url.
+
+Once every shard is written, the shards are merged into the target one at a time: each is attached, and its games,
+category titles and clues are copied with one INSERT ... SELECT per table. Clues reference categories by id, and each
+shard numbers its titles on its own, so clue category ids are remapped by joining on the title. Clues already in the
+target are skipped on their content hash, as when saving. The target's secondary indexes are dropped before the merge
+and built once after it, and a full-text index is rebuilt at the end.
+
+    $ python3 run.py --from-archive archive/ --db jtrivia.db --shard-processes 8
+"""
+import contextlib
+import io
+import os
+import re
+import shutil
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from .archive import PageArchive
+from .database import SqliteDatabase
+from .database_status_codes import DATABASE_STATUS_CODES
+from .exceptions import DatabaseOperationalError
+from .parser import make_page_soup, parse_season_game_urls
+from .parser_backends import DEFAULT_PARSER_BACKEND, parse_game_markup
+from .search import FTS_MODES, FTS_TRIGGER, create_fts_index, has_fts_index, rebuild_fts_index, sqlite_file_path
+
+SHARD_BY = ("hash", "season")
+SHARD_GAMES_PER_FLUSH = 500
+UNLISTED_SEASON_SHARD = "unlisted"  # Season shard of games no archived season page lists.
+SEASON_URL_REGEX = re.compile(r'''season=(\d+)''')
+
+
+def archived_game_seasons(archive):
+    """Returns {game url: season} for every game listed on a season page in archive."""
+
+    game_seasons = {}
+    for url in archive.season_urls():
+        season_match = SEASON_URL_REGEX.search(url)
+        if not season_match:
+            continue
+        for game_url in parse_season_game_urls(make_page_soup(archive.get(url))):
+            game_seasons[game_url] = int(season_match.group(1))
+    return game_seasons
+
+
+def assign_shards(game_urls, shard_by="hash", shard_count=None, game_seasons=None):
+    """
+    Splits game_urls into shards.
+
+    Args:
+        shard_by (str): "hash" puts each url in one of shard_count shards by the crc32 of the url. "season" makes a
+            shard of each season in game_seasons, and one of the games it does not list.
+
+    Returns:
+        dict of {shard name: [game url]}. Empty shards are left out.
+    """
+
+    if shard_by not in SHARD_BY:
+        raise ValueError("Invalid shard key: {}".format(shard_by))
+    shards = {}
+    for url in game_urls:
+        if shard_by == "hash":
+            name = "hash-{}".format(zlib.crc32(url.encode("utf-8")) % shard_count)
+        else:
+            season = (game_seasons or {}).get(url)
+            name = UNLISTED_SEASON_SHARD if season is None else "season-{}".format(season)
+        shards.setdefault(name, []).append(url)
+    return shards
+
+
+def ingest_shard(archive_dir, game_urls, shard_path, parser_backend=DEFAULT_PARSER_BACKEND, game_seasons=None):
+    """
+    Parses the archived pages of game_urls and saves the games to a new SQLite file at shard_path. Run in a worker
+    process; only the archive directory and urls are sent to it, and only the counts back.
+
+    Returns:
+        (games saved, empty pages, seconds taken).
+    """
+
+    start = time.monotonic()
+    archive = PageArchive(archive_dir)
+    database = SqliteDatabase(shard_path, games_per_flush=SHARD_GAMES_PER_FLUSH, secondary_indexes=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_connection()
+    if database.get_connection_status() != DATABASE_STATUS_CODES["success"]:
+        raise DatabaseOperationalError("Could not create {}".format(shard_path))
+    saved = empty = 0
+    try:
+        for url in game_urls:
+            markup = archive.get(url)
+            game = parse_game_markup(markup, parser_backend, url) if markup is not None else None
+            if not game:
+                empty += 1
+                continue
+            game.season = (game_seasons or {}).get(url)
+            database.save(game)
+            saved += 1
+    finally:
+        database.cleanup()
+        archive.close()
+    return saved, empty, time.monotonic() - start
+
+
+def merge_shards(target_path, shard_paths, fts=None):
+    """
+    Merges the SQLite files at shard_paths into the SQLite file at target_path, which is created if it does not exist.
+
+    Args:
+        fts (str): "sync" or "rebuild" to build a full-text index of the target. An existing index is rebuilt either way.
+
+    Returns:
+        dict of {table: (rows in the shards, rows added to the target)} for the games, categories and clues tables.
+    """
+
+    if fts not in (None,) + FTS_MODES:
+        raise ValueError("Invalid full-text index mode: {}".format(fts))
+    database = SqliteDatabase(target_path, secondary_indexes=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.init_connection()
+    if database.get_connection_status() != DATABASE_STATUS_CODES["success"]:
+        raise DatabaseOperationalError("Could not open {}".format(target_path))
+
+    conn = database.conn
+    tables = ("games", "categories", "clues")
+    before = {table: _count(conn, "main", table) for table in tables}
+    shard_rows = dict.fromkeys(tables, 0)
+    fts_sync = fts == "sync" or conn.execute("""SELECT 1 FROM sqlite_master WHERE name = ?""", (FTS_TRIGGER,)).fetchone()
+    conn.execute("""DROP TRIGGER IF EXISTS {}""".format(FTS_TRIGGER))  # Indexed in one pass after the merge instead.
+    try:
+        for shard_path in shard_paths:
+            conn.execute("""ATTACH DATABASE ? AS shard""", (shard_path,))
+            try:
+                for table in tables:
+                    shard_rows[table] += _count(conn, "shard", table)
+                conn.execute("""INSERT OR REPLACE INTO games(id, season, url) SELECT id, season, url FROM shard.games""")
+                conn.execute("""INSERT OR IGNORE INTO categories(title) SELECT title FROM shard.categories ORDER BY id""")
+                conn.execute("""INSERT OR IGNORE INTO clues(question, answer, category_id, game_id, round, value, daily_double, content_hash)
+                            SELECT shard_clues.question, shard_clues.answer, categories.id, shard_clues.game_id, shard_clues.round,
+                                shard_clues.value, shard_clues.daily_double, shard_clues.content_hash
+                            FROM shard.clues AS shard_clues
+                            JOIN shard.categories AS shard_categories ON shard_categories.id = shard_clues.category_id
+                            JOIN categories ON categories.title = shard_categories.title
+                            ORDER BY shard_clues.id""")
+                conn.commit()
+            finally:
+                conn.execute("""DETACH DATABASE shard""")
+        database.build_indexes()
+        if fts or has_fts_index(conn):
+            rebuild_fts_index(conn)
+        if fts_sync:
+            create_fts_index(conn, sync=True)
+        conn.commit()
+        after = {table: _count(conn, "main", table) for table in tables}
+    finally:
+        database.cleanup()
+    return {table: (shard_rows[table], after[table] - before[table]) for table in tables}
+
+
+def _count(conn, schema, table):
+    return conn.execute("""SELECT COUNT(*) FROM {}.{}""".format(schema, table)).fetchone()[0]
+
+
+def sharded_ingest(archive_dir, target, processes, shard_by="hash", shard_count=None, parser_backend=DEFAULT_PARSER_BACKEND,
+        shard_dir=None, fts=None, keep_shards=False):
+    """
+    Rebuilds the SQLite database target from every game page in the page archive at archive_dir, in a pool of
+    processes, and merges the shards into it.
+
+    Args:
+        processes (int): Worker processes. Each writes one shard file at a time.
+
+        shard_by (str): "hash" or "season"; see assign_shards.
+
+        shard_count (int): Number of hash shards. Defaults to processes.
+
+        shard_dir (str): Directory for shard files, which must not exist yet. Defaults to <target>.shards. Removed
+            after the merge unless keep_shards.
+
+    Returns:
+        dict of {"shards": {shard name: (games saved, empty pages, seconds)}, "merged": merge_shards counts,
+        "merge_seconds": seconds the merge took}.
+    """
+
+    target_path = sqlite_file_path(target)
+    shard_dir = shard_dir or target_path + ".shards"
+    if os.path.exists(shard_dir):
+        raise DatabaseOperationalError("{} already exists. Remove the shards of an earlier ingest first.".format(shard_dir))
+
+    archive = PageArchive(archive_dir)
+    try:
+        game_urls = archive.game_urls()
+        game_seasons = archived_game_seasons(archive)
+    finally:
+        archive.close()
+    shards = assign_shards(game_urls, shard_by, shard_count or processes, game_seasons)
+
+    os.makedirs(shard_dir)
+    shard_paths = {name: os.path.join(shard_dir, "{}.db".format(name)) for name in shards}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # Largest shards first, so a big one is not left running alone at the end.
+        futures = {name: pool.submit(ingest_shard, archive_dir, urls, shard_paths[name], parser_backend,
+                {url: game_seasons[url] for url in urls if url in game_seasons})
+                for name, urls in sorted(shards.items(), key=lambda item: -len(item[1]))}
+        shard_results = {name: future.result() for name, future in futures.items()}
+
+    start = time.monotonic()
+    merged = merge_shards(target_path, [shard_paths[name] for name in sorted(shard_paths)], fts=fts)
+    merge_seconds = time.monotonic() - start
+    if not keep_shards:
+        shutil.rmtree(shard_dir)
+    return {"shards": shard_results, "merged": merged, "merge_seconds": merge_seconds}
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""This module contains the HTTP transport every threaded page request goes through.
+
+Each thread gets its own requests.Session, so connections to j-archive are kept alive and reused by the thread that
+opened them instead of being set up for every page. Compressed responses are negotiated, every request has connect and
+read timeouts, and connection errors, timeouts and 429/5xx responses are retried with bounded exponential backoff. A
+Retry-After header on the response is honored, up to max_retry_after. Requests, connections opened and reused, retries
+and requests given up on are counted in the scraper's metrics. get_if_changed() makes conditional requests, which an
+unchanged page answers with an empty 304 Not Modified.
+"""
+import codecs
+import email.utils
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import PipelineMetrics
+
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds.
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5  # Seconds before the first retry; doubled for each later one.
+DEFAULT_BACKOFF_MAX = 30
+DEFAULT_MAX_RETRY_AFTER = 120  # Longest Retry-After, in seconds, that is waited out.
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+ACCEPT_ENCODING = "gzip, deflate"
+STREAM_CHUNK_SIZE = 16384  # Bytes read at a time by iter_text.
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def parse_retry_after(value, now=None):
+    """Returns the seconds a Retry-After header value (delay seconds or an HTTP date) asks to wait, or None."""
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - (now or datetime.now(timezone.utc))).total_seconds(), 0.0)
+
+
+class HttpTransport:
+    """
+    Fetches pages over per-thread pooled sessions, retrying transient failures.
+
+    Args:
+        timeout (tuple): (connect, read) timeout in seconds, applied to every request.
+
+        max_retries (int): Retries after the first attempt before a request is given up on.
+
+        backoff_base (float): Seconds before the first retry. Each later retry waits twice as long as the one before,
+            up to backoff_max, with up to half of the wait removed at random so workers do not retry in lockstep.
+
+        max_retry_after (float): A Retry-After header is waited out when it asks for at most this many seconds.
+            Longer ones fall back to the backoff.
+
+        metrics (metrics.PipelineMetrics): Metrics the http_* counters are kept in.
+
+    Attributes:
+        sessions [requests.Session]: Every session opened, one per thread that made a request.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+            backoff_max=DEFAULT_BACKOFF_MAX, max_retry_after=DEFAULT_MAX_RETRY_AFTER, metrics=None, sleep=time.sleep):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.metrics = metrics or PipelineMetrics()
+        self.sleep = sleep
+        self.sessions = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def session(self):
+        """Returns this thread's session, opening it on first use."""
+
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)  # Retries are made in get().
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            self._local.session = session
+            with self._lock:
+                self.sessions.append(session)
+        return session
+
+    def get(self, url, stream=False, headers=None):
+        """
+        Returns the requests.Response for url. With stream, the body is left to be read from the response. headers are
+        sent on top of the session's.
+
+        Raises:
+            requests.exceptions.RequestException once every attempt failed, or on an error that is not retried.
+        """
+
+        attempt = 0
+        while True:
+            try:
+                response = self._send(url, stream, headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    self.metrics.http_retries_exhausted.inc()
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response
+                if attempt >= self.max_retries:
+                    self.metrics.http_retries_exhausted.inc()
+                    response.raise_for_status()
+                response.close()
+                delay = self.retry_delay(attempt, response.headers.get("Retry-After"))
+            attempt += 1
+            self.metrics.http_retries.inc()
+            self.sleep(delay)
+
+    def get_text(self, url):
+        """Returns the decoded body of url."""
+
+        return self.get(url).text
+
+    def get_if_changed(self, url, validators=None):
+        """
+        Requests url on condition it changed since the response validators were taken from.
+
+        Args:
+            validators (dict): {"etag": ..., "last_modified": ...} from an earlier call, or None for a plain request.
+
+        Returns:
+            (body, validators of this response). body is None if the server answered 304 Not Modified.
+        """
+
+        headers = {}
+        if validators and validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators and validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        response = self.get(url, headers=headers)
+        if response.status_code == 304:
+            self.metrics.http_not_modified.inc()
+            return None, validators
+        return response.text, {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+    def iter_text(self, url, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Yields the body of url in decoded chunks, as it is received. Requests are retried as in get() until the body
+        starts; an error while reading it is raised, since the chunks before it have already been used.
+
+        The chunks join to the same string get_text(url) returns, unless the response names no charset and requests
+        would have guessed one.
+        """
+
+        response = self.get(url, stream=True)
+        try:
+            try:
+                decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            except LookupError:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for chunk in response.iter_content(chunk_size):
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        finally:
+            response.close()
+
+    def backoff(self, attempt):
+        """Returns the seconds to wait before retry number attempt + 1."""
+
+        delay = min(self.backoff_base * 2 ** attempt, self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def retry_delay(self, attempt, retry_after=None):
+        """Returns the seconds to wait before retry number attempt + 1 of a request whose last response carried the
+        Retry-After header value retry_after, if any."""
+
+        delay = self.backoff(attempt)
+        retry_after = parse_retry_after(retry_after)
+        if retry_after is not None and retry_after <= self.max_retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _send(self, url, stream=False, headers=None):
+        session = self.session()
+        opened_before = self._connections_opened(session)
+        self.metrics.http_requests.inc()
+        response = session.get(url, timeout=self.timeout, stream=stream, headers=headers)
+        opened = self._connections_opened(session) - opened_before
+        if opened > 0:
+            self.metrics.http_connections_opened.inc(opened)
+        else:
+            self.metrics.http_connections_reused.inc()
+        return response
+
+    def _connections_opened(self, session):
+        """Returns the number of connections session's urllib3 pools have opened. Sessions are only used by their own
+        thread, so the difference across one request is the connections that request opened."""
+
+        pools = session.get_adapter("http://").poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def close(self):
+        with self._lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            session.close()
+
+
+def default_transport():
+    """Returns the HttpTransport shared by requests made without one, creating it on first use."""
+
+    global _default_transport
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = HttpTransport()
+        return _default_transport
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""This module contains the writer stage, which saves games on threads of its own instead of the scraper's main loop.
+
+A GameWriter has the same interface as the database engines, and fans every game out to one SinkWriter thread per
+database or file sink. Each SinkWriter opens its sink, and is the only thread that uses it afterwards:
+
+    Group commit: every game queued for a sink is saved, up to max_batch, and the batch is then flushed with a single
+        commit or bulk write. The slower a sink commits, the more games wait for it, and the larger its batches grow.
+
+    Spill file: a sink whose queue is full, or whose last write failed, has its games appended to a spill file in
+        spill_dir instead. The sink catches up from the file once its queue is empty, and the file is emptied once it
+        has. A spill file left by a killed crawl is written out by the next one.
+
+    Error isolation: a sink that fails is retried with exponential backoff, while the others keep writing.
+
+Handing a game to the writer never waits on a sink, unless it has no spill_dir. A game's url is reported to
+on_flushed once every sink has flushed it, and to on_failed if some sink still has not when the writer is cleaned up.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from .database_status_codes import DATABASE_STATUS_CODES
+from .models import Game
+
+WRITER_QUEUE_SIZE = 256  # Games queued per sink before they are spilled.
+WRITER_MAX_BATCH = 50
+WRITER_MAX_BATCH_DELAY = 1.0  # Seconds a batch is held open for more games after its first.
+WRITER_RETRY_DELAY = 1.0
+WRITER_MAX_RETRY_DELAY = 60.0
+WRITER_CLOSE_RETRIES = 3  # Retries of a failing sink once the crawl has ended, before its spill file is left for the next.
+SPILL_FILE_EXTENSION = ".spill.jsonl"
+_STOP = object()
+
+
+def sink_name(connection_param):
+    """Returns a file-name-safe name for the sink connection_param selects, stable across runs."""
+
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", connection_param).strip("_")
+
+
+class SpillFile:
+    """
+    Append-only file of (url, models.Game) entries waiting for one sink, one JSON document per line. Not thread safe;
+    SinkWriter serializes access.
+
+    Entries are read from a read offset, and only discarded by commit() once the sink has flushed them. rewind()
+    returns to the last commit, so entries read by a write that failed are read again.
+
+    Args:
+        path (str): File path. Created if it does not exist. Entries already in it are read first.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab+")
+        self._size = self._file.seek(0, os.SEEK_END)
+        self._read_offset = 0
+        self._committed_offset = 0
+
+    @property
+    def pending(self):
+        """Whether entries are left to read."""
+
+        return self._read_offset < self._size
+
+    @property
+    def empty(self):
+        return self._size == 0
+
+    def append(self, entries):
+        lines = b"".join(json.dumps({"url": url, "game": game.to_record()}, ensure_ascii=False).encode("utf-8") + b"\n"
+                for url, game in entries)
+        self._file.write(lines)
+        self._file.flush()  # Survives the process being killed; not a power loss.
+        self._size += len(lines)
+
+    def read(self, max_entries):
+        """Returns up to max_entries [(url, models.Game)] after the read offset, and moves past them."""
+
+        self._file.seek(self._read_offset)
+        entries = []
+        while len(entries) < max_entries and self._read_offset < self._size:
+            line = self._file.readline()
+            self._read_offset += len(line)
+            try:
+                document = json.loads(line)
+            except ValueError:
+                logging.warning("Skipping a truncated entry in {}".format(self.path))  # Cut off by a killed crawl.
+                continue
+            entries.append((document["url"], Game.from_record(document["game"])))
+        return entries
+
+    def commit(self):
+        """Discards every entry read so far. Returns True if that was every entry, which empties the file."""
+
+        self._committed_offset = self._read_offset
+        if self._committed_offset < self._size:
+            return False
+        self._file.truncate(0)
+        self._size = self._read_offset = self._committed_offset = 0
+        return True
+
+    def rewind(self):
+        self._read_offset = self._committed_offset
+
+    def close(self):
+        self._file.close()
+        if self._size == 0:
+            os.remove(self.path)
+
+
+class SinkWriter(threading.Thread):
+    """
+    Thread saving games to one database or file sink. See the module docstring.
+
+    Args:
+        name (str): Sink name, used for the thread name and spill file.
+
+        sink: Database engine or file sink. Opened, used and cleaned up from this thread only.
+
+        on_flushed (callable): Called from this thread with the urls of games the sink has flushed.
+
+        on_failed (callable): Called from this thread with the urls of games given up on, and an error message.
+
+        spill_path (str): Spill file path, or None to make save() wait for room in the queue, and to give up on the
+            games of a failed write.
+
+    Attributes:
+        status (int): DATABASE_STATUS_CODES value of the sink, set once it is opened.
+
+        spilled_count (int): Games appended to the spill file.
+
+        failure_count (int): Writes of a batch that raised.
+
+        unflushed_urls (list): Urls of games saved to the sink, and not yet flushed or given up on.
+    """
+
+    def __init__(self, name, sink, on_flushed, on_failed, spill_path=None, queue_size=WRITER_QUEUE_SIZE, max_batch=WRITER_MAX_BATCH,
+            max_batch_delay=WRITER_MAX_BATCH_DELAY, retry_delay=WRITER_RETRY_DELAY, max_retry_delay=WRITER_MAX_RETRY_DELAY,
+            metrics=None):
+        threading.Thread.__init__(self, name="Sink Writer Thread {}".format(name), daemon=True)
+        self.sink_name = name
+        self.sink = sink
+        self.on_flushed = on_flushed
+        self.on_failed = on_failed
+        self.spill_path = spill_path
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.max_batch = max_batch
+        self.max_batch_delay = max_batch_delay
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.metrics = metrics
+        self.status = DATABASE_STATUS_CODES["not connected"]
+        self.spilled_count = 0
+        self.failure_count = 0
+        self.unflushed_urls = []
+        self._unspilled = []  # (url, game) saved from the queue since the last flush, spilled if the flush fails.
+        self._counted_duplicate_clues = 0
+        self._spill = None
+        self._spilling = False  # While set, every game goes to the spill file, so they are written in arrival order.
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.opened = threading.Event()
+        self._next_retry_delay = retry_delay
+
+    def put(self, url, game):
+        with self._lock:
+            if not self._spilling:
+                try:
+                    self.queue.put_nowait((url, game))
+                    return
+                except queue.Full:
+                    if self._spill is not None:
+                        logging.warning("{} is behind; spilling games to {}".format(self.sink_name, self.spill_path))
+                        self._spilling = True
+            if self._spilling:
+                self._append_spill([(url, game)])
+                return
+        self.queue.put((url, game))  # No spill file: wait for the sink.
+
+    def stop(self):
+        """Asks the thread to write out everything queued and spilled, clean up the sink, and exit."""
+
+        self._stopping.set()
+        self.queue.put(_STOP)
+
+    def run(self):
+        try:
+            self.sink.init_connection()
+            if self.spill_path:
+                self._spill = SpillFile(self.spill_path)
+                self._spilling = not self._spill.empty
+                if self._spilling:
+                    print("Writing games left in {} to {}".format(self.spill_path, self.sink_name))
+            self.status = self.sink.get_connection_status()
+        except Exception as e:
+            logging.exception("Could not open {}".format(self.sink_name))
+            print("Could not open {}: {}".format(self.sink_name, e))
+            self.status = DATABASE_STATUS_CODES["failure"]
+        finally:
+            self.opened.set()
+        if self.status != DATABASE_STATUS_CODES["success"]:
+            return
+
+        stopped = False
+        while not stopped:
+            batch, stopped = self._take_batch()
+            if batch:
+                self._write_batch(batch, from_spill=False)
+            elif self._spill_pending():
+                if not self._write_spilled():
+                    self._stopping.wait(self._backoff())
+        self._next_retry_delay = self.retry_delay
+        retries = 0
+        while self._spill_pending():
+            if self._write_spilled():
+                continue
+            retries += 1
+            if retries > WRITER_CLOSE_RETRIES:
+                break  # The spill file is kept for the next crawl.
+            time.sleep(self._backoff())
+        self._cleanup()
+
+    def _take_batch(self):
+        """Returns ([(url, game)] queued, whether stop() was called). Waits for a first game only while nothing is
+        spilled, then takes every game already queued, waiting up to max_batch_delay for more."""
+
+        batch = []
+        deadline = None
+        while len(batch) < self.max_batch:
+            if deadline is None:
+                timeout = 0.1 if self._spill_pending() or self._stopping.is_set() else None
+            else:
+                timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            deadline = deadline or time.monotonic() + self.max_batch_delay
+        return batch, False
+
+    def _spill_pending(self):
+        with self._lock:
+            return self._spill is not None and self._spill.pending
+
+    def _write_spilled(self):
+        with self._lock:
+            entries = self._spill.read(self.max_batch)
+            reached_end = not self._spill.pending
+        return self._write_batch(entries, from_spill=True, force_flush=reached_end)
+
+    def _write_batch(self, entries, from_spill, force_flush=False):
+        """Saves entries to the sink and flushes them. Returns False if the sink raised."""
+
+        start = time.perf_counter()
+        try:
+            for url, game in entries:
+                self.sink.save(game)
+                self.unflushed_urls.append(url)
+                if not from_spill:
+                    self._unspilled.append((url, game))
+            if force_flush or getattr(self.sink, "batch_flush", True):
+                self.sink.flush()
+        except Exception as e:
+            self._on_write_failed(e, len(entries))
+            return False
+        if self.metrics:
+            self.metrics.writer_batch_seconds.observe(time.perf_counter() - start)
+            self.metrics.writer_batch_games.observe(len(entries))
+        self._next_retry_delay = self.retry_delay
+        if self.sink.unflushed_games == 0:
+            self._on_sink_flushed()
+        return True
+
+    def _on_sink_flushed(self):
+        flushed, self.unflushed_urls, self._unspilled = self.unflushed_urls, [], []
+        duplicate_clues = getattr(self.sink, "duplicate_clue_count", 0)
+        if self.metrics:
+            self.metrics.clues_duplicate.inc(duplicate_clues - self._counted_duplicate_clues)
+        self._counted_duplicate_clues = duplicate_clues
+        if self._spill is not None:
+            with self._lock:
+                if self._spill.commit() and self._spilling and self.queue.empty():
+                    self._spilling = False
+                    logging.info("{} has caught up with its spill file".format(self.sink_name))
+        self.on_flushed(flushed)
+
+    def _on_write_failed(self, e, batch_size):
+        logging.exception("Writing a batch of {} games to {} failed".format(batch_size, self.sink_name))
+        print("Writing to {} failed: {}".format(self.sink_name, e))
+        self.failure_count += 1
+        self._counted_duplicate_clues = getattr(self.sink, "duplicate_clue_count", 0)  # Rolled back with the batch.
+        if self.metrics:
+            self.metrics.save_failures.inc()
+        if self._spill is None:
+            failed, self.unflushed_urls, self._unspilled = self.unflushed_urls, [], []
+            self.on_failed(failed, "Writing to {} failed: {}".format(self.sink_name, e))
+            return
+        with self._lock:
+            self._spill.rewind()
+            self._spilling = True
+            queued = []
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self.queue.put_nowait(_STOP)
+                    break
+                queued.append(item)
+            self._append_spill(self._unspilled + queued)
+        self.unflushed_urls, self._unspilled = [], []
+
+    def _append_spill(self, entries):
+        if entries:
+            self._spill.append(entries)
+            self.spilled_count += len(entries)
+            if self.metrics:
+                self.metrics.games_spilled.inc(len(entries))
+
+    def _backoff(self):
+        delay, self._next_retry_delay = self._next_retry_delay, min(self._next_retry_delay * 2, self.max_retry_delay)
+        return delay
+
+    def _cleanup(self):
+        try:
+            self.sink.cleanup()
+        except Exception as e:
+            logging.exception("Cleaning up {} failed".format(self.sink_name))
+            print("Cleaning up {} failed: {}".format(self.sink_name, e))
+            self.failure_count += 1
+        else:
+            if self.sink.unflushed_games == 0 and self.unflushed_urls:
+                self._on_sink_flushed()
+        if self._spill is not None:
+            with self._lock:
+                if self._spill.pending:
+                    print("{} still has games waiting in {}. They are written out by the next crawl.".format(
+                            self.sink_name, self.spill_path))
+                self._spill.close()
+
+
+class GameWriter:
+    """
+    Saves games to several databases or file sinks at once, each on its own SinkWriter thread. Has the same interface
+    as the database engines; pass it to JArchiveScraper in place of a database.
+
+    Args:
+        sinks (dict): {name: database engine or file sink}. Names must be unique, and are used for spill file names.
+
+        spill_dir (str): Directory for spill files, created if it does not exist. None disables spilling.
+
+        max_batch (int): Most games saved to a sink per commit.
+
+        max_batch_delay (float): Seconds a sink waits for more games after the first of a batch.
+
+        queue_size (int): Games queued per sink before they are spilled.
+
+    Sinks also flush on their own every games_per_flush games. Give them at least max_batch, so that batches are
+    committed whole.
+
+    Attributes:
+        on_flushed (callable): Called with a list of urls once every sink has flushed those games. May be called from
+            any SinkWriter thread.
+
+        on_failed (callable): Called by cleanup() with a list of urls some sink never flushed, and an error message.
+
+        metrics (metrics.PipelineMetrics): Metrics writers count into, or None. Must be set before init_connection().
+    """
+
+    def __init__(self, sinks, spill_dir=None, max_batch=WRITER_MAX_BATCH, max_batch_delay=WRITER_MAX_BATCH_DELAY,
+            queue_size=WRITER_QUEUE_SIZE):
+        if not sinks:
+            raise ValueError("A writer needs at least one sink.")
+        self.sinks = dict(sinks)
+        self.spill_dir = spill_dir
+        self.max_batch = max_batch
+        self.max_batch_delay = max_batch_delay
+        self.queue_size = queue_size
+        self.on_flushed = None
+        self.on_failed = None
+        self.metrics = None
+        self.writers = []
+        self._pending = {}  # url -> number of sinks that have not flushed it yet.
+        self._pending_lock = threading.Lock()
+        self._closed = False
+
+    def init_connection(self):
+        """Starts a SinkWriter per sink, and returns once each has opened its sink, or failed to."""
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        for name, sink in self.sinks.items():
+            spill_path = os.path.join(self.spill_dir, name + SPILL_FILE_EXTENSION) if self.spill_dir else None
+            writer = SinkWriter(name, sink, self._on_sink_flushed, self._on_sink_failed, spill_path=spill_path, queue_size=self.queue_size,
+                    max_batch=self.max_batch, max_batch_delay=self.max_batch_delay, metrics=self.metrics)
+            self.writers.append(writer)
+            writer.start()
+        for writer in self.writers:
+            writer.opened.wait()
+
+    def get_connection_status(self):
+        """Failure if any sink failed to open, success once every sink has opened, and not connected until then."""
+
+        statuses = [writer.status for writer in self.writers]
+        if DATABASE_STATUS_CODES["failure"] in statuses:
+            return DATABASE_STATUS_CODES["failure"]
+        if statuses and all(status == DATABASE_STATUS_CODES["success"] for status in statuses):
+            return DATABASE_STATUS_CODES["success"]
+        return DATABASE_STATUS_CODES["not connected"]
+
+    def save(self, game, url=None):
+        """Queues a models.Game for every sink. url defaults to the game's."""
+
+        url = url or game.url
+        if url is not None:
+            with self._pending_lock:
+                self._pending[url] = self._pending.get(url, 0) + len(self.writers)
+        for writer in self.writers:
+            writer.put(url, game)
+
+    def _on_sink_flushed(self, urls):
+        done = []
+        with self._pending_lock:
+            for url in urls:
+                remaining = self._pending.get(url)
+                if remaining is None:
+                    continue  # Spilled by an earlier crawl.
+                if remaining > 1:
+                    self._pending[url] = remaining - 1
+                else:
+                    del self._pending[url]
+                    done.append(url)
+        if done and self.on_flushed:
+            self.on_flushed(done)
+
+    def _on_sink_failed(self, urls, error):
+        with self._pending_lock:
+            failed = [url for url in urls if self._pending.pop(url, None) is not None]
+        if failed and self.on_failed:
+            self.on_failed(failed, error)
+
+    @property
+    def unflushed_games(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    @property
+    def spilled_count(self):
+        return sum(writer.spilled_count for writer in self.writers)
+
+    def stored_game_urls(self):
+        """Returns the urls of games every sink has stored, or None if some sink cannot list the games it stored."""
+
+        stored = None
+        for sink in self.sinks.values():
+            if not hasattr(sink, "stored_game_urls"):
+                return None
+            urls = sink.stored_game_urls()
+            stored = urls if stored is None else stored & urls
+        return stored
+
+    def cleanup(self):
+        """Waits for every sink to write out its queue and spill file, and cleans the sinks up. Games some sink could not
+        flush are reported to on_failed."""
+
+        if self._closed:
+            return
+        self._closed = True
+        for writer in self.writers:
+            if writer.is_alive():
+                writer.stop()
+        for writer in self.writers:
+            writer.join()
+        with self._pending_lock:
+            unflushed, self._pending = list(self._pending), {}
+        if unflushed and self.on_failed:
+            failed_sinks = ", ".join(writer.sink_name for writer in self.writers if writer.failure_count)
+            self.on_failed(unflushed, "Not flushed to {}".format(failed_sinks or "every sink"))
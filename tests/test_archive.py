@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+#generic imports
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+#test imports
+from scraper.archive import PageArchive
+from scraper.database import Database
+from scraper.scraper import ArchiveReplayScraper
+from benchmarks.local_jarchive import SEASON_PAGE_TEMPLATE, SEASON_ROW_TEMPLATE, TEST_PAGE_PATH, render_game_page
+
+BASE_URL = "http://www.j-archive.com"
+
+
+class TestPageArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.archive = PageArchive(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.archive.close()
+        self.tmp_dir.cleanup()
+
+    def test_get_returns_latest_fetch(self):
+        url = "http://j-archive.com/showgame.php?game_id=1"
+        self.archive.put(url, "<html>first</html>", fetched_at=1.0)
+        self.archive.put(url, "<html>second</html>", fetched_at=2.0)
+        self.assertEqual(self.archive.get(url), "<html>second</html>")
+
+    def test_get_missing_url(self):
+        self.assertIsNone(self.archive.get("http://j-archive.com/showgame.php?game_id=1"))
+
+    def test_identical_pages_stored_once(self):
+        self.archive.put("http://j-archive.com/showgame.php?game_id=1", "<html>same</html>")
+        self.archive.put("http://j-archive.com/showgame.php?game_id=2", "<html>same</html>")
+        self.assertEqual(len(self.archive.blobs), 1)
+
+    def test_reopened_archive_keeps_pages(self):
+        url = "http://j-archive.com/showgame.php?game_id=1"
+        self.archive.put(url, "<html>kept</html>")
+        self.archive.close()
+        self.archive = PageArchive(self.tmp_dir.name)
+        self.assertEqual(self.archive.get(url), "<html>kept</html>")
+
+    def test_game_urls_excludes_season_pages(self):
+        self.archive.put("http://j-archive.com/showseason.php?season=1", "<html></html>", fetched_at=1.0)
+        self.archive.put("http://j-archive.com/showgame.php?game_id=2", "<html>b</html>", fetched_at=3.0)
+        self.archive.put("http://j-archive.com/showgame.php?game_id=1", "<html>a</html>", fetched_at=2.0)
+        self.assertEqual(self.archive.game_urls(), [
+            "http://j-archive.com/showgame.php?game_id=1",
+            "http://j-archive.com/showgame.php?game_id=2"
+            ])
+
+
+class TestArchiveReplayScraper(unittest.TestCase):
+
+    def test_games_saved_with_archived_seasons(self):
+        with open(TEST_PAGE_PATH, "r", encoding="utf-8") as f:
+            template = f.read()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            archive = PageArchive(os.path.join(tmp_dir, "archive"))
+            for game_id in range(5):
+                archive.put("{}/showgame.php?game_id={}".format(BASE_URL, game_id), render_game_page(template, game_id))
+            for season, game_ids in ((1, (0, 1)), (2, (2, 3))):  # Game 4 is on no archived season page.
+                rows = "\n".join(SEASON_ROW_TEMPLATE.format(base_url=BASE_URL, game_id=game_id) for game_id in game_ids)
+                archive.put("{}/showseason.php?season={}".format(BASE_URL, season), SEASON_PAGE_TEMPLATE.format(rows=rows))
+            db_path = os.path.join(tmp_dir, "test.db")
+            scraper = ArchiveReplayScraper(Database.factory(db_path), archive=archive, worker_threads=2)
+            with contextlib.redirect_stdout(io.StringIO()):
+                scraper.start()
+                scraper.cleanup()
+            conn = sqlite3.connect(db_path)
+            try:
+                seasons = conn.execute("""SELECT id, season FROM games ORDER BY id""").fetchall()
+            finally:
+                conn.close()
+        self.assertEqual(seasons, [(0, 1), (1, 1), (2, 2), (3, 2), (4, None)])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+#generic imports
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+import mock
+
+#test imports
+from scraper.archive import PageArchive
+from scraper.async_engine import AsyncJArchiveScraper
+from scraper.database import Database, SqliteDatabase
+from scraper.scraper import JArchiveScraper
+from scraper.transport import HttpTransport
+from benchmarks.local_jarchive import LocalJArchive
+
+STORED_ROWS_SQL = """SELECT games.id, games.season, categories.title, clues.question, clues.answer, clues.round, clues.value
+        FROM clues JOIN games ON games.id = clues.game_id JOIN categories ON categories.id = clues.category_id"""
+
+
+class TestAsyncJArchiveScraper(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _crawl(self, scraper_cls, **options):
+        """Crawls a local site, a fifth of whose season and game requests fail with a 503, and returns the stored rows."""
+
+        db_path = os.path.join(self.tmp_dir.name, "{}.db".format(scraper_cls.__name__))
+        with LocalJArchive(seasons=2, games_per_season=4, latency=0.0, error_rate=0.2, seed=3) as site:
+            transport = HttpTransport(max_retries=8, backoff_base=0.001)
+            scraper = scraper_cls(Database.factory(db_path), base_url=site.base_url, queue_size=2, transport=transport,
+                    **options)
+            with contextlib.redirect_stdout(io.StringIO()):
+                scraper.start()
+                scraper.cleanup()
+            self.assertGreater(site.request_counts["error"], 0)
+        conn = sqlite3.connect(db_path)
+        try:
+            return sorted(conn.execute(STORED_ROWS_SQL).fetchall()), scraper
+        finally:
+            conn.close()
+
+    def test_stores_same_rows_as_threaded_engine(self):
+        threaded_rows, _ = self._crawl(JArchiveScraper, worker_threads=3)
+        async_rows, scraper = self._crawl(AsyncJArchiveScraper, concurrency=3)
+        self.assertEqual({row[1] for row in async_rows}, {1, 2})
+        self.assertEqual(async_rows, threaded_rows)
+        self.assertGreater(scraper.metrics.http_retries.value, 0)
+        self.assertEqual(scraper.metrics.fetch_failures.value, 0)
+
+    def test_archives_and_saves_off_the_event_loop(self):
+        threads = set()
+
+        def record_thread(*args, **kwargs):
+            threads.add(threading.current_thread())
+
+        archive = PageArchive(os.path.join(self.tmp_dir.name, "archive"))
+        with mock.patch.object(PageArchive, "put", side_effect=record_thread), \
+                mock.patch.object(SqliteDatabase, "save", side_effect=record_thread):
+            self._crawl(AsyncJArchiveScraper, concurrency=3, archive=archive)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.main_thread(), threads)  # The loop runs on the main thread.
+
+
+if __name__ == '__main__':
+    unittest.main()
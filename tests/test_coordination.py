@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import queue
+import tempfile
+import unittest
+import mock
+
+#test imports
+from scraper.coordination import (MemoryWorkStore, SqliteWorkStore, WorkUnit, season_unit_key, UNIT_KIND_GAME,
+        UNIT_KIND_SEASON, UNIT_STATUS_DONE, UNIT_STATUS_FAILED)
+from scraper.scraper import LeasedUrlWorker, URL_SENTINEL
+
+SEASON_GAME_URLS = {season: ["http://j-archive.com/showgame.php?game_id={}{}".format(season, i) for i in range(3)]
+        for season in (1, 2)}
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSqliteWorkStore(unittest.TestCase):
+    """Two stores opened on one file stand in for two scraper processes."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.clock = Clock()
+        path = os.path.join(self.tmp_dir.name, "crawl.work")
+        self.store_a = SqliteWorkStore(path, lease_seconds=60, max_attempts=2, clock=self.clock)
+        self.store_b = SqliteWorkStore(path, lease_seconds=60, max_attempts=2, clock=self.clock)
+
+    def tearDown(self):
+        self.store_a.close()
+        self.store_b.close()
+        self.tmp_dir.cleanup()
+
+    def test_units_are_leased_once(self):
+        self.store_a.add_seasons([1, 2])
+        self.store_b.add_seasons([2])  # Already added; ignored.
+        self.assertEqual(self.store_a.lease("a", 1), [WorkUnit(season_unit_key(2), UNIT_KIND_SEASON, 2)])
+        self.store_a.add_season_games(2, SEASON_GAME_URLS[2])
+        leased_b = self.store_b.lease("b", 2)
+        self.assertEqual([unit.kind for unit in leased_b], [UNIT_KIND_GAME, UNIT_KIND_GAME])  # Games come first.
+        leased_a = self.store_a.lease("a", 10)
+        self.assertEqual(sorted(unit.key for unit in leased_a + leased_b), sorted(SEASON_GAME_URLS[2] + [season_unit_key(1)]))
+        self.assertEqual(self.store_b.lease("b", 10), [])
+        self.assertEqual(self.store_a.counts()[UNIT_STATUS_DONE], 1)
+
+    def test_expired_leases_are_reclaimed_unless_renewed(self):
+        self.store_a.add_seasons([1, 2])
+        self.store_a.lease("a", 1)
+        self.store_a.lease("crashed", 1)
+        self.clock.now += 50
+        self.assertEqual(self.store_a.heartbeat("a"), 1)
+        self.clock.now += 50
+        self.assertEqual([unit.season for unit in self.store_b.lease("b", 10)], [1])  # Only the crashed owner's lease.
+        self.assertEqual(self.store_b.remaining(exclude_owner="b"), 1)
+
+    def test_failed_units_retried_until_max_attempts(self):
+        self.store_a.add_seasons([1])
+        self.store_a.lease("a", 1)
+        self.store_a.mark_failed([season_unit_key(1)], error="503")
+        self.assertEqual(len(self.store_b.lease("b", 1)), 1)
+        self.store_b.mark_failed([season_unit_key(1)], error="503")
+        self.assertEqual(self.store_a.lease("a", 1), [])
+        self.assertEqual(self.store_a.remaining(), 0)
+        self.assertEqual(self.store_a.counts(), {UNIT_STATUS_FAILED: 1})
+
+
+class TestLeasedUrlWorker(unittest.TestCase):
+
+    def _run_worker(self, store, owner):
+        url_queue = queue.Queue()
+        worker = LeasedUrlWorker(url_queue, store, owner, lease_batch=2, poll_interval=0.01, max_queued=100)
+        with mock.patch.object(worker, "get_current_season_number", return_value=2), \
+                mock.patch.object(worker, "get_season_game_urls", side_effect=SEASON_GAME_URLS.get):
+            worker.start(None, False)
+            worker.join(5)
+        return list(url_queue.queue)
+
+    def test_queues_every_game_of_every_season(self):
+        store = MemoryWorkStore()
+        queued = self._run_worker(store, "a")
+        self.assertEqual(queued[-1], URL_SENTINEL)
+        self.assertEqual(sorted(queued[:-1]), sorted(SEASON_GAME_URLS[1] + SEASON_GAME_URLS[2]))
+        store.mark_done(queued[:-1])
+        self.assertEqual(store.counts(), {UNIT_STATUS_DONE: 8})
+
+    def test_waits_for_and_reclaims_other_processes_leases(self):
+        clock = Clock()
+        store = MemoryWorkStore(lease_seconds=10, clock=clock)
+        store.add_seasons([1, 2])
+        store.add_season_games(1, SEASON_GAME_URLS[1])
+        store.lease("crashed", 1)
+        clock.now += 9.5  # The crashed owner's lease expires during the worker's first wait.
+        with mock.patch("scraper.scraper.sleep", side_effect=lambda seconds: setattr(clock, "now", clock.now + 1)):
+            queued = self._run_worker(store, "a")
+        self.assertEqual(sorted(queued[:-1]), sorted(SEASON_GAME_URLS[1] + SEASON_GAME_URLS[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import sqlite3
+import tempfile
+import unittest
+import mock
+import pymongo
+
+#test imports
+from scraper.database import Database, SqliteDatabase
+from scraper.database_status_codes import DATABASE_STATUS_CODES
+from scraper.exceptions import DatabaseOperationalError
+
+GAME = {
+        "TREES": [{"question": "q{}".format(i), "answer": "a{}".format(i)} for i in range(5)],
+        "LITERARY LINES": [{"question": "q{}".format(i), "answer": "a{}".format(i)} for i in range(5, 10)]
+        }
+
+
+def make_game(game_id):
+    return {title: [{"question": "{} {} {}".format(title, game_id, i), "answer": "a"} for i in range(5)]
+            for title in ("TREES", "LITERARY LINES")}
+
+
+class TestSqliteDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _open(self, **options):
+        database = Database.factory("sqlite:///" + self.db_path, **options)
+        database.init_connection()
+        self.assertEqual(database.get_connection_status(), DATABASE_STATUS_CODES["success"])
+        return database
+
+    def _query(self, sql):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_factory_strips_uri_prefix(self):
+        database = Database.factory("sqlite:///" + self.db_path)
+        self.assertIsInstance(database, SqliteDatabase)
+        self.assertEqual(database.db_path, self.db_path)
+
+    def test_clues_reference_their_category(self):
+        database = self._open()
+        database.save(GAME)
+        database.cleanup()
+        rows = self._query("""SELECT categories.title, COUNT(*) FROM clues JOIN categories ON clues.category_id = categories.id
+                GROUP BY categories.title ORDER BY categories.title""")
+        self.assertEqual(rows, [("LITERARY LINES", 5), ("TREES", 5)])
+
+    def test_games_committed_every_flush(self):
+        database = self._open(games_per_flush=2)
+        database.save(make_game(1))
+        self.assertEqual(self._query("SELECT COUNT(*) FROM clues"), [(0,)])
+        database.save(make_game(2))
+        self.assertEqual(self._query("SELECT COUNT(*) FROM clues"), [(20,)])
+        database.save(make_game(3))
+        database.cleanup()
+        self.assertEqual(self._query("SELECT COUNT(*) FROM clues"), [(30,)])
+
+    def test_titles_interned_and_clues_deduplicated(self):
+        database = self._open()
+        database.save(GAME)
+        database.cleanup()
+        database = self._open()
+        database.save(make_game(1))
+        database.save({"trees ": [{"question": "Q0", "answer": "a0"}]})  # Equal up to case and whitespace.
+        database.cleanup()
+        self.assertEqual(database.duplicate_clue_count, 1)
+        self.assertEqual(self._query("SELECT title FROM categories ORDER BY id"), [("TREES",), ("LITERARY LINES",), ("trees ",)])
+        self.assertEqual(self._query("SELECT COUNT(*), COUNT(DISTINCT category_id) FROM clues"), [(20, 2)])
+
+    def test_older_layout_is_refused(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""CREATE TABLE categories(id INTEGER PRIMARY KEY, title TEXT NOT NULL)""")
+        conn.close()
+        database = Database.factory("sqlite:///" + self.db_path)
+        database.init_connection()
+        self.assertEqual(database.get_connection_status(), DATABASE_STATUS_CODES["failure"])
+
+
+class TestMongoDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.database = Database.factory("mongodb://localhost:27017/jtrivia", games_per_flush=2, flush_interval=3600)
+        self.collection = mock.MagicMock()
+        self.collection.bulk_write.return_value.upserted_count = 10
+        self.categories = mock.MagicMock()
+        self.database.db = {self.database.collection_name: self.collection,
+                self.database.categories_collection_name: self.categories}  # Stand-in for a connected database.
+
+    def test_games_buffered_until_flush_size(self):
+        self.database.save(GAME)
+        self.collection.bulk_write.assert_not_called()
+        self.database.save(make_game(1))
+        self.collection.bulk_write.assert_called_once()
+        operations = self.collection.bulk_write.call_args[0][0]
+        self.assertEqual(len(operations), 20)
+        self.assertEqual(self.collection.bulk_write.call_args[1], {"ordered": False})
+        self.assertEqual(len(self.categories.bulk_write.call_args[0][0]), 2)  # Titles interned.
+        self.assertEqual(self.database.category_count, 4)
+        self.assertEqual(self.database.duplicate_clue_count, 10)  # 20 upserted, 10 inserted.
+
+    def test_repeated_clues_buffered_once(self):
+        self.database.save(GAME)
+        self.database.save(GAME)
+        self.assertEqual(len(self.collection.bulk_write.call_args[0][0]), 10)
+        self.assertEqual(self.database.duplicate_clue_count, 10)
+
+    def test_flush_after_interval(self):
+        self.database.flush_interval = 0
+        self.database.save(GAME)
+        self.collection.bulk_write.assert_called_once()
+
+    @mock.patch("scraper.mongo_database.time.sleep")
+    def test_transient_errors_retried(self, mock_sleep):
+        self.collection.bulk_write.side_effect = [pymongo.errors.AutoReconnect("down"), mock.MagicMock()]
+        self.database.save(GAME)
+        self.database.flush()
+        self.assertEqual(self.collection.bulk_write.call_count, 2)
+        self.assertEqual(self.database.flush_count, 1)
+
+    @mock.patch("scraper.mongo_database.time.sleep")
+    def test_duplicates_on_retry_are_not_errors(self, mock_sleep):
+        duplicate = pymongo.errors.BulkWriteError({"writeErrors": [{"code": 11000}]})
+        self.collection.bulk_write.side_effect = [pymongo.errors.NetworkTimeout("slow"), duplicate]
+        self.database.save(GAME)
+        self.database.flush()
+        self.assertEqual(self.database.flush_count, 1)
+
+    def test_failed_flush_raises(self):
+        self.collection.bulk_write.side_effect = pymongo.errors.BulkWriteError({"writeErrors": [{"code": 2}]})
+        self.database.save(GAME)
+        with self.assertRaises(DatabaseOperationalError):
+            self.database.flush()
+        self.assertEqual(self.database.buffered_clues, {})
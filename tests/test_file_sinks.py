@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+#generic imports
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+
+#test imports
+from scraper import Database
+from scraper.database_status_codes import DATABASE_STATUS_CODES
+from scraper.file_sinks import JsonlSink, ParquetSink, zstandard
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+GAME = {
+        "TREES": [{"question": "q{}".format(i), "answer": "a{}".format(i)} for i in range(5)],
+        "RIVERS": [{"question": "r{}".format(i), "answer": "b{}".format(i)} for i in range(5)]
+        }
+
+
+class TestFileSinks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _run(self, connection_param, games, **options):
+        sink = Database.factory(connection_param, **options)
+        sink.init_connection()
+        self.assertEqual(sink.get_connection_status(), DATABASE_STATUS_CODES["success"])
+        for _ in range(games):
+            sink.save(GAME)
+        sink.cleanup()
+        return sink
+
+    def _read_jsonl(self, text):
+        return [json.loads(line) for line in text.splitlines()]
+
+    def test_jsonl(self):
+        path = os.path.join(self.tmp_dir.name, "clues.jsonl")
+        self.assertIsInstance(self._run("jsonl://" + path, 2), JsonlSink)
+        with open(path, "r", encoding="utf-8") as f:
+            documents = self._read_jsonl(f.read())
+        self.assertEqual(documents[0]["category"], "TREES")
+        self.assertEqual([{"question": c["question"], "answer": c["answer"]} for c in documents[0]["clues"]], GAME["TREES"])
+        self.assertEqual(len(documents), 4)
+
+    def test_gzip_runs_append(self):
+        path = os.path.join(self.tmp_dir.name, "clues.jsonl.gz")
+        self._run("jsonl+gzip://" + path, 3, games_per_flush=2)
+        self._run("jsonl+gzip://" + path, 1)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            self.assertEqual(len(self._read_jsonl(f.read())), 8)
+
+    @unittest.skipIf(zstandard is None, "zstandard not installed.")
+    def test_zstd_runs_append(self):
+        path = os.path.join(self.tmp_dir.name, "clues.jsonl.zst")
+        self._run("jsonl+zstd://" + path, 3, games_per_flush=2)
+        self._run("jsonl+zstd://" + path, 1)
+        with open(path, "rb") as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+            self.assertEqual(len(self._read_jsonl(io.TextIOWrapper(reader, encoding="utf-8").read())), 8)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed.")
+    def test_parquet_row_groups_and_category_ids(self):
+        import pyarrow.parquet
+
+        directory = os.path.join(self.tmp_dir.name, "clues")
+        sink = self._run("parquet://" + directory, 5, games_per_flush=2, games_per_file=4)
+        self.assertIsInstance(sink, ParquetSink)
+        self._run("parquet://" + directory, 1)
+        part_files = sorted(os.listdir(directory))
+        self.assertEqual(len(part_files), 3)
+        self.assertEqual(pyarrow.parquet.ParquetFile(os.path.join(directory, part_files[0])).metadata.num_row_groups, 2)
+
+        table = pyarrow.parquet.read_table(directory)
+        self.assertEqual(table.num_rows, 6 * 10)
+        self.assertEqual(sorted(set(table.column("category_id").to_pylist())), list(range(1, 13)))
+
+
+if __name__ == '__main__':
+    unittest.main()
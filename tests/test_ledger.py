@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import queue
+import tempfile
+import unittest
+import mock
+
+#test imports
+from scraper.ledger import CrawlLedger, LEDGER_STATUS_DONE, LEDGER_STATUS_FAILED, LEDGER_STATUS_FETCHED
+from scraper.scraper import UrlWorker
+
+GAME_URLS = ["http://j-archive.com/showgame.php?game_id={}".format(i) for i in range(4)]
+
+
+class TestCrawlLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ledger = CrawlLedger(os.path.join(self.tmp_dir.name, "test.ledger"))
+
+    def tearDown(self):
+        self.ledger.close()
+        self.tmp_dir.cleanup()
+
+    def test_status_transitions(self):
+        url = GAME_URLS[0]
+        self.assertIsNone(self.ledger.status(url))
+        self.ledger.mark_fetched(url, "abc")
+        self.assertEqual(self.ledger.status(url), LEDGER_STATUS_FETCHED)
+        self.ledger.mark_done([url])
+        self.assertEqual(self.ledger.status(url), LEDGER_STATUS_DONE)
+
+    def test_only_done_and_empty_games_are_complete(self):
+        self.ledger.mark_done([GAME_URLS[0]])
+        self.ledger.mark_empty(GAME_URLS[1])
+        self.ledger.mark_failed([GAME_URLS[2]], error="timeout")
+        self.ledger.mark_fetched(GAME_URLS[3], "abc")
+        self.assertEqual(self.ledger.completed_urls(), {GAME_URLS[0], GAME_URLS[1]})
+
+    def test_failed_game_attempts_counted(self):
+        self.ledger.mark_failed([GAME_URLS[0]])
+        self.ledger.mark_failed([GAME_URLS[0]])
+        self.assertEqual(self.ledger.status(GAME_URLS[0]), LEDGER_STATUS_FAILED)
+        attempts = self.ledger.conn.execute("SELECT attempts FROM games WHERE url = ?", (GAME_URLS[0],)).fetchone()[0]
+        self.assertEqual(attempts, 2)
+
+    def test_url_worker_skips_completed_games(self):
+        self.ledger.mark_done(GAME_URLS[:2])
+        url_queue = queue.Queue()
+        url_worker = UrlWorker(url_queue, ledger=self.ledger)
+        url_worker.completed_urls = self.ledger.completed_urls()
+        with mock.patch.object(url_worker, "get_season_game_urls", return_value=GAME_URLS):
+            url_worker.populate_url_queue(1)
+        self.assertEqual(list(url_queue.queue), GAME_URLS[2:])
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+#generic imports
+import queue
+import unittest
+
+#test imports
+from scraper.metrics import Histogram, PipelineMetrics
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_quantile_falls_in_observed_bucket(self):
+        histogram = Histogram("fetch_seconds", "", buckets=(0.1, 0.2, 0.5, 1.0))
+        for value in [0.05] * 50 + [0.4] * 49 + [0.9]:
+            histogram.observe(value)
+        self.assertLessEqual(histogram.quantile(0.5), 0.1)
+        self.assertTrue(0.2 < histogram.quantile(0.95) <= 0.5)
+        self.assertEqual(histogram.count, 100)
+
+    def test_quantile_without_observations(self):
+        self.assertIsNone(Histogram("fetch_seconds", "").quantile(0.5))
+
+
+class TestPipelineMetrics(unittest.TestCase):
+
+    def test_record_saved_counts_categories_and_clues(self):
+        metrics = PipelineMetrics()
+        metrics.record_saved(2, 6)
+        self.assertEqual(metrics.games_saved.value, 1)
+        self.assertEqual(metrics.categories_saved.value, 2)
+        self.assertEqual(metrics.clues_saved.value, 6)
+
+    def test_render_prometheus(self):
+        url_queue = queue.Queue()
+        url_queue.put("http://j-archive.com/showgame.php?game_id=1")
+        metrics = PipelineMetrics(url_queue=url_queue)
+        metrics.pages_fetched.inc(3)
+        metrics.fetch_seconds.observe(0.01)
+        text = metrics.render_prometheus()
+        self.assertIn("# TYPE jarchive_pages_fetched counter", text)
+        self.assertIn("jarchive_pages_fetched_total 3", text)
+        self.assertIn("jarchive_url_queue_depth 1", text)
+        self.assertIn('jarchive_fetch_seconds_bucket{le="+Inf"} 1', text)
+        self.assertEqual(metrics.snapshot()["pages_fetched"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
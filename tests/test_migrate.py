@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import sqlite3
+import tempfile
+import unittest
+
+#test imports
+from scraper import ClueSearch
+from scraper.exceptions import DatabaseOperationalError
+from scraper.migrate import migrate_sqlite
+
+# Layout written before titles were interned: a categories row per appearance, holding the game and round.
+OLD_LAYOUT_SQL = """
+        CREATE TABLE games(id INTEGER PRIMARY KEY, season INT, url TEXT);
+        CREATE TABLE categories(id INTEGER PRIMARY KEY, title TEXT NOT NULL, game_id INT, round INT);
+        CREATE TABLE clues(id INTEGER PRIMARY KEY, question TEXT NOT NULL, answer TEXT NOT NULL, category_id INT NOT NULL,
+            value INT, daily_double INT NOT NULL DEFAULT 0);
+        CREATE VIRTUAL TABLE clues_fts USING fts5(question, answer, category, content='');
+        INSERT INTO games VALUES (7, 30, 'http://www.j-archive.com/showgame.php?game_id=7');
+        INSERT INTO categories VALUES (1, 'TREES', 7, 1), (2, 'RIVERS', 7, 2), (3, 'TREES', 7, 1);
+        INSERT INTO clues VALUES (1, 'Giant redwood', 'sequoia', 1, 200, 0), (2, 'Flows through Cairo', 'the Nile', 2, 400, 1),
+            (3, 'giant  redwood', 'Sequoia', 3, 200, 0), (4, 'Quaking tree', 'aspen', 3, 600, 0);
+        """
+
+
+class TestMigrateSqlite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.src_path = os.path.join(self.tmp_dir.name, "old.db")
+        self.dst_path = os.path.join(self.tmp_dir.name, "new.db")
+        conn = sqlite3.connect(self.src_path)
+        conn.executescript(OLD_LAYOUT_SQL)
+        conn.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_copy_interns_titles_and_drops_duplicate_clues(self):
+        counts = migrate_sqlite(self.src_path, "sqlite:///" + self.dst_path)
+        self.assertEqual(counts, {"categories": (3, 2), "clues": (4, 3)})
+        conn = sqlite3.connect(self.dst_path)
+        rows = conn.execute("""SELECT categories.title, clues.question, clues.game_id, clues.round, clues.value, clues.daily_double
+                FROM clues JOIN categories ON categories.id = clues.category_id ORDER BY clues.id""").fetchall()
+        conn.close()
+        self.assertEqual(rows, [("TREES", "Giant redwood", 7, 1, 200, 0), ("RIVERS", "Flows through Cairo", 7, 2, 400, 1),
+                ("TREES", "Quaking tree", 7, 1, 600, 0)])
+        clue_search = ClueSearch(self.dst_path)
+        self.assertEqual([r["answer"] for r in clue_search.search("nile")], ["the Nile"])  # Full-text index rebuilt.
+        clue_search.close()
+
+    def test_existing_destination_is_refused(self):
+        open(self.dst_path, "w").close()
+        with self.assertRaises(DatabaseOperationalError):
+            migrate_sqlite(self.src_path, self.dst_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+#generic imports
+import json
+import os
+import pickle
+import unittest
+
+#test imports
+from scraper.models import Game
+from scraper.parser_backends import PARSER_BACKENDS, get_parser_backend
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+test_html_page_path = "{}/test_page.html".format(current_dir)
+GAME_URL = "http://j-archive.com/showgame.php?game_id=6342"
+
+
+@unittest.skipIf(not os.path.isfile(test_html_page_path), 'Test html page not in directory.')
+class TestGameModel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(test_html_page_path, 'r') as markup:
+            cls.test_page = markup.read()
+
+    def test_to_dict_matches_dict_parse(self):
+        for name in sorted(PARSER_BACKENDS):
+            try:
+                backend = get_parser_backend(name)
+            except ValueError:
+                continue  # Optional dependency not installed.
+            with self.subTest(backend=name):
+                game = backend.parse_game(self.test_page, GAME_URL)
+                self.assertEqual(game.to_dict(), backend.parse_game_markup(self.test_page))
+                self.assertEqual(Game.from_dict(game.to_dict()).to_dict(), game.to_dict())
+
+    def test_game_metadata(self):
+        game = get_parser_backend("bs4").parse_game(self.test_page, GAME_URL)
+        self.assertEqual(game.game_id, 6342)
+        self.assertEqual({category.round_number for category in game}, {1, 2})
+        self.assertEqual(game.clue_count, 5 * len(game))
+        self.assertEqual(pickle.loads(pickle.dumps(game)), game)
+
+    def test_record_round_trip(self):
+        game = get_parser_backend("bs4").parse_game(self.test_page, GAME_URL)
+        game.season = 32
+        self.assertEqual(Game.from_record(json.loads(json.dumps(game.to_record()))), game)
+
+    def test_empty_game_is_falsy(self):
+        self.assertFalse(Game([], url=GAME_URL))
+
+
+if __name__ == '__main__':
+    unittest.main()
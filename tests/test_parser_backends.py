@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import bs4
+import unittest
+import mock
+
+#test imports
+from scraper.archive import PageArchive
+from scraper.parser import parse_jarchive_page
+from scraper.parser_backends import PARSER_BACKENDS, get_parser_backend
+from scraper.scraper import ScraperWorker, hash_markup
+
+TEST_HTML_PAGE = "test_page.html"
+RECORDED_PAGES_ENV = "JARCHIVE_TEST_ARCHIVE"  # Optional PageArchive directory of recorded game pages to compare backends on.
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+test_html_page_path = "{}/{}".format(current_dir, TEST_HTML_PAGE)
+
+
+def _reference_parse(markup):
+    return parse_jarchive_page(bs4.BeautifulSoup(markup, "html.parser"))
+
+
+def _installed_backends():
+    backends = []
+    for name in sorted(PARSER_BACKENDS):
+        try:
+            backends.append(get_parser_backend(name))
+        except ValueError:
+            continue  # Optional dependency not installed.
+    return backends
+
+
+@unittest.skipIf(not os.path.isfile(test_html_page_path), 'Test html page not in directory.')
+class TestParserBackendEquivalence(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(test_html_page_path, 'r') as markup:
+            test_page = markup.read()
+        cls.pages = {
+                "test_page": test_page,
+                # First clue of the first category has no question, so that category is dropped.
+                "incomplete_clue": test_page.replace('class="clue_text">Weighing up to 200 tons', 'class="clue_text_missing">', 1),
+                # First round is missing a category title, so the whole round is dropped.
+                "malformed_round": test_page.replace('class="category_name"', 'class="category_missing"', 1),
+                }
+        archive_dir = os.environ.get(RECORDED_PAGES_ENV)
+        if archive_dir:
+            archive = PageArchive(archive_dir)
+            for url in archive.game_urls():
+                cls.pages[url] = archive.get(url)
+            archive.close()
+
+    def test_backends_match_reference_parse(self):
+        for name, markup in self.pages.items():
+            expected = _reference_parse(markup)
+            for backend in _installed_backends():
+                with self.subTest(page=name, backend=backend.name):
+                    self.assertEqual(backend.parse_game_markup(markup), expected)
+
+    def test_variant_pages_exercise_dropped_categories(self):
+        full = _reference_parse(self.pages["test_page"])
+        self.assertEqual(len(_reference_parse(self.pages["incomplete_clue"])), len(full) - 1)
+        self.assertLess(len(_reference_parse(self.pages["malformed_round"])), len(full) - 1)
+
+    def test_stream_backend_matches_bs4_in_any_chunk_size(self):
+        bs4_backend, stream_backend = get_parser_backend("bs4"), get_parser_backend("stream")
+        for name, markup in self.pages.items():
+            expected = bs4_backend.parse_game(markup)  # Also compares round numbers, values and daily doubles.
+            for chunk_size in (1, 7, 4096, len(markup)):
+                with self.subTest(page=name, chunk_size=chunk_size):
+                    chunks = (markup[i:i + chunk_size] for i in range(0, len(markup), chunk_size))
+                    self.assertEqual(stream_backend.parse_game_chunks(chunks), expected)
+
+    def test_worker_parses_while_streaming(self):
+        markup = self.pages["test_page"]
+        transport = mock.Mock(**{"iter_text.return_value": iter([markup[:30000], markup[30000:]])})
+        ledger = mock.Mock()
+        worker = ScraperWorker(None, None, parser_backend="stream", ledger=ledger, transport=transport)
+        game = worker.scrape_jarchive_page("http://j-archive.com/showgame.php?game_id=1")
+        self.assertEqual(game, get_parser_backend("bs4").parse_game(markup, "http://j-archive.com/showgame.php?game_id=1"))
+        ledger.mark_fetched.assert_called_once_with("http://j-archive.com/showgame.php?game_id=1", hash_markup(markup))
+        self.assertEqual(worker.metrics.parse_seconds.count, 1)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_parser_backend("not-a-backend")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+#generic imports
+import contextlib
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+#test imports
+from scraper.database import Database
+from scraper.profiling import PipelineProfiler, classify_stack, thread_role
+from scraper.scraper import JArchiveScraper
+from benchmarks.local_jarchive import LocalJArchive
+
+
+class TestPipelineProfiler(unittest.TestCase):
+
+    def test_classify_stack_uses_outermost_marker(self):
+        self.assertEqual(classify_stack([("threading", "run"), ("scraper.scraper", "discover_game_urls"),
+                ("scraper.scraper", "get_season_game_urls"), ("scraper.parser", "get_page_markup")]), "discover")
+        self.assertEqual(classify_stack([("scraper.scraper", "run"), ("scraper.scraper", "scrape_jarchive_page"),
+                ("scraper.parser_backends", "parse_game_markup"), ("bs4.element", "find_all")]), "parse")
+        self.assertEqual(classify_stack([("scraper.scraper", "run"), ("queue", "get"), ("threading", "wait")]), "other")
+        self.assertEqual(classify_stack([("scraper.scraper", "stream_game_page"), ("scraper.transport", "iter_text"),
+                ("requests.models", "iter_content"), ("urllib3.response", "read")]), "fetch")
+        self.assertEqual(classify_stack([("scraper.scraper", "stream_game_page"), ("scraper.parser_backends", "feed"),
+                ("html.parser", "feed"), ("html.parser", "goahead")]), "parse")
+        self.assertEqual(classify_stack([("scraper.scraper", "stream_game_page"), ("scraper.parser_backends", "close"),
+                ("html.parser", "close"), ("html.parser", "goahead")]), "parse")
+
+    def test_classify_stack_ignores_same_named_functions_of_other_modules(self):
+        self.assertEqual(classify_stack([("scraper.scraper", "run"), ("requests.models", "iter_text")]), "other")
+        self.assertEqual(classify_stack([("scraper.scraper", "run"), ("html.parser", "feed"), ("html.parser", "goahead")]),
+                "other")
+        self.assertEqual(classify_stack([("run", "main"), ("tempfile", "cleanup")]), "other")
+
+    def test_thread_role(self):
+        self.assertEqual(thread_role("Worker Thread 3"), "worker")
+        self.assertEqual(thread_role("URL Worker Thread"), "discovery")
+        self.assertEqual(thread_role("MainThread"), "main")
+        self.assertEqual(thread_role("Sink Writer Thread jtrivia.db"), "writer")
+
+    def test_profiles_worker_threads(self):
+        def busy():
+            sum(i * i for i in range(200000))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            profiler = PipelineProfiler(tmp_dir, interval=0.001)
+            with profiler:
+                worker = threading.Thread(target=busy, name="Worker Thread 0")
+                worker.start()
+                worker.join()
+            self.assertIn("Worker Thread 0", [name for name, _ in profiler.profiles])
+            for filename in ("profile.pstats", "stacks.collapsed", "stacks-parse.collapsed"):
+                self.assertTrue(os.path.isfile(os.path.join(tmp_dir, filename)))
+
+    def test_stream_backend_samples_fetch_and_parse(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, LocalJArchive(seasons=1, games_per_season=8, latency=0.02,
+                trickle_chunks=4) as site:
+            scraper = JArchiveScraper(Database.factory(os.path.join(tmp_dir, "test.db")), base_url=site.base_url,
+                    parser_backend="stream", worker_threads=2)
+            profiler = PipelineProfiler(os.path.join(tmp_dir, "profile"), interval=0.001)
+            with profiler, contextlib.redirect_stdout(io.StringIO()):
+                scraper.start()
+                scraper.cleanup()
+        samples = profiler.stage_samples()
+        self.assertEqual(scraper.metrics.games_saved.value, 8)
+        self.assertGreater(samples["fetch"], 0)
+        self.assertGreater(samples["parse"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+#test imports
+from scraper import ClueSampler, Database
+from scraper.models import Category, Game
+
+
+def make_game(game_id, season):
+    return Game([Category("SCIENCE", 1, ["q{}-{}".format(game_id, i) for i in range(5)], ["a"] * 5,
+                        [200, 400, 600, 800, 1000], [False, False, True, False, False]),
+                Category("HISTORY", 2, ["h{}-{}".format(game_id, i) for i in range(5)], ["a"] * 5,
+                        [400, 800, 1200, 1600, 2000])],
+            url="http://www.j-archive.com/showgame.php?game_id={}".format(game_id), season=season)
+
+
+class TestClueSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _crawl(self, games):
+        database = Database.factory("sqlite:///" + self.db_path)
+        database.init_connection()
+        for game in games:
+            database.save(game)
+        database.cleanup()
+
+    def test_sample_only_returns_matching_clues(self):
+        self._crawl([make_game(1, 30), make_game(2, 31), make_game(3, 31)])
+        sampler = ClueSampler(self.db_path, rng=random.Random(0))
+        clues = sampler.sample(50, season=31, round_number=2, value=800)
+        self.assertEqual(sorted(clue["question"] for clue in clues), ["h2-1", "h3-1"])
+        self.assertTrue(all(clue["category"] == "HISTORY" and clue["season"] == 31 for clue in clues))
+        self.assertEqual([c["question"] for c in sampler.sample(5, daily_double=True, game_id=1)], ["q1-2"])
+        self.assertEqual(sampler.sample(5, category="GEOGRAPHY"), [])
+        self.assertEqual(len(sampler.sample(3)), 3)
+        with self.assertRaises(ValueError):
+            sampler.sample(1, author="x")
+        sampler.close()
+
+    def test_index_extends_to_games_saved_later(self):
+        self._crawl([make_game(1, 30)])
+        sampler = ClueSampler(self.db_path, rng=random.Random(0))
+        self.assertEqual(sampler.prepare(season=30), 10)
+        self._crawl([make_game(2, 30), make_game(3, 31)])
+        clues = sampler.sample(100, season=30)
+        self.assertEqual(len(clues), 20)
+        self.assertEqual(len({clue["id"] for clue in clues}), 20)
+        sampler.close()
+
+    def test_index_rebuilt_when_game_saved_again(self):
+        self._crawl([make_game(1, 30), make_game(2, 30)])
+        sampler = ClueSampler(self.db_path, rng=random.Random(0))
+        self.assertEqual(len(sampler.sample(100, season=30)), 20)
+        self.assertEqual(len(sampler.sample(100)), 20)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""DELETE FROM clues WHERE game_id = 1""")  # Saved again below, under new clue ids.
+        conn.commit()
+        conn.close()
+        self._crawl([make_game(1, 30)])
+        self.assertEqual(len(sampler.sample(100)), 20)
+        self._crawl([make_game(2, 31)])  # Same clues, stored season changed.
+        self.assertEqual({clue["game_id"] for clue in sampler.sample(100, season=30)}, {1})
+        self.assertEqual(len(sampler.sample(100, season=31)), 10)
+        sampler.close()
+
+    def test_season_index_rebuilt_when_game_saved_under_another_season(self):
+        self._crawl([make_game(1, 30), make_game(2, 30)])
+        sampler = ClueSampler(self.db_path, rng=random.Random(0))
+        self.assertEqual(sampler.prepare(season=30), 20)
+        self.assertEqual(sampler.prepare(game_id=2), 10)
+        self._crawl([make_game(2, 31)])
+        self.assertEqual({clue["game_id"] for clue in sampler.sample(100, season=30)}, {1})
+        self.assertEqual({clue["season"] for clue in sampler.sample(100, game_id=2)}, {31})
+        sampler.close()
+
+    def test_index_kept_in_clue_database_and_checked_without_scans(self):
+        self._crawl([make_game(1, 30), make_game(2, 31)])
+        sampler = ClueSampler(self.db_path)
+        self.assertEqual(sampler.prepare(season=30), 10)
+        sampler.close()
+
+        sampler = ClueSampler(self.db_path, rng=random.Random(0))
+        statements = []
+        sampler.conn.set_trace_callback(statements.append)
+        self.assertEqual({clue["game_id"] for clue in sampler.sample(100, season=30)}, {1})
+        sampler.close()
+        self.assertFalse([sql for sql in statements if "INSERT" in sql or "COUNT(" in sql or "FROM games" in sql])
+
+
+if __name__ == '__main__':
+    unittest.main()
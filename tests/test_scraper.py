@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+#generic imports
+import contextlib
+import io
+import os
+import queue
+from concurrent.futures import Future
+from time import monotonic
+import sqlite3
+import tempfile
+import threading
+import unittest
+import mock
+
+#test imports
+from scraper.database import Database
+from scraper.database_status_codes import DATABASE_STATUS_CODES
+from scraper.exceptions import DatabaseOperationalError
+from scraper.models import Game
+from scraper.parser_backends import parse_game_markup
+from scraper.scraper import URL_SENTINEL, JArchiveScraper, ParseJob, ScraperWorker, UrlWorker, WatchUrlWorker
+from scraper.writer import GameWriter
+from benchmarks.local_jarchive import TEST_PAGE_PATH, LocalJArchive, render_game_page
+
+GAME_URLS = ["http://j-archive.com/showgame.php?game_id={}".format(i) for i in range(20)]
+GAME = Game.from_dict({"TREES": [{"question": "q", "answer": "a"}]})
+
+
+@mock.patch.object(UrlWorker, "get_season_game_urls", return_value=GAME_URLS)
+class TestScraperPipeline(unittest.TestCase):
+
+    def _run(self, queue_size=2, ledger=None, database=None):
+        database = database or mock.MagicMock(unflushed_games=0, category_count=0, duplicate_clue_count=0)
+        scraper = JArchiveScraper(database, starting_season=1, get_single_season=True, queue_size=queue_size, ledger=ledger)
+        scraper.init_workers()
+        scraper.mainloop()
+        return scraper, database
+
+    @mock.patch.object(ScraperWorker, "scrape_jarchive_page", return_value=GAME)
+    def test_every_game_saved_through_bounded_queues(self, mock_scrape, mock_urls):
+        scraper, database = self._run()
+        self.assertTrue(scraper.finished)
+        self.assertEqual(database.save.call_count, len(GAME_URLS))
+        self.assertEqual(scraper.game_data_queue.maxsize, 2)
+
+    @mock.patch.object(ScraperWorker, "get_game_page_markup", return_value="<html></html>")
+    @mock.patch("scraper.scraper.parse_game_markup", side_effect=RuntimeError("parser bug"))
+    def test_parse_errors_marked_failed_and_skipped(self, mock_parse, mock_markup, mock_urls):
+        ledger = mock.Mock()
+        ledger.completed_urls.return_value = set()
+        with mock.patch("threading.excepthook") as mock_excepthook:
+            scraper, database = self._run(queue_size=100, ledger=ledger)
+        self.assertTrue(scraper.finished)
+        database.save.assert_not_called()
+        mock_excepthook.assert_not_called()  # No worker thread died.
+        self.assertEqual(scraper.metrics.parse_failures.value, len(GAME_URLS))
+        self.assertEqual(sorted(call[0][0][0] for call in ledger.mark_failed.call_args_list), sorted(GAME_URLS))
+        ledger.mark_fetched.assert_not_called()
+
+    @mock.patch.object(ScraperWorker, "scrape_jarchive_page", return_value=GAME)
+    def test_only_flushed_games_counted_saved(self, mock_scrape, mock_urls):
+        database = mock.MagicMock(unflushed_games=0, category_count=0, duplicate_clue_count=0)
+        database.save.side_effect = [None, DatabaseOperationalError("disk full")] * (len(GAME_URLS) // 2)
+        scraper, _ = self._run(database=database)
+        self.assertEqual(scraper.metrics.save_failures.value, len(GAME_URLS) // 2)
+        self.assertEqual(scraper.metrics.games_saved.value, len(GAME_URLS) // 2)
+        self.assertEqual(scraper.metrics.clues_saved.value, len(GAME_URLS) // 2)
+
+    @mock.patch.object(ScraperWorker, "scrape_jarchive_page", return_value=GAME)
+    def test_games_a_writer_failed_to_flush_not_counted_saved(self, mock_scrape, mock_urls):
+        sink = mock.MagicMock(unflushed_games=0, duplicate_clue_count=0)
+        sink.get_connection_status.return_value = DATABASE_STATUS_CODES["success"]
+        sink.flush.side_effect = IOError("disk full")
+        writer = GameWriter({"db": sink})
+        scraper = JArchiveScraper(writer, starting_season=1, get_single_season=True)
+        writer.init_connection()
+        scraper.init_workers()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.mainloop()
+            writer.cleanup()
+        self.assertGreater(scraper.metrics.save_failures.value, 0)
+        self.assertEqual(scraper.metrics.games_saved.value, 0)
+
+
+class TestWatchInterrupt(unittest.TestCase):
+
+    def test_interrupt_saves_queued_games_and_stops_watching(self):
+        database = mock.MagicMock(unflushed_games=0, category_count=0, duplicate_clue_count=0)
+        ledger = mock.Mock()
+        scraper = JArchiveScraper(database, watch=True, ledger=ledger)
+        scraper.url_worker = mock.Mock(spec=WatchUrlWorker)
+        scraper.url_worker.is_alive.return_value = False
+        scraper.workers = [mock.Mock()]  # Not finished, so the main loop would wait on game_data_queue.
+        scraper.workers[0].is_alive.return_value = False
+        parsed = Future()
+        parsed.set_result((GAME, 0.01))
+        scraper.game_data_queue.put((GAME_URLS[0], GAME, monotonic()))
+        scraper.game_data_queue.put((GAME_URLS[1], ParseJob(parsed, "hash"), monotonic()))
+        with mock.patch.object(scraper.game_data_queue, "get", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                scraper.mainloop()
+        scraper.finish_watching()
+        scraper.url_worker.stop.assert_called_once_with()
+        self.assertEqual(database.save.call_count, 2)
+        ledger.mark_fetched.assert_called_once_with(GAME_URLS[1], "hash")
+        self.assertEqual([call[0][0] for call in ledger.mark_done.call_args_list], [[GAME_URLS[0]], [GAME_URLS[1]]])
+        self.assertTrue(scraper.game_data_queue.empty())
+
+    def test_waits_for_url_worker_before_ledger_is_closed(self):
+        ledger = mock.Mock()
+        scraper = JArchiveScraper(mock.MagicMock(unflushed_games=0, duplicate_clue_count=0), watch=True, ledger=ledger,
+                queue_size=1)
+
+        def watch():
+            for url in GAME_URLS[:3]:
+                ledger.status(url)
+                scraper.url_queue.put(url)  # Blocks once the queue is full, since no worker is taking urls.
+            scraper.url_queue.put(URL_SENTINEL)
+
+        scraper.url_worker = threading.Thread(target=watch, daemon=True)
+        scraper.url_worker.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scraper.finish_watching()
+            scraper.cleanup()
+        self.assertFalse(scraper.url_worker.is_alive())
+        self.assertEqual(list(scraper.url_queue.queue), [URL_SENTINEL])
+        self.assertEqual(ledger.method_calls[-1], mock.call.close())
+
+
+class TestParseProcesses(unittest.TestCase):
+
+    def test_pool_parses_every_page_fetched_by_one_thread(self):
+        with open(TEST_PAGE_PATH, "r", encoding="utf-8") as f:
+            clues_per_game = parse_game_markup(render_game_page(f.read(), 0)).clue_count
+        with tempfile.TemporaryDirectory() as tmp_dir, LocalJArchive(seasons=2, games_per_season=3, latency=0.0) as site:
+            db_path = os.path.join(tmp_dir, "test.db")
+            scraper = JArchiveScraper(Database.factory(db_path), base_url=site.base_url, worker_threads=1, parse_processes=2)
+            with contextlib.redirect_stdout(io.StringIO()):
+                scraper.start()
+                scraper.cleanup()
+            conn = sqlite3.connect(db_path)
+            try:
+                counts = [conn.execute("""SELECT COUNT(*) FROM {}""".format(table)).fetchone()[0] for table in ("games", "clues")]
+            finally:
+                conn.close()
+        self.assertEqual(counts, [6, 6 * clues_per_game])
+        self.assertEqual(scraper.metrics.parse_seconds.count, 6)
+        self.assertEqual(scraper.metrics.games_saved.value, 6)
+
+    def test_clues_stored_by_an_earlier_crawl_counted_duplicate(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, LocalJArchive(seasons=1, games_per_season=2, latency=0.0) as site:
+            db_path = os.path.join(tmp_dir, "test.db")
+            for _ in range(2):
+                scraper = JArchiveScraper(Database.factory(db_path), base_url=site.base_url)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    scraper.start()
+                    scraper.cleanup()
+        self.assertEqual(scraper.metrics.games_saved.value, 2)
+        self.assertGreater(scraper.metrics.clues_saved.value, 0)
+        self.assertEqual(scraper.metrics.clues_duplicate.value, scraper.metrics.clues_saved.value)
+
+
+class TestWatchUrlWorker(unittest.TestCase):
+
+    def _watch(self, pages, completed=(), stored=(), statuses=None, max_polls=3):
+        """Polls season 38 max_polls times, getting pages [(game urls, etag) or None for a 304] in turn."""
+
+        responses = iter(pages)
+
+        def get_if_changed(url, validators):
+            page = next(responses)
+            return (None, validators) if page is None else ("<html></html>", {"etag": page[1]})
+
+        transport = mock.Mock()
+        transport.get_if_changed.side_effect = get_if_changed
+        ledger = mock.Mock()
+        ledger.completed_urls.return_value = set(completed)
+        ledger.status.side_effect = lambda url: (statuses or {}).get(url)
+        worker = WatchUrlWorker(queue.Queue(), ledger, min_interval=0.001, max_interval=0.004, stored_urls=stored,
+                max_polls=max_polls, transport=transport)
+        worker.starting_season = 38
+        with mock.patch("scraper.scraper.parse_season_game_urls", side_effect=[page[0] for page in pages if page]):
+            worker.discover_game_urls()
+        return worker, transport
+
+    def test_queues_only_games_not_stored(self):
+        pages = [(GAME_URLS[:3], "v1"), None, (GAME_URLS[:4], "v2")]
+        worker, transport = self._watch(pages, completed=GAME_URLS[:1], stored=GAME_URLS[1:2])
+        self.assertEqual(list(worker.url_queue.queue), [GAME_URLS[2], GAME_URLS[3]])
+        validators = [call[0][1] for call in transport.get_if_changed.call_args_list]
+        self.assertEqual(validators, [None, {"etag": "v1"}, {"etag": "v1"}])  # A 304 keeps the validators.
+        self.assertEqual(worker.metrics.watch_games_found.value, 2)
+        self.assertEqual(worker.game_seasons[GAME_URLS[3]], 38)
+
+    def test_interval_backs_off_while_unchanged(self):
+        worker, _ = self._watch([(GAME_URLS[:1], "v1"), None, None, None], max_polls=4)
+        self.assertEqual(worker.interval, 0.004)
+
+    def test_failed_games_queued_again(self):
+        worker, _ = self._watch([(GAME_URLS[:1], "v1"), None], statuses={GAME_URLS[0]: "failed"}, max_polls=2)
+        self.assertEqual(list(worker.url_queue.queue), [GAME_URLS[0], GAME_URLS[0]])
+        self.assertEqual(worker.pending[GAME_URLS[0]], (38, 2))
+
+    def test_failed_game_queued_again_with_its_season(self):
+        ledger = mock.Mock()
+        ledger.status.return_value = "failed"
+        worker = WatchUrlWorker(queue.Queue(), ledger)
+        worker.pending[GAME_URLS[0]] = (38, 1)  # Its failed save already took it from game_seasons.
+        worker.requeue_failed_games()
+        self.assertEqual(list(worker.url_queue.queue), [GAME_URLS[0]])
+        self.assertEqual(worker.game_seasons, {GAME_URLS[0]: 38})
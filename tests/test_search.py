@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import tempfile
+import unittest
+
+#test imports
+from scraper import ClueSearch, Database
+from scraper.search import make_match_query
+
+GAMES = [
+        {"RIVERS": [{"question": "This river flows through Cairo", "answer": "the Nile"}],
+         "TREES": [{"question": "California's giant redwood", "answer": "sequoia"}]},
+        {"WORLD CAPITALS": [{"question": "The Danube flows through this capital of Hungary", "answer": "Budapest"}]}
+        ]
+
+
+class TestClueSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "test.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _crawl(self, games, fts):
+        database = Database.factory("sqlite:///" + self.db_path, fts=fts)
+        database.init_connection()
+        for game in games:
+            database.save(game)
+        database.cleanup()
+
+    def _search(self, text, **options):
+        clue_search = ClueSearch(self.db_path)
+        try:
+            return clue_search.search(text, **options)
+        finally:
+            clue_search.close()
+
+    def test_synced_index_matches_question_answer_and_category(self):
+        self._crawl(GAMES, "sync")
+        self.assertEqual(sorted(r["answer"] for r in self._search("flow")), ["Budapest", "the Nile"])  # Porter stemmed.
+        self.assertEqual(self._search("nile")[0]["category"], "RIVERS")
+        self.assertEqual(self._search("capitals")[0]["answer"], "Budapest")
+        self.assertEqual(self._search("redw")[0]["answer"], "sequoia")  # Last word matches as a prefix.
+
+    def test_rebuild_indexes_clues_saved_without_index(self):
+        self._crawl(GAMES[:1], None)
+        self._crawl(GAMES[1:], "rebuild")
+        self.assertEqual(len(self._search("flows")), 2)
+
+    def test_sync_indexes_existing_clues(self):
+        self._crawl(GAMES[:1], None)
+        self._crawl(GAMES[1:], "sync")
+        self.assertEqual(len(self._search("flows")), 2)
+
+    def test_match_query_ignores_fts_syntax(self):
+        self.assertEqual(make_match_query('"Nile" OR (river'), '"Nile" AND "OR" AND "river"*')
+        self.assertIsNone(make_match_query("?!"))
+
+
+if __name__ == '__main__':
+    unittest.main()
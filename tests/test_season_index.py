@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import queue
+import tempfile
+import unittest
+import mock
+
+#test imports
+from scraper.season_index import SeasonIndex
+from scraper.scraper import UrlWorker, URL_SENTINEL
+
+
+def _season_urls(season):
+    return ["http://j-archive.com/showgame.php?game_id={}{}".format(season, i) for i in range(3)]
+
+
+class TestSeasonIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.tmp_dir.name, "seasons.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_reloaded_index_keeps_seasons(self):
+        SeasonIndex(self.index_path).put(3, _season_urls(3))
+        self.assertEqual(SeasonIndex(self.index_path).get(3), _season_urls(3))
+        self.assertIsNone(SeasonIndex(self.index_path).get(4))
+
+    @mock.patch("scraper.scraper.parse_season_game_urls", side_effect=lambda soup: _season_urls(soup))
+    @mock.patch("scraper.scraper.get_page_soup", side_effect=lambda url, archive, transport: int(url.rsplit("=", 1)[1]))
+    def test_only_closed_seasons_cached(self, mock_get_page_soup, mock_parse):
+        url_worker = UrlWorker(queue.Queue(), season_index=SeasonIndex(self.index_path))
+        url_worker.current_season = 3
+        for season in (1, 2, 3):
+            url_worker.get_season_game_urls(season)
+        self.assertEqual(sorted(SeasonIndex(self.index_path).seasons), [1, 2])
+
+        mock_get_page_soup.reset_mock()
+        for season in (1, 2, 3):
+            url_worker.get_season_game_urls(season)
+        self.assertEqual(mock_get_page_soup.call_count, 1)  # Only the current season is requested again.
+
+    @mock.patch("scraper.scraper.parse_current_season_number", return_value=40)
+    @mock.patch("scraper.scraper.get_page_soup")
+    def test_current_season_cached_until_max_age(self, mock_get_page_soup, mock_parse):
+        now = [1000.0]
+        url_worker = UrlWorker(queue.Queue(), season_index=SeasonIndex(self.index_path, current_season_max_age=60,
+                clock=lambda: now[0]))
+        self.assertEqual(url_worker.get_current_season_number(), 40)
+        url_worker.season_index = SeasonIndex(self.index_path, current_season_max_age=60, clock=lambda: now[0])
+        self.assertEqual(url_worker.get_current_season_number(), 40)
+        self.assertEqual(mock_get_page_soup.call_count, 1)  # Read back from the index file.
+
+        now[0] += 61
+        self.assertEqual(url_worker.get_current_season_number(), 40)
+        self.assertEqual(mock_get_page_soup.call_count, 2)
+
+    def test_all_seasons_queued_before_sentinel(self):
+        url_queue = queue.Queue()
+        url_worker = UrlWorker(url_queue)
+        with mock.patch.object(url_worker, "get_season_game_urls", side_effect=_season_urls):
+            url_worker.start(starting_season=3, get_single_season=False)
+            url_worker.join()
+        queued = list(url_queue.queue)
+        self.assertEqual(queued[-1], URL_SENTINEL)
+        self.assertEqual(sorted(queued[:-1]), sorted(_season_urls(1) + _season_urls(2) + _season_urls(3)))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+#generic imports
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+#test imports
+from scraper.archive import PageArchive
+from scraper.database import SqliteDatabase
+from scraper.models import Category, Game
+from scraper.parser_backends import parse_game_markup
+from scraper.sharding import assign_shards, merge_shards, sharded_ingest
+
+TEST_PAGE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "test_page.html")
+SEASON_PAGE = """<table><tr><td align="left" valign="top" style="width:140px"><a href="{}">#</a></td></tr></table>"""
+
+
+def make_game(game_id, titles):
+    return Game([Category(title, 1, ["{} {}".format(title, game_id)], ["a"], [200], [False]) for title in titles],
+            url="http://j-archive.com/showgame.php?game_id={}".format(game_id), season=1)
+
+
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.target_path = os.path.join(self.tmp_dir.name, "target.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _shard(self, name, games):
+        database = SqliteDatabase(os.path.join(self.tmp_dir.name, name), secondary_indexes=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            database.init_connection()
+        for game in games:
+            database.save(game)
+        database.cleanup()
+        return database.db_path
+
+    def _query(self, sql):
+        conn = sqlite3.connect(self.target_path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_merge_remaps_category_ids_by_title(self):
+        shards = [self._shard("a.db", [make_game(1, ["TREES", "RIVERS"])]),
+                self._shard("b.db", [make_game(2, ["RIVERS", "OPERA"]), make_game(1, ["TREES", "RIVERS"])])]
+        counts = merge_shards(self.target_path, shards)
+        self.assertEqual(counts, {"games": (3, 2), "categories": (5, 3), "clues": (6, 4)})
+        rows = self._query("""SELECT categories.title, clues.question FROM clues
+                JOIN categories ON categories.id = clues.category_id ORDER BY clues.id""")
+        self.assertEqual(rows, [("TREES", "TREES 1"), ("RIVERS", "RIVERS 1"), ("RIVERS", "RIVERS 2"), ("OPERA", "OPERA 2")])
+        indexes = {row[0] for row in self._query("""SELECT name FROM sqlite_master WHERE type = 'index'""")}
+        self.assertIn("clues_category_id", indexes)  # Built after the merge.
+
+    def test_season_shards_from_archived_season_pages(self):
+        urls = ["http://j-archive.com/showgame.php?game_id={}".format(i) for i in range(3)]
+        shards = assign_shards(urls, "season", game_seasons={urls[0]: 30, urls[1]: 31})
+        self.assertEqual(shards, {"season-30": [urls[0]], "season-31": [urls[1]], "unlisted": [urls[2]]})
+
+    def test_sharded_ingest_stores_every_archived_game(self):
+        with open(TEST_PAGE_PATH, "r", encoding="utf-8") as f:
+            markup = f.read()
+        archive_dir = os.path.join(self.tmp_dir.name, "archive")
+        archive = PageArchive(archive_dir)
+        urls = ["http://j-archive.com/showgame.php?game_id={}".format(i) for i in range(4)]
+        for url in urls:
+            archive.put(url, markup)
+        archive.put("http://j-archive.com/showseason.php?season=12", SEASON_PAGE.format(urls[0]))
+        archive.close()
+        result = sharded_ingest(archive_dir, self.target_path, 2, shard_count=3, parser_backend="bs4")
+        self.assertEqual(sum(saved for saved, _, _ in result["shards"].values()), 4)
+        self.assertEqual(self._query("""SELECT id, season FROM games ORDER BY id"""), [(0, 12), (1, None), (2, None), (3, None)])
+        clue_count = parse_game_markup(markup, "bs4").clue_count
+        self.assertEqual(result["merged"]["clues"][1], clue_count)  # Pages are equal, so their clues are stored once.
+        self.assertFalse(os.path.exists(self.target_path + ".shards"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+#generic imports
+import io
+import unittest
+import mock
+from datetime import datetime, timezone
+import requests
+
+#test imports
+from scraper.transport import HttpTransport, parse_retry_after
+
+URL = "http://j-archive.com/showgame.php?game_id=1"
+
+
+def make_response(status, headers=None, text="<html></html>"):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = text.encode("utf-8")
+    response.raw = io.BytesIO(response._content)
+    response.url = URL
+    return response
+
+
+class TestHttpTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.sleep = mock.Mock()
+        self.transport = HttpTransport(max_retries=2, backoff_base=0.5, sleep=self.sleep)
+
+    def _get(self, *responses):
+        with mock.patch.object(requests.Session, "get", side_effect=list(responses)) as mock_get:
+            try:
+                return self.transport.get_text(URL)
+            finally:
+                self.calls = mock_get.call_args_list
+
+    def test_retries_unavailable_after_retry_after(self):
+        text = self._get(make_response(503, {"Retry-After": "7"}), make_response(200, text="game"))
+        self.assertEqual(text, "game")
+        self.sleep.assert_called_once_with(7.0)
+        self.assertEqual(self.transport.metrics.http_retries.value, 1)
+        self.assertEqual(self.calls[0][1]["timeout"], self.transport.timeout)
+
+    def test_backoff_doubles_after_connection_errors(self):
+        self._get(requests.exceptions.ConnectionError(), requests.exceptions.Timeout(), make_response(200))
+        delays = [call[0][0] for call in self.sleep.call_args_list]
+        self.assertTrue(0.25 <= delays[0] <= 0.5)
+        self.assertTrue(0.5 <= delays[1] <= 1.0)
+
+    def test_gives_up_after_max_retries(self):
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self._get(*[make_response(502)] * 3)
+        self.assertEqual(self.transport.metrics.http_retries.value, 2)
+        self.assertEqual(self.transport.metrics.http_retries_exhausted.value, 1)
+
+    def test_conditional_request_sends_validators_and_counts_not_modified(self):
+        validators = {"etag": '"season-38-4"', "last_modified": "Tue, 14 Oct 2025 04:00:00 GMT"}
+        with mock.patch.object(requests.Session, "get", side_effect=[make_response(304)]) as mock_get:
+            markup, new_validators = self.transport.get_if_changed(URL, validators)
+        self.assertIsNone(markup)
+        self.assertEqual(new_validators, validators)
+        self.assertEqual(mock_get.call_args[1]["headers"], {"If-None-Match": '"season-38-4"',
+                "If-Modified-Since": "Tue, 14 Oct 2025 04:00:00 GMT"})
+        self.assertEqual(self.transport.metrics.http_not_modified.value, 1)
+
+    def test_client_errors_not_retried(self):
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self._get(make_response(404))
+        self.sleep.assert_not_called()
+
+    def test_iter_text_decodes_chunks(self):
+        response = make_response(200, {"Content-Type": "text/html; charset=utf-8"})
+        response.encoding = "utf-8"
+        response._content_consumed = False
+        response.raw = io.BytesIO("Café ".encode("utf-8") * 3)
+        with mock.patch.object(requests.Session, "get", return_value=response) as mock_get:
+            chunks = list(self.transport.iter_text(URL, chunk_size=4))  # Splits the two bytes of "é".
+        self.assertEqual("".join(chunks), "Café " * 3)
+        self.assertTrue(mock_get.call_args[1]["stream"])
+
+    def test_one_session_per_thread(self):
+        session = self.transport.session()
+        self.assertIs(self.transport.session(), session)
+        self.assertEqual(session.headers["Accept-Encoding"], "gzip, deflate")
+        self.transport.close()
+        self.assertEqual(self.transport.sessions, [])
+
+
+class TestParseRetryAfter(unittest.TestCase):
+
+    def test_seconds_and_http_date(self):
+        now = datetime(2015, 10, 21, 7, 28, 0, tzinfo=timezone.utc)
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now=now), 30.0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:27:00 GMT", now=now), 0.0)
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+#generic imports
+import os
+import tempfile
+import threading
+import unittest
+
+#test imports
+from scraper.database_status_codes import DATABASE_STATUS_CODES
+from scraper.models import Category, Game
+from scraper.writer import GameWriter, SpillFile
+
+URLS = ["http://j-archive.com/showgame.php?game_id={}".format(i) for i in range(10)]
+
+
+def make_game(url):
+    return Game([Category("TREES", 1, ["q"], ["a"], [200], [False])], url=url)
+
+
+class FakeSink:
+    """Records saved game urls, and the size of every flushed batch. Flushes fail while fail_flushes is positive, and
+    wait for release while it is cleared."""
+
+    def __init__(self, fail_flushes=0):
+        self.fail_flushes = fail_flushes
+        self.release = threading.Event()
+        self.release.set()
+        self.flushing = threading.Event()
+        self.saved = []
+        self.flushed_batches = []
+        self.unflushed_games = 0
+        self.status = DATABASE_STATUS_CODES["not connected"]
+
+    def init_connection(self):
+        self.status = DATABASE_STATUS_CODES["success"]
+
+    def get_connection_status(self):
+        return self.status
+
+    def save(self, game):
+        self.saved.append(game.url)
+        self.unflushed_games += 1
+
+    def flush(self):
+        self.flushing.set()
+        self.release.wait()
+        if self.fail_flushes:
+            self.fail_flushes -= 1
+            raise IOError("disk full")
+        self.flushed_batches.append(self.unflushed_games)
+        self.unflushed_games = 0
+
+    def cleanup(self):
+        self.flush()
+
+
+class TestGameWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spill_dir = os.path.join(self.tmp_dir.name, "spill")
+        self.flushed = []
+        self.failed = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _start(self, sinks, **options):
+        writer = GameWriter(sinks, spill_dir=self.spill_dir, max_batch_delay=0, **options)
+        writer.on_flushed = self.flushed.extend
+        writer.on_failed = lambda urls, error: self.failed.extend(urls)
+        writer.init_connection()
+        while writer.get_connection_status() != DATABASE_STATUS_CODES["success"]:
+            threading.Event().wait(0.01)
+        return writer
+
+    def test_games_queued_during_a_commit_share_the_next(self):
+        sink = FakeSink()
+        writer = self._start({"db": sink})
+        sink.release.clear()
+        writer.save(make_game(URLS[0]))
+        sink.flushing.wait()  # The first game's commit is under way.
+        for url in URLS[1:]:
+            writer.save(make_game(url))
+        sink.release.set()
+        writer.cleanup()
+        self.assertEqual(sink.flushed_batches[:2], [1, 9])
+        self.assertEqual(sorted(self.flushed), sorted(URLS))
+
+    def test_failing_sink_spills_and_catches_up_without_holding_up_others(self):
+        healthy, failing = FakeSink(), FakeSink(fail_flushes=1)
+        writer = self._start({"healthy": healthy, "failing": failing})
+        for url in URLS:
+            writer.save(make_game(url))
+        writer.cleanup()
+        self.assertEqual(healthy.saved, URLS)
+        self.assertEqual(set(failing.saved), set(URLS))
+        self.assertGreater(writer.spilled_count, 0)
+        self.assertEqual(sorted(self.flushed), sorted(URLS))  # Only once both sinks flushed them.
+        self.assertEqual(os.listdir(self.spill_dir), [])  # Emptied files are removed.
+
+    def test_full_queue_spills_instead_of_waiting(self):
+        sink = FakeSink()
+        writer = self._start({"db": sink}, queue_size=2)
+        sink.release.clear()
+        writer.save(make_game(URLS[0]))
+        sink.flushing.wait()
+        for url in URLS[1:]:
+            writer.save(make_game(url))  # Would block without spilling, as the sink is stuck.
+        self.assertEqual(writer.spilled_count, 7)
+        sink.release.set()
+        writer.cleanup()
+        self.assertEqual(sink.saved, URLS)
+
+    def test_spill_file_left_by_a_killed_crawl_is_written(self):
+        os.makedirs(self.spill_dir)
+        spill = SpillFile(os.path.join(self.spill_dir, "db.spill.jsonl"))
+        spill.append([(url, make_game(url)) for url in URLS[:3]])
+        spill._file.close()  # Killed before it caught up.
+        sink = FakeSink()
+        writer = self._start({"db": sink})
+        writer.save(make_game(URLS[3]))
+        writer.cleanup()
+        self.assertEqual(sink.saved, URLS[:4])
+        self.assertEqual(self.flushed, [URLS[3]])  # Earlier crawls' urls are not this crawl's to report.
+
+    def test_games_reported_failed_without_spill_dir(self):
+        self.spill_dir = None
+        sink = FakeSink(fail_flushes=1)
+        writer = self._start({"db": sink})
+        writer.save(make_game(URLS[0]))
+        writer.cleanup()
+        self.assertEqual(self.failed, [URLS[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()